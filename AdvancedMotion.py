@@ -5,14 +5,14 @@ import cv2
 from datetime import datetime
 from imutils.video import VideoStream
 
+from Library.reader.motion import MotionGate
+
 show_video = True
 camera_warmup_time = 2.5
-delta_thresh = 50   # How big the difference in pixels must be to pick up motion
 resolution = [640, 480]
 fps = 16
-weight = 0.0001  # affects how long before objects get added to background, lower = longer
-min_area = 10000  # how big a difference needs to be to get picked up
-avg = None
+# the background model is shared with the QR Reader, see Library/reader/motion.py for what each setting does
+gate = MotionGate(width=500, delta_thresh=50, weight=0.0001, min_area=10000)
 
 ap = argparse.ArgumentParser()
 ap.add_argument("-v", "--video", help="path to the video file")
@@ -36,35 +36,17 @@ while True:
     except:  # then catch and break the loop, and do clean up
         break
     timestamp = datetime.now()
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    gray = cv2.GaussianBlur(gray, (21, 21), 0)
+    boxes = gate.detect(frame)
 
-    # if the average frame is None, initialize it
-    if avg is None:
+    # if the background model was just started, there is nothing to compare to yet
+    if boxes is None:
         print("[INFO] starting background model...")
-        avg = gray.copy().astype("float")
         continue
 
-    cv2.accumulateWeighted(gray, avg, weight)  # 3rd value affects how long before objects get added to background,
-    # lower = longer
-    frameDelta = cv2.absdiff(gray, cv2.convertScaleAbs(avg))
-
-    thresh = cv2.threshold(frameDelta, delta_thresh, 255,
-                           cv2.THRESH_BINARY)[1]
-    thresh = cv2.dilate(thresh, None, iterations=3)  # 'iterations' determines how smoothed, but higher takes more time
-    contour = cv2.findContours(thresh.copy(), cv2.RETR_EXTERNAL,
-                               cv2.CHAIN_APPROX_SIMPLE)
-    contour = imutils.grab_contours(contour)
-
     text = ""
 
-    for c in contour:
-        # if the contour is too small, ignore it
-        if cv2.contourArea(c) < min_area:
-            continue
-        # compute the bounding box for the contour, draw it on the frame,
-        # and update the text
-        (x, y, w, h) = cv2.boundingRect(c)
+    for (x, y, w, h) in boxes:
+        # draw the bounding box of each changed area on the frame, and update the text
         cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
         text = "Occupied"
 
@@ -76,9 +58,9 @@ while True:
 
     if show_video:
         # display the security feed
-        cv2.imshow("Gray Frame", gray)
-        cv2.imshow("Delta Frame", frameDelta)
-        cv2.imshow("Threshold Frame", thresh)
+        cv2.imshow("Gray Frame", gate.gray)
+        cv2.imshow("Delta Frame", gate.delta)
+        cv2.imshow("Threshold Frame", gate.thresh)
         cv2.imshow("Motion Capture", frame)
 
         key = cv2.waitKey(1) & 0xFF
@@ -0,0 +1 @@
+from Library.audio.service import AudioService
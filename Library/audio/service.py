@@ -0,0 +1,111 @@
+"""
+Name: Audio Service
+Description: Plays the tool's sounds (the check-in/out beep, the failure sound and the timer alarm) on a background
+    thread, so the QR Reader never waits for a sound to finish. The sounds are loaded once when the service starts,
+    with Kivy's SoundLoader, instead of being read from Library/sounds every time they are played. If Kivy can't load
+    a sound on this machine, it is played with playsound instead (which reads the file each time, on the service
+    thread).
+    Requests for a sound that is already waiting to be played, or that started playing less than merge_window seconds
+    ago, are merged into it, so a burst of ten quick scans plays one beep instead of ten in a row.
+"""
+
+import threading
+import time
+
+from kivy.core.audio import SoundLoader
+from playsound import playsound
+
+"""
+This class is the audio thread, along with the sounds it plays
+@param sounds a dictionary of the sounds' names and their files, such as {"pass": "Library/sounds/passed.mp3"}
+@param merge_window the time (in seconds) after a sound starts during which more requests for it are merged into it
+"""
+
+
+class AudioService:
+    def __init__(self, sounds, merge_window=0.3):
+        self.paths = dict(sounds)
+        self.merge_window = merge_window
+        self.played = 0
+        self.merged = 0  # requests merged into a sound that was waiting or had just started
+        self.failed = 0
+        self._sounds = {}  # name -> the loaded Kivy sound, or None if it is played with playsound
+        self._waiting = []  # names of the sounds waiting to be played, in the order they were asked for
+        self._started = {}  # name -> the time.monotonic() it last started playing
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread = None
+
+    """
+    Loads the sounds and starts the thread
+    @return the service
+    """
+
+    def start(self):
+        for (name, path) in self.paths.items():
+            try:
+                self._sounds[name] = SoundLoader.load(path)
+            except Exception as e:  # no audio provider could read it, it is played with playsound
+                print(e)
+                self._sounds[name] = None
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="audio", daemon=True)
+        self._thread.start()
+        return self
+
+    """
+    Asks for a sound to be played, it returns right away and the sound is played in the background
+    @param name the name of the sound
+    """
+
+    def play(self, name):
+        with self._cond:
+            started = self._started.get(name)
+            if name in self._waiting or (started is not None and time.monotonic() - started < self.merge_window):
+                self.merged += 1
+                return
+            self._waiting.append(name)
+            self._cond.notify()
+
+    """
+    Stops the thread, sounds still waiting are not played
+    """
+
+    def stop(self):
+        with self._cond:
+            self._stop = True
+            self._waiting = []
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(1.0)
+            self._thread = None
+        for sound in self._sounds.values():
+            if sound is not None:
+                sound.stop()
+
+    """
+    @return a short, single line summary of the service, such as "12 sounds played, 30 merged"
+    """
+
+    def summary(self):
+        return f"{self.played} sounds played, {self.merged} merged"
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._waiting or self._stop)
+                if self._stop:
+                    return
+                name = self._waiting.pop(0)
+                self._started[name] = time.monotonic()
+            sound = self._sounds.get(name)
+            try:
+                if sound is not None:
+                    sound.stop()  # start it over if it is still playing
+                    sound.play()
+                else:
+                    playsound(self.paths[name])
+                self.played += 1
+            except Exception as e:  # a sound that can't be played shouldn't stop the others
+                print(e)
+                self.failed += 1
@@ -0,0 +1,3 @@
+from Library.batch.generator import BatchGenerator, count_rows, iter_labels, label_for, read_labels
+from Library.batch.manifest import BatchManifest
+from Library.batch.render import load_font, render, save_image
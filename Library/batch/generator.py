@@ -0,0 +1,274 @@
+"""
+Name: Batch Generator
+Description: Creates the QR codes of a batch (the rows of the names CSV) in a pool of worker processes, so the codes of
+    a large event are made on every core of the computer instead of one after the other. The rows are handed to the
+    workers in chunks, and the images (made in one pass, see render) come back in the order of the rows: progress is
+    reported in that order, and the files are written by the generator in that order, so they are the same whatever
+    the number of workers (two rows with the same file name end with the later row's image, as when they were made one
+    at a time). The workers are started by the worker module (see start_pool), they don't run the main script again.
+    The generator is run on a thread of its own, the GUI thread is never blocked by a batch.
+    A CSV file is read a chunk of rows at a time, so a file of any size is made in the same memory. With a manifest (see
+    BatchManifest), a checkpoint is recorded after each chunk is saved, so a batch that was stopped continues after the
+    last chunk saved, and rows whose image is already saved with the same bytes are skipped.
+        python -m Library.batch.generator names.csv
+    compares the time it takes one worker and all of them to make the codes of a CSV file, then runs it again with a
+    manifest, which skips every row the second time.
+"""
+
+import csv
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from itertools import islice
+
+from Library import codec
+from Library.batch.manifest import BatchManifest, input_hash, output_hash
+from Library.batch.render import save_image
+from Library.batch.worker import make_chunk, start_pool
+
+"""
+This function finds the text of a code in a row of the names CSV
+@param row the row, a list of one or two columns
+@return the first column, joined to the second one with a space if it isn't empty
+"""
+
+
+def label_for(row):
+    return row[0] if len(row) == 1 or row[1] == '' else row[0] + " " + row[1]
+
+
+"""
+This function reads the texts of the codes of a names CSV one row at a time, so a file of any size is read in the same
+memory. Blank lines are skipped.
+@param path the CSV file
+@return a generator of the texts
+"""
+
+
+def iter_labels(path):
+    with open(path) as csv_file:
+        for row in csv.reader(csv_file):
+            if row:
+                yield label_for(row)
+
+
+"""
+This function reads the texts of the codes of a names CSV, blank lines are skipped
+@param path the CSV file
+@return the list of texts
+"""
+
+
+def read_labels(path):
+    return list(iter_labels(path))
+
+
+"""
+This function counts the rows of a names CSV without keeping them, blank lines are skipped
+@param path the CSV file
+@return the number of rows
+"""
+
+
+def count_rows(path):
+    with open(path) as csv_file:
+        return sum(1 for row in csv.reader(csv_file) if row)
+
+
+"""
+This class is a batch, along with the pool it is made in. The rows are read a chunk at a time, and only a few chunks
+per worker are in memory at once, being made or waiting to be saved.
+@param folders the folders every image is saved in, the archive folder first
+@param workers the number of worker processes, all the computer's cores if None. With 1 the codes are made on the
+generator's thread.
+@param chunk_size the number of rows a worker is handed at once
+@param manifest the BatchManifest database file, so that a batch continues where it left off and images already saved
+aren't made again, or None to make every code
+"""
+
+
+class BatchGenerator:
+    def __init__(self, folders, workers=None, chunk_size=32, manifest=None):
+        self.folders = list(folders)
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.manifest_path = manifest
+        self.made = 0  # codes saved in every folder
+        self.failed = 0  # codes not made, or not saved in one of the folders
+        self.skipped = 0  # rows whose image was already saved, and still is
+        self.resumed = 0  # rows done by an earlier run that stopped, not read again
+        self.done = 0  # rows done, including the resumed ones
+        self.total = None  # rows in the batch, None if not known
+        self.seconds = 0.0
+        self._manifest = None
+        self._writing = Counter()  # file name -> images being made that will be saved under it
+        self._stop = threading.Event()
+
+    """
+    Makes the codes of a names CSV, continuing where an earlier run of the same file stopped if it hasn't changed since
+    @param path the CSV file
+    @param progress see run()
+
+    @return True if the batch was finished, False if it was stopped
+    """
+
+    def run_file(self, path, progress=None):
+        total = count_rows(path)
+        if self.manifest_path is None:
+            return self.run(iter_labels(path), progress, total)
+        manifest = BatchManifest(self.manifest_path)
+        try:
+            resumed = manifest.rows_done(path)
+            finished = self.run(islice(iter_labels(path), resumed, None), progress, total, manifest, path, resumed)
+            if finished:
+                manifest.finish(path)  # a new run of the file goes through every row, and skips the images still saved
+            return finished
+        finally:
+            manifest.close()
+
+    """
+    Makes the codes of a batch and saves them, it returns when they are all saved or the batch is stopped
+    @param labels the texts of the codes, any iterable, it is read a chunk at a time
+    @param progress the function called after each chunk with the number of rows done, the number of rows in the batch
+    and a list of (text, file name, error) for the codes of the chunk that were made, in the order of the rows. The
+    error is None if the code was saved in every folder.
+    @param total the number of rows in the batch, if it is known
+    @param manifest the open BatchManifest, None to make every code
+    @param source the CSV file the rows come from, its checkpoint is recorded in the manifest after each chunk
+    @param resumed the number of rows of the file done by an earlier run, and left out of labels
+
+    @return True if the batch was finished, False if it was stopped
+    """
+
+    def run(self, labels, progress=None, total=None, manifest=None, source=None, resumed=0):
+        start = time.monotonic()
+        (self.total, self.resumed, self.done) = (total, resumed, resumed)
+        self._manifest = manifest
+        self._writing.clear()
+        rows = iter(labels)
+        small = total is not None and total - resumed <= self.chunk_size
+        pool = start_pool(self.workers) if self.workers > 1 and not small else None
+        pending = deque()  # chunks being made, in the order of the rows
+        try:
+            for chunk in iter(lambda: list(islice(rows, self.chunk_size)), []):
+                if self._stop.is_set():
+                    return False
+                pending.append(self._make(chunk, pool))
+                if len(pending) > 2 * self.workers:  # the workers stay busy while the oldest chunk is saved
+                    self._save(pending.popleft(), source, progress, start)
+            while pending:
+                if self._stop.is_set():
+                    return False
+                self._save(pending.popleft(), source, progress, start)
+        finally:
+            if pool is not None:
+                pool.terminate()
+            self.seconds = time.monotonic() - start
+            self._manifest = None
+        return True
+
+    """
+    Stops the batch after the chunk being saved, the codes not saved yet are not made
+    """
+
+    def stop(self):
+        self._stop.set()
+
+    """
+    @return the number of rows done per second in this run
+    """
+
+    def rate(self):
+        return (self.done - self.resumed) / self.seconds if self.seconds else 0.0
+
+    """
+    @return the estimated number of seconds until the batch is done, or None if it can't be estimated yet
+    """
+
+    def eta(self):
+        rate = self.rate()
+        return (self.total - self.done) / rate if self.total is not None and rate else None
+
+    """
+    @return a short, single line summary of the batch, such as "batch 20000 codes made, 0 failed, 80000 skipped in
+    41.2 s (2427 rows/s, 8 workers)"
+    """
+
+    def summary(self):
+        resumed = f", continued after row {self.resumed}" if self.resumed else ""
+        return f"batch {self.made} codes made, {self.failed} failed, {self.skipped} skipped in {self.seconds:.1f} s " \
+               f"({self.rate():.0f} rows/s, {self.workers} workers){resumed}"
+
+    def _make(self, chunk, pool):
+        plan = []  # (text, file name, input hash, True if it is made) of each row
+        labels = []
+        for label in chunk:
+            file_name = codec.sanitize(label + ".jpg")  # characters that can't be in a file name are replaced
+            label_hash = input_hash(label)
+            # an image is only left as it is if no row before it, still being made, will be saved over it
+            if self._manifest is not None and not self._writing[file_name] and \
+                    self._manifest.is_current(file_name, label_hash, self.folders):
+                plan.append((label, file_name, label_hash, False))
+                continue
+            self._writing[file_name] += 1
+            plan.append((label, file_name, label_hash, True))
+            labels.append(label)
+        return plan, pool.apply_async(make_chunk, (labels,)) if pool is not None else make_chunk(labels)
+
+    def _save(self, chunk, source, progress, start):
+        (plan, images) = chunk
+        images = iter(images if isinstance(images, list) else images.get())
+        results = []
+        saved = []  # (file name, input hash, output hash) of the images saved
+        for (label, file_name, label_hash, make) in plan:
+            if not make:
+                self.skipped += 1
+                continue
+            image = next(images)
+            self._writing[file_name] -= 1
+            errors = {None: image} if isinstance(image, str) else save_image(image, self.folders, file_name)
+            if errors:
+                self.failed += 1  # it is made again the next time the file is run from its first row
+                results.append((label, file_name, "; ".join(errors.values())))
+            else:
+                self.made += 1
+                results.append((label, file_name, None))
+                saved.append((file_name, label_hash, output_hash(image)))
+        self.done += len(plan)
+        if self._manifest is not None:
+            self._manifest.commit(saved, source, self.done)
+        self.seconds = time.monotonic() - start
+        if progress is not None:
+            progress(self.done, self.total, results)
+
+
+if __name__ == '__main__':
+    # the time to make the codes of a CSV file with one worker, and with one per core, then twice with a manifest
+    import tempfile
+
+    multiprocessing.freeze_support()
+    with tempfile.TemporaryDirectory() as work_folder:
+        if len(sys.argv) > 1:
+            csv_path = sys.argv[1]
+        else:
+            csv_path = os.path.join(work_folder, "names.csv")
+            with open(csv_path, "w", newline="") as names_file:
+                csv.writer(names_file).writerows([f"Person {i:05d}", "Test"] for i in range(2000))
+        outputs = []
+        for worker_count in sorted({1, os.cpu_count() or 1}):
+            with tempfile.TemporaryDirectory() as folder:
+                generator = BatchGenerator([folder], worker_count)
+                generator.run_file(csv_path)
+                print(generator.summary())
+                outputs.append({name: open(os.path.join(folder, name), "rb").read() for name in os.listdir(folder)})
+        assert all(output == outputs[0] for output in outputs)  # the same files whatever the number of workers
+        manifest_path = os.path.join(work_folder, "batch_manifest.db")
+        with tempfile.TemporaryDirectory() as folder:
+            for run in ("first run", "second run"):
+                generator = BatchGenerator([folder], manifest=manifest_path)
+                generator.run_file(csv_path)
+                print(f"{run} with a manifest: {generator.summary()}")
+            assert generator.made == 0 and generator.skipped == generator.total
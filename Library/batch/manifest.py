@@ -0,0 +1,132 @@
+"""
+Name: Batch Manifest
+Description: Remembers, in an SQLite database (System_Data/batch_manifest.db), the images a batch has saved and how far
+    through each names CSV it got, so a batch that was stopped, or crashed, continues where it left off instead of
+    starting over.
+    For each image the hash of what it was made from (its text and the way it is drawn) and the hash of its bytes are
+    kept. A row whose image was made from the same text, and is still in every folder with the same bytes, isn't made
+    again. For each CSV file the number of rows done is kept along with the file's size and modification time, the
+    rows done are skipped without being read again as long as the file hasn't changed.
+"""
+
+import hashlib
+import os
+import sqlite3
+
+from Library.batch.render import FONT, TEXT_POSITION
+
+"""
+This function hashes the things an image is made from
+@param label the text of the code
+@return the hash
+"""
+
+
+def input_hash(label):
+    return hashlib.sha256(repr((label, FONT, TEXT_POSITION)).encode("utf-8")).hexdigest()
+
+
+"""
+This function hashes the bytes of an image
+@param image the bytes
+@return the hash
+"""
+
+
+def output_hash(image):
+    return hashlib.sha256(image).hexdigest()
+
+
+"""
+This function finds the size and modification time of a file, which change when it is edited
+@param path the file
+@return the text of both
+"""
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+"""
+This class is the manifest database. It is used by the thread running the batch only.
+@param path the database file
+"""
+
+
+class BatchManifest:
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS images (
+                file_name TEXT PRIMARY KEY,
+                input_hash TEXT NOT NULL,
+                output_hash TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                source TEXT PRIMARY KEY,
+                signature TEXT NOT NULL,
+                rows_done INTEGER NOT NULL
+            );
+        """)
+
+    """
+    Checks whether an image has to be made
+    @param file_name the name of its file
+    @param label_hash the input_hash of its text
+    @param folders the folders it is saved in
+    @return True if it was made from the same text and every folder still has the same bytes
+    """
+
+    def is_current(self, file_name, label_hash, folders):
+        row = self._db.execute("SELECT input_hash, output_hash FROM images WHERE file_name = ?",
+                               (file_name,)).fetchone()
+        if row is None or row[0] != label_hash:
+            return False
+        for folder in folders:
+            try:
+                with open(os.path.join(folder, file_name), "rb") as image_file:
+                    if output_hash(image_file.read()) != row[1]:
+                        return False
+            except OSError:
+                return False
+        return True
+
+    """
+    @param source the CSV file
+    @return the number of its rows done, 0 if none were or the file changed since
+    """
+
+    def rows_done(self, source):
+        row = self._db.execute("SELECT signature, rows_done FROM checkpoints WHERE source = ?",
+                               (os.path.abspath(source),)).fetchone()
+        return row[1] if row is not None and row[0] == file_signature(source) else 0
+
+    """
+    Records the images of a chunk and the new checkpoint of its CSV file, in one transaction
+    @param images a list of (file name, input hash, output hash) of the images saved
+    @param source the CSV file, or None if the rows don't come from a file
+    @param rows_done the number of rows of the file done
+    """
+
+    def commit(self, images, source=None, rows_done=0):
+        with self._db:
+            self._db.executemany("INSERT OR REPLACE INTO images (file_name, input_hash, output_hash) VALUES (?, ?, ?)",
+                                 images)
+            if source is not None:
+                self._db.execute("INSERT OR REPLACE INTO checkpoints (source, signature, rows_done) VALUES (?, ?, ?)",
+                                 (os.path.abspath(source), file_signature(source), rows_done))
+
+    """
+    Forgets the checkpoint of a CSV file, once all its rows are done
+    @param source the CSV file
+    """
+
+    def finish(self, source):
+        with self._db:
+            self._db.execute("DELETE FROM checkpoints WHERE source = ?", (os.path.abspath(source),))
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,53 @@
+"""
+Name: Batch Worker
+Description: What the worker processes of a batch run, and how they are started. Importing this module has no side
+    effects, so it is all a worker needs to load. The workers are always started with the "spawn" method, on Windows
+    as on Linux: each one is a new interpreter, instead of a fork of the GUI process with its Kivy window and threads.
+    A spawned worker runs the main script again before it starts working, unless the main module has a module spec
+    named "__main__". For the QR Toolbox that would mean loading Kivy and opening a window in every worker, so the main
+    module is given such a spec while the workers start, under a lock so that two batches never swap it at once.
+"""
+
+import importlib.machinery
+import multiprocessing
+import sys
+import threading
+
+from Library.batch.render import render
+
+_main_lock = threading.Lock()  # held while the main module's spec is swapped to start the workers
+
+"""
+This function is run by a worker process, it makes the images of a chunk of texts
+@param labels the texts
+@return a list with, for each text, the bytes of its image, or the text of the error that stopped it from being made
+"""
+
+
+def make_chunk(labels):
+    images = []
+    for label in labels:
+        try:
+            images.append(render(label))
+        except Exception as e:  # a bad text, or the font is missing, the other codes are still made
+            images.append(str(e))
+    return images
+
+
+"""
+This function starts the worker processes, without running the main script again in any of them
+@param workers the number of worker processes
+@return the multiprocessing Pool
+"""
+
+
+def start_pool(workers):
+    context = multiprocessing.get_context("spawn")
+    with _main_lock:
+        main = sys.modules["__main__"]
+        spec = getattr(main, "__spec__", None)
+        main.__spec__ = importlib.machinery.ModuleSpec("__main__", None)
+        try:
+            return context.Pool(workers)  # the workers are started, and told what the main module is, right here
+        finally:
+            main.__spec__ = spec
@@ -0,0 +1,137 @@
+"""
+Name: Codec
+Description: Converts the text of QR codes and the names of their files. QR codes made by the tool can't hold the
+    special (accented) characters, so each one is written as a code character, such as "!@!e2!" for "é", and turned
+    back when the code is read. The conversion tables are built once, when the module is imported: the set of special
+    characters, and compiled regular expressions that find the code characters when reading and the characters file
+    names can't have. Texts with nothing to convert (plain ASCII, no "!@!") are returned right away, which is most of
+    them. Other texts only have the special characters they hold replaced, instead of every one being looked for.
+    There is no UI here, the caller tells the user if a file name had to be changed.
+        python -m Library.codec
+    checks that every special character survives the round trip, and times the conversions against the old loop of
+    str.replace calls. Plain texts are converted 15 to 30 times faster, and sanitize is about 2 times faster. A name
+    with accents is only a little faster: about 1.3 times to encode and 1.1 times to decode. A text of a couple of
+    thousand characters with accents is encoded about 2 times slower, but names that long aren't put in QR codes.
+"""
+
+import re
+
+trouble_characters = ['\t', '\n', '\r']  # characters that cause issues
+bad_file_name_list = ['*', ':', '"', '<', '>', ',', '/', '|', '?', '\t', '\r', '\n',
+                      '\\']  # can't be used in a filename
+special_characters = ["à", "á", "â", "ã", "ä", "å", "æ", "ç", "è", "é", "ê", "ë", "ì", "í", "î", "ï", "ð", "ñ", "ò",
+                      "ó", "ô", "õ", "ö", "ø", "ù", "ú", "û", "ü", "ý", "þ", "ÿ", "À", "Á", "Â", "Ã", "Ä", "Å", "Æ",
+                      "Ç", "È", "É", "Ê", "Ë", "Ì", "Í", "Î", "Ï", "Ð", "Ñ", "Ò", "Ó", "Ô", "Õ", "Ö", "Ø", "Ù", "Ú",
+                      "Û", "Ü", "Ý", "Þ", "ß"]
+code_characters = ["!@!a1!", "!@!a2!", "!@!a3!", "!@!a4!", "!@!a5!", "!@!a6!", "!@!a7!", "!@!c1!", "!@!e1!", "!@!e2!",
+                   "!@!e3!", "!@!e4!", "!@!i1!", "!@!i2!", "!@!i3!", "!@!i4!", "!@!o1!", "!@!n1!", "!@!o2!", "!@!o3!",
+                   "!@!o4!", "!@!o5!", "!@!o6!", "!@!o7!", "!@!u1!", "!@!u2!", "!@!u3!", "!@!u4!", "!@!y1!", "!@!b1!",
+                   "!@!y2!", "!@!A1!", "!@!A2!", "!@!A3!", "!@!A4!", "!@!A5!", "!@!A6!", "!@!A7!", "!@!C1!", "!@!E1!",
+                   "!@!E2!", "!@!E3!", "!@!E4!", "!@!I1!", "!@!I2!", "!@!I3!", "!@!I4!", "!@!O1!", "!@!N1!", "!@!O2!",
+                   "!@!O3!", "!@!O4!", "!@!O5!", "!@!O6!", "!@!O7!", "!@!U1!", "!@!U2!", "!@!U3!", "!@!U4!", "!@!Y1!",
+                   "!@!B1!", "!@!Y2!"]
+
+char_dict_special_to_code = dict(zip(special_characters, code_characters))
+char_dict_code_to_special = dict(zip(code_characters, special_characters))
+
+_special_set = frozenset(special_characters)
+_code_pattern = re.compile("|".join(re.escape(code) for code in code_characters))
+_file_name_pattern = re.compile(f"[{re.escape(''.join(bad_file_name_list))}]")
+_trouble_pattern = re.compile(f"[{re.escape(''.join(trouble_characters))}]")
+
+"""
+This function converts the special characters of a text to code characters, before it is put in a QR code
+@param text the text
+
+@return the converted text
+"""
+
+
+def encode(text):
+    if text.isascii():  # the special characters are all outside ASCII
+        return text
+    for char in _special_set.intersection(text):  # the code characters are ASCII, so the order doesn't matter
+        text = text.replace(char, char_dict_special_to_code[char])
+    return text
+
+
+"""
+This function converts the code characters of a text read from a QR code back to special characters
+@param text the text
+
+@return the converted text
+"""
+
+
+def decode(text):
+    if "!@!" not in text:  # most codes have none, they are returned as they are
+        return text
+    return _code_pattern.sub(lambda match: char_dict_code_to_special[match.group()], text)
+
+
+"""
+This function replaces the characters that can't be in a file name with '-'
+@param name the file name
+
+@return the name that can be used
+"""
+
+
+def sanitize(name):
+    return _file_name_pattern.sub("-", name)
+
+
+"""
+This function replaces tabs and line breaks with spaces, so that a text can be shown on one line
+@param text the text
+
+@return the text on one line
+"""
+
+
+def one_line(text):
+    return _trouble_pattern.sub(" ", text)
+
+
+if __name__ == '__main__':
+    # round trips, then the conversions against the old loop of str.replace calls
+    import timeit
+
+    for (special, code) in zip(special_characters, code_characters):
+        assert encode(special) == code and decode(code) == special, special
+    sample = "Jos\u00e9 \u00c9lo\u00efse M\u00fcller-\u00d8rsted, Fran\u00e7ois"
+    assert decode(encode(sample)) == sample
+    assert decode(encode("".join(special_characters))) == "".join(special_characters)
+    assert decode("!@!e2!!@!e2!") == "\u00e9\u00e9" and decode("!@!!@!e2!") == "!@!\u00e9"
+    assert decode("!@!z9!") == "!@!z9!"
+    assert sanitize('a*b:c"d<e>f,g/h|i?j\tk\rl\nm\\n') == "a-b-c-d-e-f-g-h-i-j-k-l-m-n"
+    assert one_line("a\tb\rc\nd") == "a b c d"
+    print("round trips ok")
+
+    def replace_loop(text, characters, table):
+        for char in characters:
+            if char in text:
+                text = text.replace(char, table[char])
+        return text
+
+    encoded = encode(sample)
+    long_text = sample * 50
+    for (name, old, new) in (
+            ("encode", lambda: replace_loop(sample, special_characters, char_dict_special_to_code),
+             lambda: encode(sample)),
+            ("decode", lambda: replace_loop(encoded, code_characters, char_dict_code_to_special),
+             lambda: decode(encoded)),
+            ("encode (long text)", lambda: replace_loop(long_text, special_characters, char_dict_special_to_code),
+             lambda: encode(long_text)),
+            ("encode (plain text)", lambda: replace_loop("Person 00042", special_characters,
+                                                         char_dict_special_to_code),
+             lambda: encode("Person 00042")),
+            ("decode (plain text)", lambda: replace_loop("Person 00042", code_characters, char_dict_code_to_special),
+             lambda: decode("Person 00042")),
+            ("sanitize", lambda: replace_loop(sample + ".jpg", bad_file_name_list,
+                                              dict.fromkeys(bad_file_name_list, "-")),
+             lambda: sanitize(sample + ".jpg"))):
+        old_time = timeit.timeit(old, number=20000) / 20000
+        new_time = timeit.timeit(new, number=20000) / 20000
+        print(f"{name}: replace loop {old_time * 1e6:.2f} us, table {new_time * 1e6:.2f} us "
+              f"({old_time / new_time:.1f}x)")
@@ -0,0 +1,2 @@
+from Library.console.channel import ChannelConsole, UIChannel
+from Library.console.logconsole import LogConsole
@@ -0,0 +1,137 @@
+"""
+Name: UI Channel
+Description: Carries the messages and screen changes of the worker threads (the QR Reader, the uploader, the session
+    timer) to the Kivy thread, the only one that may change widgets. Threads post to the channel, which keeps them in
+    order until the next frame, when the Kivy Clock runs them all at once. Messages posted to the same console one
+    after the other are merged and written with one write(), so a burst of scans is laid out once per frame instead of
+    once per scan.
+    If the Kivy thread falls behind (while it is busy with something else), only the last max_pending messages are
+    kept, older ones are dropped, so the worker threads never wait on the screen and the channel doesn't grow without
+    end.
+"""
+
+import threading
+from collections import deque
+
+from kivy.clock import Clock
+
+"""
+This class is the channel
+@param max_pending the number of messages kept until the next frame, older ones are dropped
+"""
+
+
+class UIChannel:
+    def __init__(self, max_pending=2000):
+        self.max_pending = max_pending
+        self.posted = 0  # messages posted
+        self.merged = 0  # messages written along with the message before them
+        self.dropped = 0  # messages dropped because too many were waiting
+        self.drains = 0  # frames the channel was emptied on
+        self._pending = deque()  # [console, [messages]] to write, or [function, args] to call, in the order posted
+        self._messages = 0  # messages waiting in _pending
+        self._lock = threading.Lock()
+        self._trigger = Clock.create_trigger(self._drain)
+
+    """
+    Writes a message to a console on the next frame
+    @param console the LogConsole
+    @param message the message, with BBCode markup
+    """
+
+    def write(self, console, message):
+        with self._lock:
+            self.posted += 1
+            first = not self._pending
+            last = self._pending[-1] if self._pending else None
+            if last is not None and last[0] is console and isinstance(last[1], list):
+                last[1].append(message)
+                self.merged += 1
+            else:
+                self._pending.append([console, [message]])
+            self._messages += 1
+            if self._messages > self.max_pending:
+                self._drop_oldest()
+        if first:
+            self._trigger()
+
+    """
+    Calls a function on the next frame, after the messages posted before it are written. Calls are never dropped.
+    @param function the function, such as a method opening a popup
+    @param args its arguments
+    """
+
+    def call(self, function, *args):
+        with self._lock:
+            first = not self._pending
+            self._pending.append([function, args])
+        if first:
+            self._trigger()
+
+    """
+    @param console a LogConsole
+    @return a stand-in for the console that worker threads can use as they would the console itself
+    """
+
+    def console(self, console):
+        return ChannelConsole(self, console)
+
+    """
+    @return a short, single line summary of the channel, such as "UI 5400 messages, 3100 merged, 0 dropped"
+    """
+
+    def summary(self):
+        return f"UI {self.posted} messages, {self.merged} merged, {self.dropped} dropped"
+
+    def _drop_oldest(self):
+        for entry in self._pending:
+            if isinstance(entry[1], list):
+                del entry[1][0]
+                if not entry[1]:
+                    self._pending.remove(entry)
+                self._messages -= 1
+                self.dropped += 1
+                return
+
+    def _drain(self, dt):
+        with self._lock:
+            (pending, self._pending) = (self._pending, deque())
+            self._messages = 0
+        self.drains += 1
+        for (target, payload) in pending:
+            try:
+                if isinstance(payload, list):
+                    target.write("".join(payload))
+                else:
+                    target(*payload)
+            except Exception as e:  # one bad update mustn't stop the others, or the Kivy thread
+                print(e)
+
+
+"""
+This class stands in for a LogConsole on a worker thread: what is written to it, or set on it, is posted to the
+channel
+@param channel the UIChannel
+@param console the LogConsole
+"""
+
+
+class ChannelConsole:
+    def __init__(self, channel, console):
+        self.channel = channel
+        self.console = console
+
+    def write(self, message):
+        self.channel.write(self.console, message)
+
+    """
+    Sets a property of the console on the next frame
+    @param name the name of the property, such as "text"
+    @param value its new value
+    """
+
+    def set(self, name, value):
+        self.channel.call(setattr, self.console, name, value)
+
+    text = property(None, lambda self, text: self.set("text", text))  # setting it starts the console over
+    halign = property(None, lambda self, halign: self.set("halign", halign))
@@ -0,0 +1,139 @@
+"""
+Name: Log Console
+Description: The scrolling text on the main screen. It is a RecycleLabel that messages are added to with write()
+    instead of by adding them to its text: only the lines of the new message are laid out, the lines already shown
+    are left as they are, so a long scanning shift doesn't get slower with every message. Each line is one entry of
+    the RecycleView, and only the last max_lines lines are kept, older ones are dropped (and written to spill_path,
+    if one is given, so nothing is lost).
+    The BBCode markup of the messages (the BaseColors) is kept. A color or style still open at the end of a line is
+    closed there and opened again on the next line, so every line can be shown on its own.
+    Setting text starts the console over with that text, as it did before, even if it is set to the same text again.
+"""
+
+import re
+from collections import deque
+
+from kivy.core.text.markup import MarkupLabel
+from kivy.properties import NumericProperty, StringProperty
+
+from Library.garden.recyclelabel import RecycleLabel
+
+_tag_pattern = re.compile(r"\[(/?)(\w+)(?:=[^\]]*)?\]")
+
+"""
+This function finds the tags still open at the end of a piece of markup
+@param markup the markup
+@param open_tags the tags open at its start, such as ["[color=#009999]"]
+
+@return the tags open at its end
+"""
+
+
+def open_tags_after(markup, open_tags):
+    tags = list(open_tags)
+    for match in _tag_pattern.finditer(markup):
+        if not match.group(1):
+            tags.append(match.group(0))
+        else:  # closes the last tag of the same name, like Kivy does
+            for i in range(len(tags) - 1, -1, -1):
+                if _tag_pattern.match(tags[i]).group(2) == match.group(2):
+                    del tags[i]
+                    break
+    return tags
+
+
+"""
+This class is the console
+"""
+
+
+class LogConsole(RecycleLabel):
+    text = StringProperty("", force_dispatch=True)  # setting it to the same text still starts the console over
+    max_lines = NumericProperty(2000)
+    spill_path = StringProperty("")  # the file lines dropped from the console are added to, "" to not keep them
+
+    def __init__(self, **kwargs):
+        self._lines = deque()  # [markup, tags open at its start, tags open at its end] of each line shown
+        self.written = 0  # lines added with write()
+        self.dropped = 0  # lines dropped from the console, to keep it at max_lines
+        self._line_height = None
+        super(LogConsole, self).__init__(**kwargs)
+        self.bind(text=self._start_over)
+        self._start_over(self, self.text)
+
+    """
+    Adds a message to the console. Like adding it to text, it continues the last line unless it starts with a line
+    break.
+    @param message the message, with BBCode markup
+    """
+
+    def write(self, message):
+        parts = message.split("\n")
+        data = self.ids.rv.data
+        if not self._lines:  # an empty console has one empty line, like an empty text
+            self._lines.append(["", [], []])
+            data.append(None)
+        line = self._lines[-1]  # the first part continues the last line
+        line[0] += parts[0]
+        line[2] = open_tags_after(parts[0], line[2])
+        data[-1] = self._entry(line)
+        for part in parts[1:]:
+            start = self._lines[-1][2]
+            line = ["".join(start) + part, start, open_tags_after(part, start)]
+            self._lines.append(line)
+            data.append(self._entry(line))
+            self.written += 1
+        excess = len(self._lines) - int(self.max_lines)
+        if excess > 0:
+            dropped = [self._lines.popleft() for _ in range(excess)]
+            del data[:excess]
+            self.dropped += excess
+            self._spill(dropped)
+
+    """
+    @return a short, single line summary of the console, such as "console 2000 lines shown, 5400 written, 3400 dropped"
+    """
+
+    def summary(self):
+        return f"console {len(self._lines)} lines shown, {self.written} written, {self.dropped} dropped"
+
+    """
+    Lays all the lines out again, for when the width, font or alignment changes. The lines are kept.
+    """
+
+    def refresh_label(self, *args):
+        self._line_height = None
+        self.ids.rv.data = [self._entry(line) for line in self._lines]
+
+    def _start_over(self, instance, text):
+        self._lines.clear()
+        self.ids.rv.data = []
+        if text:
+            self.write(text)
+
+    def _entry(self, line):
+        closes = "".join(f"[/{_tag_pattern.match(tag).group(2)}]" for tag in reversed(line[2]))
+        text = line[0] + closes
+        return {"text": text, "font_name": self.font_name, "font_size": self.font_size,
+                "height": self._height(text), "size_hint_y": None, "halign": self.halign, "markup": self.markup,
+                "color": self.color, "text_size": (self.width, None)}
+
+    def _height(self, text):
+        if self._line_height is None:
+            self._line_height = self._measure("X")
+        return max(self._line_height, self._measure(text)) if text else self._line_height
+
+    def _measure(self, text):
+        label = MarkupLabel(text=text, text_size=(self.width, None), halign=self.halign, font_size=self.font_size,
+                            font_name=self.font_name)
+        label.resolve_font_name()
+        return label.render()[1]
+
+    def _spill(self, lines):
+        if not self.spill_path:
+            return
+        try:
+            with open(self.spill_path, "a", encoding="utf-8") as spill_file:
+                spill_file.writelines(_tag_pattern.sub("", line[0]) + "\n" for line in lines)
+        except OSError as e:
+            print(e)
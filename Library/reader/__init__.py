@@ -0,0 +1,7 @@
+from Library.reader.backends import BACKENDS, choose_backend, get_backend
+from Library.reader.decoder import FrameDecoder
+from Library.reader.ladder import ResolutionLadder
+from Library.reader.motion import MotionGate
+from Library.reader.overlay import LabelOverlay
+from Library.reader.pipeline import ScanPipeline, ScanResult, StageMeter
+from Library.reader.tracking import RoiTracker
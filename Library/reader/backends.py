@@ -0,0 +1,153 @@
+"""
+Name: Decoder Backends
+Description: The libraries the QR Reader can decode frames with. Every backend has a name and a decode(image) method
+    that returns a list of barcodes with the same fields pyzbar uses (data as bytes, type, rect and polygon), so the
+    rest of the reader does not need to know which one is in use.
+    choose_backend() runs a short benchmark on live frames to pick the fastest backend that still reads reliably on the
+    machine the tool is running on.
+"""
+
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+from pyzbar import pyzbar
+from pyzbar.pyzbar import ZBarSymbol
+
+# the same fields as the barcodes returned by pyzbar
+Barcode = namedtuple("Barcode", ["data", "type", "rect", "polygon"])
+Rect = namedtuple("Rect", ["left", "top", "width", "height"])
+Point = namedtuple("Point", ["x", "y"])
+
+"""
+This class decodes QR codes with pyzbar (the ZBar library)
+"""
+
+
+class PyzbarBackend:
+    name = "pyzbar"
+
+    def decode(self, image):
+        return pyzbar.decode(image, symbols=[ZBarSymbol.QRCODE])
+
+
+"""
+This class decodes QR codes with OpenCV's QRCodeDetector, reading several codes per frame when the installed OpenCV
+supports it. A detector is kept per thread, since a detector can't be shared between the decode workers.
+"""
+
+
+class OpenCVBackend:
+    name = "opencv"
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def decode(self, image):
+        detector = getattr(self._local, "detector", None)
+        if detector is None:
+            detector = self._local.detector = cv2.QRCodeDetector()
+
+        if hasattr(detector, "detectAndDecodeMulti"):  # OpenCV 4.3 and newer
+            found, texts, points = detector.detectAndDecodeMulti(image)[:3]
+        else:
+            text, quad = detector.detectAndDecode(image)[:2]
+            found, texts, points = bool(text), [text], None if quad is None else [quad]
+        if not found or points is None:
+            return []
+
+        barcodes = []
+        for text, quad in zip(texts, points):
+            if not text:  # a code was found but could not be read
+                continue
+            quad = np.asarray(quad).reshape(-1, 2)
+            (x, y) = quad.min(axis=0)
+            (x1, y1) = quad.max(axis=0)
+            barcodes.append(Barcode(text.encode("utf-8"), "QRCODE",
+                                    Rect(int(x), int(y), int(x1 - x), int(y1 - y)),
+                                    [Point(int(px), int(py)) for (px, py) in quad]))
+        return barcodes
+
+
+# the backends that can be chosen in the settings.csv file, by name
+BACKENDS = {PyzbarBackend.name: PyzbarBackend, OpenCVBackend.name: OpenCVBackend}
+
+"""
+This function creates a backend by its name
+@param name the name of the backend, one of the keys of BACKENDS
+
+@return the new backend, or a pyzbar backend if the name is not known
+"""
+
+
+def get_backend(name):
+    return BACKENDS.get(name, PyzbarBackend)()
+
+
+"""
+This function pastes a QR code with a known payload onto copies of live frames, so that backends can be checked for
+whether they read it. The code is pasted in two sizes, to test both close and distant codes.
+@param frames the live frames from the camera
+@param payload the text to put in the QR code
+@param width the width the frames are shrunk to, the same width the reader decodes frames at first
+
+@return a list of the frames with the QR code pasted onto them
+"""
+
+
+def probe_frames(frames, payload, width=400):
+    import qrcode  # only needed for the benchmark
+
+    code = np.array(qrcode.make(payload).convert("L"))
+    probes = []
+    for frame in frames:
+        frame = cv2.resize(frame, (width, int(frame.shape[0] * width / frame.shape[1])))
+        for fraction in (0.35, 0.2):
+            size = min(int(width * fraction), frame.shape[0])
+            resized = cv2.cvtColor(cv2.resize(code, (size, size), interpolation=cv2.INTER_NEAREST),
+                                   cv2.COLOR_GRAY2BGR)
+            probe = frame.copy()
+            (y, x) = ((frame.shape[0] - size) // 2, (frame.shape[1] - size) // 2)
+            probe[y:y + size, x:x + size] = resized
+            probes.append(probe)
+    return probes
+
+
+"""
+This function times each backend on frames with a known QR code pasted onto them, and picks the fastest backend that
+reads the code about as often as the best one does
+@param frames the live frames from the camera
+@param names the names of the backends to try
+@param repeats how many times each frame is decoded by each backend
+@param reliability the share of the best backend's reads a backend must reach to be picked
+
+@return the name of the chosen backend, and a dictionary of {name: (average seconds per frame, share of frames read)}
+"""
+
+
+def choose_backend(frames, names=tuple(BACKENDS), repeats=3, reliability=0.95):
+    payload = "QR Toolbox benchmark"
+    probes = probe_frames(frames, payload)
+    results = {}
+    for name in names:
+        backend = get_backend(name)
+        try:
+            backend.decode(probes[0])  # warm up, the first call can be much slower
+        except Exception:  # a backend that fails on this machine is never chosen
+            continue
+        read = 0
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for probe in probes:
+                if any(barcode.data == payload.encode("utf-8") for barcode in backend.decode(probe)):
+                    read += 1
+        elapsed = time.perf_counter() - start
+        results[name] = (elapsed / (repeats * len(probes)), read / (repeats * len(probes)))
+
+    if not results:
+        return PyzbarBackend.name, results
+    best_read = max(read for (_, read) in results.values())
+    reliable = [name for name, (_, read) in results.items() if read >= best_read * reliability]
+    return min(reliable, key=lambda name: results[name][0]), results
@@ -0,0 +1,79 @@
+"""
+Name: Frame Decoder
+Description: Finds and decodes the QR codes in a single video frame. One instance is shared by all the decode workers
+    of the scan pipeline, so anything it keeps between frames must be thread safe.
+"""
+
+from Library.reader.backends import PyzbarBackend
+
+"""
+This class decodes the QR codes found in the frames handed to it by the scan pipeline
+@param gate an optional MotionGate (see motion.py), if given then frames without motion are not decoded, unless codes
+were found in the last frame decoded: a badge held still, or one that was in view when the background was started,
+looks like the background to the gate
+@param tracker an optional RoiTracker (see tracking.py), if given then only the area around the last codes is decoded
+while they stay in view
+@param ladder an optional ResolutionLadder (see ladder.py), if given then full frames are decoded at the lowest
+resolution that finds the codes, otherwise they are decoded at the resolution they come in at
+@param backend the backend (see backends.py) the images are decoded with, pyzbar if not given
+"""
+
+
+class FrameDecoder:
+    def __init__(self, gate=None, tracker=None, ladder=None, backend=None):
+        self.gate = gate
+        self.tracker = tracker
+        self.ladder = ladder
+        self.backend = backend if backend is not None else PyzbarBackend()
+        self.codes_in_view = False  # codes were found in the last frame decoded
+
+    """
+    @param frame the frame to look for QR codes in
+
+    @return a list of the decoded barcodes, each with the data, type and rect (x, y, w, h) of the code
+    """
+
+    def decode(self, frame):
+        if self.gate is not None and not self.gate.should_decode(frame, hold=self.codes_in_view):
+            return []  # nothing moved in front of the camera, so there is no new code to read
+
+        if self.tracker is not None:
+            box = self.tracker.region(frame.shape)
+            if box is not None:  # decode only the area around the last codes
+                (x0, y0, x1, y1) = box
+                barcodes = [move(barcode, x0, y0) for barcode in self._decode(frame[y0:y1, x0:x1])]
+                if barcodes:
+                    self.tracker.update([barcode.rect for barcode in barcodes], full=False)
+                    self.codes_in_view = True
+                    return barcodes
+                self.tracker.missed()  # the codes moved or left, fall back to the full frame
+
+        barcodes = self._decode(frame) if self.ladder is None else self.ladder.decode(frame, self._decode)
+        if self.tracker is not None:
+            self.tracker.update([barcode.rect for barcode in barcodes], full=True)
+        self.codes_in_view = bool(barcodes)
+        return barcodes
+
+    def _decode(self, image):
+        return self.backend.decode(image)
+
+
+"""
+This function moves and scales a decoded barcode into the coordinates of another image, each coordinate becomes
+coordinate * scale + offset
+@param barcode the decoded barcode
+@param dx how far to move the barcode to the right
+@param dy how far to move the barcode down
+@param scale how much to scale the barcode by
+
+@return the barcode, with its rect and polygon moved
+"""
+
+
+def move(barcode, dx=0, dy=0, scale=1.0):
+    if dx == 0 and dy == 0 and scale == 1.0:
+        return barcode
+    (x, y, w, h) = barcode.rect
+    rect = type(barcode.rect)(int(x * scale + dx), int(y * scale + dy), int(w * scale), int(h * scale))
+    polygon = [type(point)(int(point[0] * scale + dx), int(point[1] * scale + dy)) for point in barcode.polygon]
+    return barcode._replace(rect=rect, polygon=polygon)
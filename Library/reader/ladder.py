@@ -0,0 +1,102 @@
+"""
+Name: Resolution Ladder
+Description: Decodes a frame at a low resolution first, and only climbs to higher resolutions (up to the camera's native
+    resolution) when the cheaper pass found nothing but a QR finder pattern (one of the three nested squares in the
+    corners of a code) is likely to be in the frame. Small, distant codes then still decode, while close codes cost
+    no more than a low resolution pass.
+"""
+
+import threading
+import time
+
+import cv2
+import imutils
+import numpy as np
+
+from Library.reader.decoder import move
+
+"""
+This class decodes frames by climbing a ladder of resolutions, and keeps statistics on which level each hit came from
+@param widths the widths to try, from cheapest to most expensive, None meaning the frame's own (native) width
+@param budget the most time (in seconds) to spend on one frame, no higher level is started after this has passed
+"""
+
+
+class ResolutionLadder:
+    def __init__(self, widths=(400, 800, None), budget=0.05):
+        self.widths = widths
+        self.budget = budget
+        self.hits = [0] * len(widths)  # how many frames were decoded at each level
+        self.misses = 0  # frames where no level found a code
+        self.climbs = 0  # times a higher level was tried because a finder pattern was likely
+        self.over_budget = 0  # times the ladder stopped climbing because the frame's time budget ran out
+        self._lock = threading.Lock()
+
+    """
+    @param frame the frame to decode, at the camera's native resolution
+    @param decode the function that decodes an image, returning a list of barcodes
+
+    @return a list of the decoded barcodes, with their rects in the coordinates of the frame passed in
+    """
+
+    def decode(self, frame, decode):
+        start = time.monotonic()
+        native = frame.shape[1]
+        for level, width in enumerate(self.widths):
+            last = width is None or width >= native
+            if level > 0 and time.monotonic() - start > self.budget:
+                self._count("over_budget")
+                break
+            image = frame if last else imutils.resize(frame, width=width)
+            if level > 0:
+                if not finder_pattern_likely(image):  # nothing that looks like a code, don't pay for a decode
+                    break
+                self._count("climbs")
+
+            barcodes = decode(image)
+            if barcodes:
+                with self._lock:
+                    self.hits[level] += 1
+                scale = native / image.shape[1]
+                return [move(barcode, scale=scale) for barcode in barcodes]
+            if last:
+                break
+        self._count("misses")
+        return []
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    """
+    @return a short description of how many hits came from each level, such as "400px: 12, 800px: 3, native: 1"
+    """
+
+    def summary(self):
+        return ", ".join(f"{'native' if width is None else f'{width}px'}: {hits}"
+                         for width, hits in zip(self.widths, self.hits))
+
+
+"""
+This function looks for QR finder patterns: a square outline with another outline inside it and a filled square inside
+that. It only counts nested, roughly square contours, so it is much cheaper than a full decode.
+@param image the image to look in
+@param min_size the smallest width (in pixels) a finder pattern can have and still be decoded
+
+@return True if at least one finder pattern is likely to be in the image
+"""
+
+
+def finder_pattern_likely(image, min_size=7):
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
+    thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1]  # dark modules become white
+    contours, hierarchy = cv2.findContours(thresh, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)[-2:]
+    if hierarchy is None:
+        return False
+    child = hierarchy[0][:, 2]
+    grandchild = np.where(child >= 0, hierarchy[0][np.maximum(child, 0), 2], -1)
+    for i in np.flatnonzero(grandchild >= 0):  # contours with two levels of contours nested inside them
+        (x, y, w, h) = cv2.boundingRect(contours[i])
+        if w >= min_size and h >= min_size and 0.7 <= w / h <= 1.3:
+            return True
+    return False
@@ -0,0 +1,98 @@
+"""
+Name: Motion Gate
+Description: The running background model from AdvancedMotion.py, packaged so the QR Reader can skip decoding frames in
+    which nothing moved. The background is kept with cv2.accumulateWeighted, and changed areas are found with contours
+    on the thresholded difference between the frame and the background.
+"""
+
+import threading
+import time
+
+import cv2
+import imutils
+
+"""
+This class decides whether a frame is worth decoding, based on whether anything moved in it
+@param width frames wider than this are shrunk to this width before being compared to the background
+@param delta_thresh how big the difference in pixels must be to pick up motion
+@param weight affects how long before objects get added to background, lower = longer
+@param min_area how big a difference (in pixels, at the given width) needs to be to get picked up. The default is
+about a 40 pixel square, well below a badge held at working distance (one 140 pixels wide in a 1280 pixel frame is 55
+pixels wide at 500)
+@param keepalive a frame is decoded at least this often (in seconds), even if no motion was seen
+"""
+
+
+class MotionGate:
+    def __init__(self, width=500, delta_thresh=50, weight=0.0001, min_area=1500, keepalive=2.0):
+        self.width = width
+        self.delta_thresh = delta_thresh
+        self.weight = weight
+        self.min_area = min_area
+        self.keepalive = keepalive
+        self.checked = 0  # frames that went through the gate
+        self.skipped = 0  # frames that were not decoded because nothing moved in them
+        self.gray = None  # the last blurred grayscale frame, difference and threshold images, kept for displaying
+        self.delta = None
+        self.thresh = None
+        self._avg = None  # the running background
+        self._last_open = 0.0
+        self._lock = threading.Lock()
+
+    """
+    Compares the frame to the background, and then adds the frame to the background
+    @param frame the frame to look for motion in
+
+    @return a list of (x, y, w, h) boxes around the areas that changed, in the coordinates of the frame passed in, or
+    None if this was the first frame and the background model was just started
+    """
+
+    def detect(self, frame):
+        scale = 1.0
+        if frame.shape[1] > self.width:
+            scale = frame.shape[1] / self.width
+            frame = imutils.resize(frame, width=self.width)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        gray = cv2.GaussianBlur(gray, (21, 21), 0)
+
+        with self._lock:  # the background is shared by all the decode workers
+            if self._avg is None:  # if the average frame is None, initialize it
+                self._avg = gray.copy().astype("float")
+                return None
+            cv2.accumulateWeighted(gray, self._avg, self.weight)
+            delta = cv2.absdiff(gray, cv2.convertScaleAbs(self._avg))
+
+        thresh = cv2.threshold(delta, self.delta_thresh, 255, cv2.THRESH_BINARY)[1]
+        thresh = cv2.dilate(thresh, None, iterations=3)  # 'iterations' determines how smoothed, but higher is slower
+        contours = imutils.grab_contours(cv2.findContours(thresh.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE))
+        self.gray, self.delta, self.thresh = gray, delta, thresh
+
+        # the minimum area is given for frames at the gate's width, so scale it for frames that are narrower
+        min_area = self.min_area * min(1.0, frame.shape[1] / self.width) ** 2
+        boxes = []
+        for c in contours:
+            if cv2.contourArea(c) < min_area:  # if the contour is too small, ignore it
+                continue
+            (x, y, w, h) = cv2.boundingRect(c)
+            boxes.append((int(x * scale), int(y * scale), int(w * scale), int(h * scale)))
+        return boxes
+
+    """
+    @param frame the frame that is about to be decoded
+    @param hold True to decode the frame whatever the gate sees, such as while codes are in view. The frame is still
+    added to the background.
+
+    @return True if the frame should be decoded (motion was seen, the keep-alive interval has passed or the gate is
+    held open), False if decoding can be skipped
+    """
+
+    def should_decode(self, frame, hold=False):
+        boxes = self.detect(frame)
+        now = time.monotonic()
+        with self._lock:
+            self.checked += 1
+            if hold or boxes is None or boxes or now - self._last_open >= self.keepalive:
+                self._last_open = now
+                return True
+            self.skipped += 1
+            return False
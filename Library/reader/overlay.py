@@ -0,0 +1,150 @@
+"""
+Name: Label Overlay
+Description: Draws the text of each decoded QR code above it on the video frame. A label is rendered with PIL once,
+    the first time its text is seen, and kept as small arrays of its colors and of how opaque each pixel is. Drawing
+    it on a frame then only blends those pixels into the frame's numpy array, in place, instead of turning the whole
+    frame into a PIL image and back for every code on every frame. The most recently used labels are kept, the others
+    are dropped once there are more than max_labels of them.
+    The pixels are blended with the same integer arithmetic as PIL's paste, so the frames come out the same as they
+    did with it, byte for byte, whether the default font is a bitmap font or, from Pillow 10.1 on, an anti-aliased one
+    whose edges are partly transparent.
+        python -m Library.reader.overlay
+    compares the time it takes to label a frame with both.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+from PIL import ImageDraw
+
+"""
+This class renders the labels, keeps the most recently used ones and draws them on frames
+@param width the width of a label, text past it is cut off
+@param height the height of a label
+@param color the color of the text, in the channel order of the frames
+@param max_labels the number of labels kept
+"""
+
+
+class LabelOverlay:
+    def __init__(self, width=400, height=15, color=(0, 0, 255), max_labels=256):
+        self.width = width
+        self.height = height
+        self.color = np.array(color, dtype=np.uint8)
+        self.max_labels = max_labels
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._labels = OrderedDict()  # text -> (color times opacity, 255 - opacity), None if the text can't be drawn
+        self._lock = threading.Lock()
+
+    """
+    Draws a label on a frame, in place
+    @param frame the frame, a numpy array of shape (height, width, 3)
+    @param x the left of the label
+    @param y the top of the label, it may be above the frame, the part outside the frame is cut off
+    @param text the text of the label
+
+    @return False if the text can't be drawn with the default font (it has characters the font doesn't have)
+    """
+
+    def draw(self, frame, x, y, text):
+        label = self.label(text)
+        if label is None:
+            return False
+        (ink, clear) = label
+        (frame_height, frame_width) = frame.shape[:2]
+        (x0, y0) = (max(x, 0), max(y, 0))
+        (x1, y1) = (min(x + ink.shape[1], frame_width), min(y + ink.shape[0], frame_height))
+        if x0 < x1 and y0 < y1:
+            region = frame[y0:y1, x0:x1]
+            # frame * (255 - opacity) + color * opacity, divided by 255 and rounded the way PIL's paste does it
+            blend = region * clear[y0 - y:y1 - y, x0 - x:x1 - x] + ink[y0 - y:y1 - y, x0 - x:x1 - x] + 128
+            region[...] = ((blend >> 8) + blend) >> 8
+        return True
+
+    """
+    @return the label, as the color of its pixels times their opacity and 255 minus their opacity (uint16 arrays of
+    shape (height, width, 3)), rendering it if it isn't kept yet, or None if the text can't be drawn
+    """
+
+    def label(self, text):
+        with self._lock:
+            if text in self._labels:
+                self._labels.move_to_end(text)
+                self.hits += 1
+                return self._labels[text]
+        mask = self._render(text)
+        with self._lock:
+            self.misses += 1
+            self._labels[text] = mask
+            if len(self._labels) > self.max_labels:
+                self._labels.popitem(last=False)
+                self.evictions += 1
+        return mask
+
+    """
+    @return a short, single line summary of the labels, such as "labels 1200 reused, 14 rendered, 0 dropped"
+    """
+
+    def summary(self):
+        return f"labels {self.hits} reused, {self.misses} rendered, {self.evictions} dropped"
+
+    def _render(self, text):
+        img = Image.new('RGBA', (self.width, self.height), color=(255, 255, 255, 0))  # as the PIL paste drew it
+        try:
+            ImageDraw.Draw(img).text((0, 0), text, fill=tuple(int(c) for c in self.color) + (255,))
+        except UnicodeEncodeError:
+            return None
+        pixels = np.asarray(img).astype(np.uint16)
+        columns = np.flatnonzero(pixels[:, :, 3].any(axis=0))
+        pixels = pixels[:, :columns[-1] + 1] if len(columns) else pixels[:, :0]  # the part right of the text is clear
+        opacity = pixels[:, :, 3:]
+        return pixels[:, :, :3] * opacity, np.repeat(255 - opacity, 3, axis=2)
+
+
+"""
+This function labels a frame the way the QR Reader used to, for the benchmark
+@return the new frame
+"""
+
+
+def _draw_with_pil(frame, x, y, text):
+    img = Image.new('RGB', (400, 15), color='white')
+    img.putalpha(0)
+    d = ImageDraw.Draw(img)
+    d.text((0, 0), text, fill='blue')
+    pil_image = Image.fromarray(frame)
+    pil_image.paste(img, box=(x, y), mask=img)
+    return np.array(pil_image)
+
+
+if __name__ == '__main__':
+    # the time to label a frame with 1 and 3 codes in it, the old way and from kept labels
+    import timeit
+
+    overlay = LabelOverlay()
+    rng = np.random.default_rng(0)
+    for (height, width) in ((480, 640), (1080, 1920)):
+        base = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        for codes in (1, 3):
+            labels = [(40 + 150 * i, 100 + 80 * i, f"Person {i:05d} (QRCODE)") for i in range(codes)]
+
+            def old(frame=base.copy()):
+                for (x, y, text) in labels:
+                    frame = _draw_with_pil(frame, x, y, text)
+                return frame
+
+            def new(frame=base.copy()):
+                for (x, y, text) in labels:
+                    overlay.draw(frame, x, y, text)
+                return frame
+
+            assert np.array_equal(old(base.copy()), new(base.copy()))  # the same frame, whatever the default font
+            old_time = timeit.timeit(old, number=200) / 200
+            new_time = timeit.timeit(new, number=200) / 200
+            print(f"{width}x{height}, {codes} codes: PIL {old_time * 1e6:.0f} us, overlay {new_time * 1e6:.0f} us "
+                  f"per frame ({old_time / new_time:.0f}x)")
+    print(overlay.summary())
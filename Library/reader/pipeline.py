@@ -0,0 +1,305 @@
+"""
+Name: Scan Pipeline
+Description: Splits the QR Reader loop into stages that run on their own threads, so that a slow step in one stage
+    does not stall the others:
+        1. Capture - reads the video stream and always holds only the newest frame
+        2. Decode - a pool of workers that take the newest frame and look for QR codes in it
+        3. Result - the caller (the video() function) pulls decoded frames and runs the check-in/out logic on them
+    The hand-offs between the stages are bounded and drop stale frames instead of backing up.
+"""
+
+import threading
+import time
+from collections import deque, namedtuple
+
+import imutils
+
+from Library.reader.decoder import move
+
+# one decoded frame, as handed from the decode workers to the result stage
+ScanResult = namedtuple("ScanResult", ["seq", "captured", "frame", "barcodes"])
+
+"""
+This class keeps track of how many frames per second a stage sustains, measured over a short sliding window, and of
+how long the stage took for its most recent frames
+@param name the name of the stage, used when the rates are printed
+@param window the length (in seconds) of the sliding window
+@param samples the number of recent latencies kept for percentiles
+"""
+
+
+class StageMeter:
+    def __init__(self, name, window=2.0, samples=10000):
+        self.name = name
+        self.window = window
+        self.count = 0  # total number of frames handled by the stage
+        self.started = None
+        self.last = None
+        self._ticks = deque()
+        self._latencies = deque(maxlen=samples)
+        self._lock = threading.Lock()
+
+    """
+    Records that the stage finished handling one frame
+    @param latency how long (in seconds) the stage took for the frame, if known
+    """
+
+    def tick(self, latency=None):
+        now = time.monotonic()
+        with self._lock:
+            if self.started is None:
+                self.started = now
+            self.count += 1
+            self.last = now
+            self._ticks.append(now)
+            self._trim(now)
+            if latency is not None:
+                self._latencies.append(latency)
+
+    def _trim(self, now):
+        while self._ticks and now - self._ticks[0] > self.window:
+            self._ticks.popleft()
+
+    """
+    @return the rate (frames per second) the stage is currently sustaining
+    """
+
+    def fps(self):
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            if not self._ticks:
+                return 0.0
+            span = min(self.window, now - self.started)
+            return len(self._ticks) / span if span > 0 else 0.0
+
+    """
+    @return the average rate (frames per second) of the stage since it handled its first frame
+    """
+
+    def average_fps(self):
+        with self._lock:
+            if self.count < 2 or self.last == self.started:
+                return 0.0
+            return (self.count - 1) / (self.last - self.started)
+
+    """
+    @param percents the percentiles wanted, such as 50, 95, 99
+
+    @return a list of the latencies (in seconds) at those percentiles, or an empty list if none were recorded
+    """
+
+    def percentiles(self, *percents):
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if not latencies:
+            return []
+        return [latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))] for p in percents]
+
+
+"""
+This class is a single slot that always holds the newest captured frame. Putting a frame into a full slot replaces
+the frame that was there (it is counted as dropped), so the decode workers never work on an old frame.
+"""
+
+
+class LatestFrame:
+    def __init__(self):
+        self.dropped = 0  # frames that were replaced before any worker took them
+        self.closed = False
+        self._item = None
+        self._seq = 0
+        self._cond = threading.Condition()
+
+    def put(self, frame):
+        with self._cond:
+            if self._item is not None:
+                self.dropped += 1
+            self._seq += 1
+            self._item = (self._seq, time.monotonic(), frame)
+            self._cond.notify()
+
+    """
+    Waits for a new frame and takes it out of the slot, so that no other worker decodes the same frame
+    @param timeout how long to wait (in seconds) for a frame
+
+    @return a (seq, captured, frame) tuple, or None if there was no new frame in time or the slot was closed
+    """
+
+    def take(self, timeout=None):
+        with self._cond:
+            self._cond.wait_for(lambda: self._item is not None or self.closed, timeout)
+            item = self._item
+            self._item = None
+            return item
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+"""
+This class is a bounded first-in-first-out queue that drops its oldest entry when it is full, instead of blocking the
+stage that is putting items in it
+@param maxsize the number of items the queue holds before the oldest one is dropped
+"""
+
+
+class DropQueue:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._items = deque()
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    """
+    @param timeout how long to wait (in seconds) for an item
+    @return the oldest item in the queue, or None if the queue stayed empty
+    """
+
+    def get(self, timeout=None):
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items, timeout):
+                return None
+            return self._items.popleft()
+
+    def __len__(self):
+        return len(self._items)
+
+
+"""
+This class runs the capture and decode stages of the QR Reader on their own threads, and hands the decoded frames
+to the result stage (the caller) through next_result()
+@param stream the video stream to read frames from (anything with a read() method that returns a frame or None)
+@param decoder the object used to find the QR codes in a frame (see decoder.py)
+@param workers the number of decode worker threads
+@param display_width the width decoded frames are resized to before being handed to the result stage, frames are
+decoded at the resolution the stream provides them
+@param result_queue_size the number of decoded frames that can wait for the result stage before the oldest is dropped
+"""
+
+
+class ScanPipeline:
+    def __init__(self, stream, decoder, workers=2, display_width=400, result_queue_size=4):
+        self.stream = stream
+        self.decoder = decoder
+        self.workers = max(1, int(workers))
+        self.display_width = display_width
+        self.stream_lost = False  # set by the capture stage if the video stream stops working
+        self.stale = 0  # decoded frames that arrived at the result stage after a newer frame had
+        self.capture_meter = StageMeter("capture")
+        self.decode_meter = StageMeter("decode")
+        self.result_meter = StageMeter("result")
+        self._frames = LatestFrame()
+        self._results = DropQueue(result_queue_size)
+        self._stop = threading.Event()
+        self._threads = []
+        self._last_seq = 0
+
+    def start(self):
+        self._threads = [threading.Thread(target=self._capture, name="qr-capture", daemon=True)]
+        for i in range(self.workers):
+            self._threads.append(threading.Thread(target=self._decode, name=f"qr-decode-{i}", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    """
+    Stops all the stages and waits for their threads to finish. The video stream itself is not stopped.
+    """
+
+    def stop(self):
+        self._stop.set()
+        self._frames.close()
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+        self._threads = []
+
+    """
+    The capture stage. Reads frames as fast as the stream provides them and keeps only the newest one.
+    """
+
+    def _capture(self):
+        last_frame = None
+        while not self._stop.is_set():
+            start = time.monotonic()
+            try:  # if the video stream stops working or is changed
+                frame = self.stream.read()
+                if frame is None:
+                    raise ValueError("no frame returned by the video stream")
+            except Exception:  # then let the result stage know, so that it can clean up
+                self.stream_lost = True
+                break
+            if frame is last_frame:  # threaded streams return the same frame until the camera delivers a new one
+                time.sleep(0.002)
+                continue
+            last_frame = frame
+            self._frames.put(frame)
+            self.capture_meter.tick(time.monotonic() - start)
+        self._frames.close()
+
+    """
+    A decode worker. Takes the newest frame, decodes it, and passes it on to the result stage at the display size.
+    """
+
+    def _decode(self):
+        while not self._stop.is_set():
+            item = self._frames.take(timeout=0.25)
+            if item is None:
+                if self._frames.closed:
+                    break
+                continue
+            seq, captured, frame = item
+            start = time.monotonic()
+            barcodes = self.decoder.decode(frame)
+            if self.display_width is not None and frame.shape[1] > self.display_width:
+                scale = self.display_width / frame.shape[1]
+                frame = imutils.resize(frame, width=self.display_width)
+                barcodes = [move(barcode, scale=scale) for barcode in barcodes]
+            self._results.put(ScanResult(seq, captured, frame, barcodes))
+            self.decode_meter.tick(time.monotonic() - start)
+
+    """
+    The hand-off to the result stage. Results that are older than one already returned are dropped.
+    @param timeout how long to wait (in seconds) for a decoded frame
+
+    @return the next ScanResult, or None if no new frame was decoded in time
+    """
+
+    def next_result(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            result = self._results.get(timeout=remaining)
+            if result is None:
+                return None
+            if result.seq < self._last_seq:  # a worker finished an older frame after a newer one was handed on
+                self.stale += 1
+                continue
+            self._last_seq = result.seq
+            self.result_meter.tick(time.monotonic() - result.captured)  # from capture to the result stage
+            return result
+
+    """
+    @return the number of frames dropped anywhere in the pipeline before they reached the result stage
+    """
+
+    def dropped(self):
+        return self._frames.dropped + self._results.dropped + self.stale
+
+    """
+    @return a short, single line summary of the rate each stage is sustaining
+    """
+
+    def summary(self):
+        return " | ".join(f"{meter.name} {meter.fps():.1f} fps" for meter in
+                          (self.capture_meter, self.decode_meter, self.result_meter))
@@ -0,0 +1,71 @@
+"""
+Name: Region of Interest Tracker
+Description: Remembers where the last QR codes were found, so that while a code stays in front of the camera the next
+    frames only need to be decoded in a padded area around it. A full frame is still decoded every few frames, and
+    whenever the padded area comes up empty, so that new codes elsewhere in the frame are not missed.
+"""
+
+import threading
+
+"""
+This class tracks the area of the frame that the last decoded QR codes were found in
+@param padding how much room is left around the last codes, as a fraction of their size
+@param full_every a full frame is decoded at least once every this many frames while tracking
+"""
+
+
+class RoiTracker:
+    def __init__(self, padding=0.5, full_every=10):
+        self.padding = padding
+        self.full_every = full_every
+        self.crop_hits = 0  # frames decoded from the tracked area only
+        self.crop_misses = 0  # frames where the tracked area came up empty and the full frame had to be decoded
+        self.full_decodes = 0  # frames decoded in full
+        self._rect = None  # (x, y, w, h) around all the codes found last, None if nothing is being tracked
+        self._since_full = 0
+        self._lock = threading.Lock()
+
+    """
+    @param shape the shape of the frame that is about to be decoded
+
+    @return the (x0, y0, x1, y1) area of the frame to decode, or None if the full frame should be decoded
+    """
+
+    def region(self, shape):
+        with self._lock:
+            if self._rect is None or self._since_full >= self.full_every:
+                return None
+            self._since_full += 1
+            (x, y, w, h) = self._rect
+        pad = int(max(w, h) * self.padding)
+        x0, y0 = max(0, x - pad), max(0, y - pad)
+        x1, y1 = min(shape[1], x + w + pad), min(shape[0], y + h + pad)
+        if x1 <= x0 or y1 <= y0:
+            return None
+        return x0, y0, x1, y1
+
+    """
+    Updates the tracked area with the codes that were just decoded
+    @param rects the (x, y, w, h) rects of the decoded codes, in the coordinates of the full frame
+    @param full True if these came from decoding the full frame, False if from the tracked area only
+    """
+
+    def update(self, rects, full):
+        with self._lock:
+            if full:
+                self.full_decodes += 1
+                self._since_full = 0
+            else:
+                self.crop_hits += 1
+            if rects:
+                x0 = min(r[0] for r in rects)
+                y0 = min(r[1] for r in rects)
+                x1 = max(r[0] + r[2] for r in rects)
+                y1 = max(r[1] + r[3] for r in rects)
+                self._rect = (x0, y0, x1 - x0, y1 - y0)
+            elif full:  # nothing anywhere in the frame, so stop tracking
+                self._rect = None
+
+    def missed(self):
+        with self._lock:
+            self.crop_misses += 1
@@ -0,0 +1,5 @@
+from Library.session.checkin import IN, OUT, RESET, CheckInTracker
+from Library.session.journal import SessionJournal
+from Library.session.scanlog import COMMIT, NEVER, ScanLogWriter
+from Library.session.store import SessionRecord, SessionStore, parse_session_line
+from Library.session.timer import TimerScheduler
@@ -0,0 +1,100 @@
+"""
+Name: Check-In Tracker
+Description: The check-in/out state machine of the QR Reader. It keeps track of the QR codes seen in the current
+    session, and turns each scan into an event: checking a code IN, checking it OUT, or resetting it so that it can be
+    checked in again. It has no UI, so it can be driven by the video() function as well as by the replay benchmark.
+"""
+
+import datetime
+import threading
+
+from Library.session.store import IN, OUT, SessionStore
+
+RESET = "RESET"
+
+"""
+This class turns scans into check-in/out events, keeping the state of every QR code seen in the session in a
+SessionStore
+@param wait the time between scans of the same qr code before its status changes
+"""
+
+
+class CheckInTracker:
+    def __init__(self, wait=datetime.timedelta(seconds=10)):
+        self.wait = wait
+        self.store = SessionStore()
+        self.lock = threading.Lock()  # held while the session changes, so the timer thread can read it meanwhile
+
+    """
+    Handles one scan of a QR code
+    @param code the (converted) text of the QR code
+    @param now the date and time of the scan
+
+    @return an (event, elapsed) tuple: (IN, None) if the code was checked in, (OUT, time since check in) if it was
+    checked out, (RESET, None) if it was removed so it can check in again, or (None, None) if nothing changed
+    """
+
+    def scan(self, code, now):
+        with self.lock:
+            return self._scan(code, now)
+
+    def _scan(self, code, now):
+        record = self.store.get(code)
+        # if the barcode data has never been seen, check the user in
+        if record is None:
+            self.store.add(code, now, IN)
+            return IN, None
+
+        # if barcode information is found, get total time passed since user checked in
+        time_check = now - record.time
+        if time_check <= self.wait:  # if found and the wait time has not passed yet then wait
+            return None, None
+        # if time exceeds wait period and user is checked in then check them out
+        if record.status == IN:
+            self.store.update(record, now, OUT)
+            return OUT, time_check
+        # if user is checked out, delete ID and affiliated data from the session. This resets everything for said user
+        # and allows the user to check back in at a later time.
+        self.store.remove(code)
+        return RESET, None
+
+    """
+    Puts a code back into the session, as it was in an earlier instance of the system
+    """
+
+    def restore(self, code, time, status):
+        self.store.add(code, time, status)
+
+    """
+    Finds the codes that have gone longer than the timer without being scanned, that no alert has been started for
+    yet. They are marked as alerted, so that each code only triggers one alert.
+    @param now the current date and time
+    @param minutes the timer, in minutes
+
+    @return a list of the codes over the timer
+    """
+
+    def overdue(self, now, minutes):
+        with self.lock:
+            return [record.code for record in self.store.due(now - datetime.timedelta(minutes=minutes))]
+
+    """
+    Writes the session to a file, so that it can be restarted later
+    @param path the file to write the session to
+    """
+
+    def save(self, path):
+        self.store.save(path)
+
+    """
+    Reads a session written by save() back in
+    @param path the file to read the session from
+
+    @return the number of codes restored
+    """
+
+    def load(self, path):
+        return self.store.load(path)
+
+    def __len__(self):
+        return len(self.store)
@@ -0,0 +1,106 @@
+"""
+Name: Session Journal
+Description: Saves the session to the qr-data.txt file as an append-only journal: every check-in, check-out and reset
+    adds one "code,time,status" line to the end of the file, so a scan costs one short write however many codes are
+    in the session, and scans that don't change anything cost nothing. Every so often the journal is compacted,
+    rewritten as one line per code in the session, so it does not grow without limit.
+    Restarting a session replays the journal line by line. A compacted journal is the same format the whole session
+    used to be saved in, so files saved by older versions restore as well.
+"""
+
+import os
+
+from Library.session.checkin import RESET
+from Library.session.store import parse_session_line
+
+"""
+This class appends the changes of a session to a journal file and compacts it
+@param path the journal file
+@param store the SessionStore the journal is for, used to compact the journal
+@param compact_every the number of lines appended after which the journal is compacted
+"""
+
+
+class SessionJournal:
+    def __init__(self, path, store, compact_every=1000):
+        self.path = path
+        self.store = store
+        self.compact_every = compact_every
+        self.appended = 0  # lines appended since the last compaction
+        self.compactions = 0
+        self._file = None
+        self._mode = "w"  # a new session starts a new journal with its first line, an earlier one is kept until then
+        self.rejected = []  # the lines the last replay couldn't read, they are kept in path + ".rejected"
+
+    """
+    Reads the journal back into the store, applying its lines in order. Lines that can't be read (such as a line cut
+    off when the system was closed during a write) are kept in rejected and added to a .rejected file next to the
+    journal before it is compacted, so they aren't lost. The journal is compacted afterwards, and later lines are
+    appended to it.
+
+    @return the number of codes in the session after the replay
+    """
+
+    def replay(self):
+        self.rejected = []
+        with open(self.path, "r") as qr_data_file:
+            for line in qr_data_file:  # read them in line by line
+                if not line.strip():
+                    continue
+                fields = parse_session_line(line)
+                if fields is None:
+                    self.rejected.append(line if line.endswith("\n") else line + "\n")
+                    continue
+                (code, time, status) = fields
+                if status == RESET:
+                    self.store.remove(code)
+                else:
+                    self.store.add(code, time, status)
+        if self.rejected:
+            with open(self.path + ".rejected", "a") as rejected_file:
+                rejected_file.writelines(self.rejected)
+        self.compact()
+        return len(self.store)
+
+    """
+    Appends one change to the journal
+    @param code the (converted) text of the QR code
+    @param time the date and time of the change
+    @param status the event: IN, OUT or RESET
+    """
+
+    def record(self, code, time, status):
+        if self._file is None:
+            self._file = open(self.path, self._mode)
+        self._file.write(f"{code},{time},{status}\n")
+        self._file.flush()
+        self.appended += 1
+        if self.appended >= self.compact_every:
+            self.compact()
+
+    """
+    Rewrites the journal as one line per code in the session. The new journal is written next to the old one and then
+    swapped in, so a journal is never left half written.
+    """
+
+    def compact(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        temp_path = self.path + ".tmp"
+        self.store.save(temp_path)
+        os.replace(temp_path, self.path)
+        self._mode = "a"
+        self.appended = 0
+        self.compactions += 1
+
+    """
+    Compacts the journal if anything was appended to it, and closes it
+    """
+
+    def close(self):
+        if self.appended:
+            self.compact()
+        elif self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,221 @@
+"""
+Name: Scan Log Writer
+Description: Writes the lines of the scan log files (barcodes.txt, and the CSV in the storage folder in local mode) on
+    one background thread, so the QR Reader only has to hand each line over and never waits on the disk. Lines are
+    committed in groups: the writer waits until enough lines are waiting, or the oldest one has waited long enough,
+    then writes them all, flushes each file once and, depending on the fsync policy, asks the system to put them on
+    the disk. A crash loses at most the lines of the group being gathered, instead of minutes of scans.
+    If a group can't be written (the disk is full or gone), its lines are kept, ahead of the lines handed over since,
+    and written again every retry_delay seconds (or on the next flush) until it works. Only the lines still not
+    written when the writer is closed, and lines for a file that isn't open, are lost, and the user is told.
+    The time each line took from being handed over to being committed is kept, to show the write latency.
+        fsync policies:
+            - "never": lines are handed to the system after each group, it writes them to the disk when it sees fit
+            - "commit": every group is put on the disk before the next one is gathered
+            - a number of seconds: the files are put on the disk after a group at most that often
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+NEVER = "never"
+COMMIT = "commit"
+
+"""
+This class is the writer thread, along with the files it writes to
+@param max_lines the number of waiting lines that makes the writer commit them right away
+@param max_delay the longest time (in seconds) a line waits for its group before it is committed anyway
+@param fsync the fsync policy: NEVER, COMMIT, or the least number of seconds between two fsyncs
+@param samples the number of recent write latencies kept for percentiles
+@param report the function that shows the user a message, called as report(color, message) where color is the name
+of one of the BaseColors
+@param retry_delay the time (in seconds) the writer waits before writing a group that failed again
+"""
+
+
+class ScanLogWriter:
+    def __init__(self, max_lines=64, max_delay=0.5, fsync=COMMIT, samples=10000, report=None, retry_delay=1.0):
+        self.max_lines = max_lines
+        self.max_delay = max_delay
+        self.fsync = fsync
+        self.report = report or (lambda color, message: print(message))
+        self.retry_delay = retry_delay
+        self.lines = 0  # lines committed
+        self.commits = 0
+        self.fsyncs = 0
+        self.errors = 0  # groups that failed to be written, each retry counts
+        self.lost = 0  # lines given up on
+        self._files = {}  # name -> open file
+        self._pending = []  # (name, line, time.monotonic() it was handed over)
+        self._written = []  # lines written to their file but not flushed yet, kept by the writer thread only
+        self._failing = False  # the last group failed, the next one waits retry_delay
+        self._queued = 0  # lines handed over, lines are numbered in the order they are handed over
+        self._done = 0  # lines committed (or failed), always the first lines handed over
+        self._urgent = False  # set by flush(), commits the waiting lines without waiting for the group to fill up
+        self._last_fsync = 0.0
+        self._latencies = deque(maxlen=samples)
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="scan-log-writer", daemon=True)
+        self._thread.start()
+
+    """
+    Opens a file the writer can write lines to
+    @param name the name lines for the file are written with
+    @param path the file
+    @param mode "a" to add to the file, "w" to start it over
+    @param encoding the encoding of the file
+    """
+
+    def open(self, name, path, mode="a", encoding="utf-8"):
+        scan_file = open(path, mode, encoding=encoding)
+        with self._cond:
+            self._files[name] = scan_file
+
+    """
+    Hands a line over to be written to a file, it is written in the background
+    @param name the name the file was opened with
+    @param line the line, with its newline
+    """
+
+    def write(self, name, line):
+        with self._cond:
+            self._pending.append((name, line, time.monotonic()))
+            self._queued += 1
+            if len(self._pending) >= self.max_lines or len(self._pending) == 1:
+                self._cond.notify_all()
+
+    """
+    Waits until every line handed over so far has been committed
+    @param timeout the longest time (in seconds) to wait
+
+    @return True if they all were committed in time
+    """
+
+    def flush(self, timeout=None):
+        with self._cond:
+            target = self._queued
+            self._urgent = True
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: self._done >= target, timeout)
+
+    """
+    Commits the waiting lines, puts them on the disk whatever the fsync policy is, stops the thread and closes the files
+    """
+
+    def close(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        self._thread.join()
+        with self._cond:
+            files = list(self._files.values())
+            self._files = {}
+        for scan_file in files:
+            try:
+                scan_file.flush()
+                os.fsync(scan_file.fileno())
+                scan_file.close()
+            except (OSError, ValueError):  # the lines the disk didn't take were given up on, and reported, already
+                pass
+
+    """
+    @param percents the percentiles wanted, such as 50, 95, 99
+
+    @return a list of the write latencies (in seconds) at those percentiles, or an empty list if none were recorded
+    """
+
+    def percentiles(self, *percents):
+        with self._cond:
+            latencies = sorted(self._latencies)
+        if not latencies:
+            return []
+        return [latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))] for p in percents]
+
+    """
+    @return a short, single line summary of the writer, such as "120 lines in 15 commits, latency p50 2 ms p99 9 ms"
+    """
+
+    def summary(self):
+        latency = self.percentiles(50, 99)
+        latency = f", latency p50 {latency[0] * 1000:.0f} ms p99 {latency[1] * 1000:.0f} ms" if latency else ""
+        lost = f", {self.errors} failed writes, {self.lost} lines lost" if self.errors or self.lost else ""
+        return f"{self.lines} lines in {self.commits} commits ({self.fsyncs} fsyncs){latency}{lost}"
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._written or self._stop)
+                if not self._pending and not self._written:  # stopped, and everything is written
+                    return
+                if self._failing:  # give the disk some time, unless the lines are wanted now
+                    self._cond.wait_for(lambda: self._stop or self._urgent, self.retry_delay)
+                elif self._pending:
+                    deadline = self._pending[0][2] + self.max_delay
+                    while len(self._pending) < self.max_lines and not self._stop and not self._urgent:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                (group, self._pending) = (self._pending, [])
+                self._urgent = False
+                files = dict(self._files)
+                stopping = self._stop
+            (settled, left) = self._commit(group, files, stopping)
+            if stopping and (left or self._written):  # closing, the lines the disk still won't take are lost
+                lost = len(left) + len(self._written)
+                (settled, left, self._written) = (settled + lost, [], [])
+                self.lost += lost
+                self.report("FAIL", f"Scan log: {lost} lines could not be written to the disk and are lost.")
+            with self._cond:
+                self._pending[:0] = left  # written again first, the lines stay in the order they were handed over
+                self._done += settled
+                self._cond.notify_all()
+
+    """
+    Writes a group of lines, after the lines of the groups before it that were written but not flushed
+    @return the number of lines committed (or lost), and the lines of the group still to be written
+    """
+
+    def _commit(self, group, files, stopping):
+        written = 0
+        try:
+            for entry in group:
+                if entry[0] in files:
+                    files[entry[0]].write(entry[1])
+                else:  # the file isn't open, writing it again won't help
+                    self.lost += 1
+                    self.report("FAIL", f"Scan log: no file named {entry[0]} is open, a line was lost.")
+                    entry = (None, None, entry[2])
+                self._written.append(entry)
+                written += 1
+            touched = {files[name] for (name, _, _) in self._written if name in files}
+            for scan_file in touched:
+                scan_file.flush()
+            now = time.monotonic()
+            due = self.fsync == COMMIT or (self.fsync != NEVER and now - self._last_fsync >= self.fsync)
+            if not stopping and due:
+                for scan_file in touched:
+                    os.fsync(scan_file.fileno())
+                self._last_fsync = now
+                self.fsyncs += 1
+        except (OSError, ValueError) as e:  # the disk may be full or gone, the file may have been closed
+            self.errors += 1
+            if not self._failing:
+                self.report("FAIL", f"Scan log: the scanned lines can't be written ({e}), they are kept and written "
+                                    f"again every {self.retry_delay:g} seconds.")
+            self._failing = True
+            return 0, group[written:]
+        (committed, self._written) = (self._written, [])
+        if self._failing:
+            self.report("OKGREEN", "Scan log: the scanned lines are being written again.")
+            self._failing = False
+        handed_over = [handed for (name, _, handed) in committed if name is not None]
+        committed_at = time.monotonic()
+        with self._cond:
+            self._latencies.extend(committed_at - handed for handed in handed_over)
+        self.lines += len(handed_over)
+        self.commits += 1
+        return len(committed), []
@@ -0,0 +1,190 @@
+"""
+Name: Session Store
+Description: Keeps the state of every QR code in the current session, one record per code, indexed by the code so
+    that looking a code up, changing it and removing it take the same time however many codes are in the session.
+    The store also keeps the times at which checked in codes will pass the timer in a heap, so finding the codes that
+    are over the timer only looks at the codes that actually are, instead of at every code in the session. Codes that
+    are checked out are never over the timer.
+"""
+
+import datetime
+import heapq
+
+IN = "IN"
+OUT = "OUT"
+
+"""
+This function reads a "code,time,status" line of a session file. The code may have commas in it, so the time and status
+are taken from the end of the line.
+@param line the line
+@return a (code, time, status) tuple, or None if the line can't be read
+"""
+
+
+def parse_session_line(line):
+    line_array = line.rstrip('\n').rsplit(",", 2)
+    if len(line_array) != 3:
+        return None
+    (code, time, status) = line_array
+    try:  # times are written with microseconds, unless the scan happened exactly on the second
+        return code, datetime.datetime.fromisoformat(time), status
+    except ValueError:
+        return None
+
+
+"""
+This class is the state of one QR code in the session
+@param code the (converted) text of the QR code
+@param time the date and time the code was last checked in or out
+@param status IN or OUT
+"""
+
+
+class SessionRecord:
+    __slots__ = ("code", "time", "status", "alerted")
+
+    def __init__(self, code, time, status):
+        self.code = code
+        self.time = time
+        self.status = status
+        self.alerted = False  # tracks if an alert for the code has been started already
+
+    def __repr__(self):
+        return f"SessionRecord({self.code!r}, {self.time!r}, {self.status!r})"
+
+
+"""
+This class holds the records of a session, in the order the codes were first seen
+"""
+
+
+class SessionStore:
+    def __init__(self):
+        self._records = {}
+        self._timers = []  # heap of (time, code) of checked in codes, stale once its record has changed
+
+    """
+    @return the record of the code, or None if the code is not in the session
+    """
+
+    def get(self, code):
+        return self._records.get(code)
+
+    """
+    Adds a code to the session, replacing any record it had
+    @return the new record
+    """
+
+    def add(self, code, time, status):
+        record = self._records[code] = SessionRecord(code, time, status)
+        if status == IN:  # only checked in codes can go over the timer
+            heapq.heappush(self._timers, (time, code))
+        return record
+
+    """
+    Changes the status of a record, and restarts its timer if it is checked in
+    """
+
+    def update(self, record, time, status):
+        record.time = time
+        record.status = status
+        if status == IN:
+            heapq.heappush(self._timers, (time, record.code))
+
+    """
+    Removes a code from the session, if it is in it
+    """
+
+    def remove(self, code):
+        self._records.pop(code, None)
+
+    """
+    Finds the checked in records that have not been changed since before the cutoff, and that no alert has been
+    started for yet. They are marked as alerted, so that each record only triggers one alert.
+    @param cutoff the date and time the records must be older than
+
+    @return a list of the records, oldest first
+    """
+
+    def due(self, cutoff):
+        records = []
+        while self._timers and self._timers[0][0] < cutoff:
+            (time, code) = heapq.heappop(self._timers)
+            record = self._records.get(code)
+            if record is None or record.time != time or record.status != IN or record.alerted:  # changed since
+                continue
+            record.alerted = True
+            records.append(record)
+        return records
+
+    """
+    @return the time of the oldest checked in record no alert has been started for yet, or None if there is none.
+    Changing a record or starting its alert does not remove its old entry from the heap right away, those are dropped
+    here.
+    """
+
+    def next_time(self):
+        while self._timers:
+            (time, code) = self._timers[0]
+            record = self._records.get(code)
+            if record is not None and record.time == time and record.status == IN and not record.alerted:
+                return time
+            heapq.heappop(self._timers)
+        return None
+
+    """
+    Writes the session to a file, one "code,time,status" line per record, so that it can be restarted later
+    @param path the file to write the session to
+    """
+
+    def save(self, path):
+        with open(path, "w") as qr_data_file:
+            qr_data_file.writelines(f"{record.code},{record.time},{record.status}\n"
+                                    for record in self._records.values())
+
+    """
+    Reads a session written by save() back in
+    @param path the file to read the session from
+    @param rejected a list the lines that can't be read are added to, if None such a line raises a ValueError
+
+    @return the number of records restored
+    """
+
+    def load(self, path, rejected=None):
+        restored = 0
+        with open(path, "r") as qr_data_file:
+            for line in qr_data_file:  # read them in line by line
+                if line == '\n':
+                    continue
+                fields = parse_session_line(line)
+                if fields is None:
+                    if rejected is None:
+                        raise ValueError(f"Can't read the session line {line!r} of {path}")
+                    rejected.append(line)
+                    continue
+                self.add(*fields)
+                restored += 1
+        return restored
+
+    def __contains__(self, code):
+        return code in self._records
+
+    def __iter__(self):
+        return iter(list(self._records.values()))
+
+    def __len__(self):
+        return len(self._records)
+
+
+if __name__ == '__main__':
+    # lookups should take about as long with 50k codes in the session as with 100
+    import timeit
+
+    start = datetime.datetime(2021, 1, 1, 8, 0, 0)
+    for size in (100, 1000, 50000):
+        store = SessionStore()
+        for i in range(size):
+            store.add(f"Person {i:05d}", start + datetime.timedelta(seconds=i), "IN")
+        codes = [f"Person {i:05d}" for i in range(0, size, max(1, size // 100))]
+        seconds = timeit.timeit(lambda: [store.get(code) for code in codes], number=1000) / (1000 * len(codes))
+        print(f"{size:>6} codes: {seconds * 1e9:.0f} ns per lookup")
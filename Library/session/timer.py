@@ -0,0 +1,99 @@
+"""
+Name: Timer Scheduler
+Description: Alerts the user when QR codes have gone longer than the timer without being scanned. A single thread
+    sleeps until the next code is due, using the heap of times the session store already keeps, so the QR Reader
+    does nothing for the timer on each frame however many codes are in the session. It is only woken when a scan
+    changes the session or the timer is changed.
+    Codes that fall due together are reported in one alert, and while an alert hasn't been acknowledged the alarm is
+    repeated on the same thread, codes that fall due meanwhile are added to it instead of starting another alarm.
+    Times are full dates and times, so a session that runs past midnight is timed correctly.
+"""
+
+import datetime
+import threading
+import time
+
+"""
+This class is the timer thread of a session
+@param tracker the CheckInTracker of the session, its lock is held while the store is read
+@param alert the function called with a list of the codes that have just gone over the timer
+@param alarm the function that plays the alarm
+@param repeat the time (in seconds) between alarms while an alert hasn't been acknowledged
+@param longest_sleep the longest time (in seconds) the thread sleeps at once, so that a change to the computer's clock
+is noticed
+"""
+
+
+class TimerScheduler:
+    def __init__(self, tracker, alert, alarm, repeat=20.0, longest_sleep=60.0):
+        self.tracker = tracker
+        self.alert = alert
+        self.alarm = alarm
+        self.repeat = repeat
+        self.longest_sleep = longest_sleep
+        self.minutes = None  # the timer, None while it is unset
+        self.alerted = 0  # codes reported over the timer
+        self.alerts = 0  # alerts started, each one may be for several codes
+        self._alarm_at = None  # the time.monotonic() the alarm plays next, None if no alert is waiting
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="session-timer", daemon=True)
+        self._thread.start()
+
+    """
+    Sets the timer
+    @param minutes the timer, in minutes, or None to unset it
+    """
+
+    def set_timer(self, minutes):
+        with self._cond:
+            self.minutes = minutes
+            self._cond.notify()
+
+    """
+    Tells the thread the session has changed, so it can check whether the next code due has changed
+    """
+
+    def wake(self):
+        with self._cond:
+            self._cond.notify()
+
+    """
+    Stops the alarm of the current alert, the next code to go over the timer starts a new one
+    """
+
+    def acknowledge(self):
+        with self._cond:
+            self._alarm_at = None
+            self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        self._thread.join(1.0)
+
+    def _run(self):
+        with self._cond:
+            while not self._stop:
+                sleep = self.longest_sleep
+                if self.minutes is not None:
+                    timer = datetime.timedelta(minutes=self.minutes)
+                    now = datetime.datetime.now()
+                    with self.tracker.lock:
+                        codes = [record.code for record in self.tracker.store.due(now - timer)]
+                        next_time = self.tracker.store.next_time()
+                    if codes:
+                        self.alerted += len(codes)
+                        if self._alarm_at is None:  # a new alert, otherwise the codes join the one still sounding
+                            self.alerts += 1
+                            self._alarm_at = time.monotonic()
+                        self.alert(codes)
+                    if next_time is not None:
+                        sleep = min(sleep, (next_time + timer - now).total_seconds())
+                if self._alarm_at is not None:
+                    if time.monotonic() >= self._alarm_at:
+                        self.alarm()
+                        self._alarm_at = time.monotonic() + self.repeat
+                    sleep = min(sleep, self._alarm_at - time.monotonic())
+                self._cond.wait(max(0.0, sleep))
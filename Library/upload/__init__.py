@@ -0,0 +1,5 @@
+from Library.upload.health import CLOSED, HALF_OPEN, OPEN, ConnectionHealth
+from Library.upload.layer import LayerCache
+from Library.upload.outbox import Outbox
+from Library.upload.sql import SqlSink, connect_sqlite
+from Library.upload.uploader import UploadEvent, UploadQueue, send_batch
@@ -0,0 +1,121 @@
+"""
+Name: Connection Health
+Description: Keeps track of whether the online storage can be reached, and decides when the uploader should try it:
+    - Closed (connected): uploads go ahead. A failed upload is retried after a delay that doubles with each failure in
+      a row, with some random jitter so that several stations don't all retry at the same moment.
+    - Open (disconnected): after too many failures in a row, uploads stop trying the connection for a while, so the
+      server isn't hammered while it is down. The time it stays open also doubles each time it opens again.
+    - Half-open (testing): once that time has passed, one probe upload is let through. If it works the connection is
+      closed again and uploads resume on their own, if it fails the connection opens again.
+"""
+
+import random
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+MAX_DOUBLINGS = 30  # a delay is doubled at most this many times, well past any cap
+
+"""
+This class is the circuit breaker, along with the backoff delays
+@param base the delay (in seconds) before the first retry
+@param cap the longest delay (in seconds) before a retry, and the longest time the circuit stays open
+@param threshold the number of failures in a row that opens the circuit
+@param open_for the time (in seconds) the circuit stays open the first time it opens
+@param jitter the share of each delay that is random, 0.5 makes a 10 second delay anything from 5 to 10 seconds
+@param seed the seed for the jitter, so that tests can repeat it
+"""
+
+
+class ConnectionHealth:
+    def __init__(self, base=2.0, cap=300.0, threshold=3, open_for=30.0, jitter=0.5, seed=None):
+        self.base = base
+        self.cap = cap
+        self.threshold = threshold
+        self.open_for = open_for
+        self.jitter = jitter
+        self.state = CLOSED
+        self.failures = 0  # failures in a row
+        self.opens = 0  # times the circuit opened in a row, without a success in between
+        self.retry_at = 0.0  # the time.monotonic() the next attempt is allowed at
+        self.last_success = None  # the time.monotonic() of the last upload that worked
+        self.last_failure = None
+        self.last_latency = None  # how long (in seconds) the last upload that worked took
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    """
+    @return True if an upload may be tried now. When the circuit is open and its time has passed, it becomes half-open
+    and this upload is the probe.
+    """
+
+    def allow(self):
+        with self._lock:
+            now = time.monotonic()
+            if now < self.retry_at:
+                return False
+            if self.state == OPEN:
+                self.state = HALF_OPEN
+            return True
+
+    """
+    @return the time (in seconds) until an upload may be tried, 0 if it may be tried now
+    """
+
+    def wait_time(self):
+        with self._lock:
+            return max(0.0, self.retry_at - time.monotonic())
+
+    """
+    Records an upload that worked, which closes the circuit
+    @param latency how long (in seconds) the upload took
+    """
+
+    def success(self, latency=None):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.opens = 0
+            self.retry_at = 0.0
+            self.last_success = time.monotonic()
+            self.last_latency = latency
+
+    """
+    Records an upload that failed. The next attempt is delayed, and the circuit opens if the failure was the probe or
+    there have been too many failures in a row.
+    """
+
+    def failure(self):
+        with self._lock:
+            now = time.monotonic()
+            self.failures += 1
+            self.last_failure = now
+            if self.state == HALF_OPEN or self.failures >= self.threshold:
+                self.state = OPEN
+                self.opens += 1
+                self.retry_at = now + self._delay(self.open_for, self.opens - 1)
+            else:
+                self.retry_at = now + self._delay(self.base, self.failures - 1)
+
+    def _delay(self, first, doublings):
+        # after a long outage 2 ** doublings would be too large for a float, and the delay is the cap long before that
+        delay = min(self.cap, first * 2 ** min(doublings, MAX_DOUBLINGS))
+        return delay * (1 - self.jitter * self._random.random())
+
+    """
+    @return a short, single line description of the connection, such as "Online storage: connected (last upload 0.4 s)"
+    """
+
+    def summary(self):
+        with self._lock:
+            wait = max(0.0, self.retry_at - time.monotonic())
+            if self.state == CLOSED and self.failures == 0:
+                latency = "" if self.last_latency is None else f" (last upload {self.last_latency:.1f} s)"
+                return f"Online storage: connected{latency}"
+            if self.state == CLOSED:
+                return f"Online storage: upload failed {self.failures} times, retrying in {wait:.0f} s"
+            if self.state == OPEN:
+                return f"Online storage: disconnected, checking again in {wait:.0f} s (failed {self.failures} times)"
+            return "Online storage: checking the connection with the next upload..."
@@ -0,0 +1,54 @@
+"""
+Name: Layer Cache
+Description: Keeps the ArcGIS feature layer (and the location point) that events are uploaded to, so that it is
+    looked up once when the user signs in instead of with several requests before every upload. The cached layer is
+    dropped when the token is refreshed or an upload to the layer fails, and looked up again the next time it is
+    needed. Counters show how often the cache saved a lookup.
+"""
+
+import threading
+
+"""
+This class holds the result of an expensive lookup until it is invalidated
+@param resolve the function that looks the layer up, returning whatever the uploads need (such as (item, layer, point))
+"""
+
+
+class LayerCache:
+    def __init__(self, resolve):
+        self.resolve = resolve
+        self.hits = 0  # uploads that used the cached layer
+        self.misses = 0  # times the layer had to be looked up
+        self.invalidations = 0
+        self._value = None
+        self._lock = threading.Lock()
+
+    """
+    @return the cached layer, looking it up first if there is none. Exceptions from the lookup are passed on.
+    """
+
+    def get(self):
+        with self._lock:
+            if self._value is None:
+                self._value = self.resolve()
+                self.misses += 1
+            else:
+                self.hits += 1
+            return self._value
+
+    """
+    Drops the cached layer, so that it is looked up again the next time it is needed
+    """
+
+    def invalidate(self):
+        with self._lock:
+            if self._value is not None:
+                self._value = None
+                self.invalidations += 1
+
+    """
+    @return a short, single line summary of the cache, such as "layer cache 120 hits, 2 lookups, 1 invalidated"
+    """
+
+    def summary(self):
+        return f"layer cache {self.hits} hits, {self.misses} lookups, {self.invalidations} invalidated"
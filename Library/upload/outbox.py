@@ -0,0 +1,223 @@
+"""
+Name: Outbox
+Description: Keeps the check-in/out events that could not be uploaded in an SQLite database (System_Data/outbox.db)
+    until they can be. Each event is a row with its own columns, so barcodes with commas in them are kept as they are,
+    and events are added and removed in transactions, so the outbox is never left half written if the program closes
+    or the computer loses power during a write. The database is in WAL mode, so adding events while the outbox is
+    being uploaded doesn't wait on the upload.
+    replay() uploads the outbox in batches, oldest first, and deletes each batch's uploaded events as soon as the batch
+    has been answered, so a replay that stops part way through continues where it left off next time without sending
+    any event twice.
+    The backup.txt file earlier versions kept these events in is imported into the outbox once.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from Library.upload.uploader import UploadEvent
+
+"""
+This function reads an event from a line of a backup.txt file, as written by earlier versions. The barcode may have
+commas in it, so the fields before it are taken from the start of the line and the ones after it from the end.
+@return the event, or None if the line is not an event
+"""
+
+
+def parse_backup_line(line):
+    content = line.rstrip('\n').split(',')
+    if len(content) < 6:
+        return None
+    (sys_id, date_str, time_str) = content[:3]
+    (status, time_elapsed) = content[-2:]
+    barcode = ",".join(content[3:-2])
+    time_elapsed = None if time_elapsed == "NONE" else time_elapsed  # only OUT events have an elapsed time
+    return UploadEvent(sys_id, date_str, time_str, barcode, status, time_elapsed, time.monotonic())
+
+
+"""
+This class is the outbox database. An event the online storage turns down is tried again at the next uploads, up to
+max_attempts times, then it is set aside (its state becomes 'dead'): it is kept in the database but no longer uploaded.
+Attempts are only counted when the online storage answered, not when it couldn't be reached.
+@param path the database file
+@param max_attempts the number of times an event can be turned down before it is set aside
+"""
+
+
+class Outbox:
+    def __init__(self, path, max_attempts=5):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()  # the connection is shared by the uploader thread and the GUI
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")  # a committed event survives a power loss
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                state TEXT NOT NULL DEFAULT 'pending',
+                enqueued REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                sys_id TEXT, date_str TEXT, time_str TEXT, barcode TEXT, status TEXT, time_elapsed TEXT
+            );
+            CREATE INDEX IF NOT EXISTS outbox_state_enqueued ON outbox (state, enqueued);
+        """)
+
+    """
+    Adds events to the outbox, all in one transaction
+    @param events the UploadEvents to add
+    """
+
+    def add_many(self, events):
+        if not events:
+            return
+        now = time.time()
+        rows = [(now, str(event.sys_id), str(event.date_str), str(event.time_str), event.barcode, event.status,
+                 None if event.time_elapsed is None else str(event.time_elapsed)) for event in events]
+        with self._lock, self._transaction():
+            self._db.executemany("INSERT INTO outbox (enqueued, sys_id, date_str, time_str, barcode, status, "
+                                 "time_elapsed) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    """
+    @param limit the most events to return
+    @param after only events with a higher id than this are returned
+
+    @return a list of (id, UploadEvent) tuples of the pending events, oldest first
+    """
+
+    def pending(self, limit, after=0):
+        with self._lock:
+            rows = self._db.execute("SELECT id, sys_id, date_str, time_str, barcode, status, time_elapsed FROM outbox "
+                                    "WHERE state = 'pending' AND id > ? ORDER BY id LIMIT ?", (after, limit)).fetchall()
+        return [(row[0], UploadEvent(*row[1:], time.monotonic())) for row in rows]
+
+    """
+    Removes the events that were uploaded and counts an attempt for the ones the online storage turned down, setting
+    aside those turned down max_attempts times, in one transaction
+    @param uploaded the ids of the events that were uploaded
+    @param failed the ids of the events that were turned down
+    """
+
+    def settle(self, uploaded, failed=()):
+        with self._lock, self._transaction():
+            self._db.executemany("DELETE FROM outbox WHERE id = ?", [(row_id,) for row_id in uploaded])
+            self._db.executemany("UPDATE outbox SET attempts = attempts + 1, state = CASE WHEN attempts + 1 >= ? "
+                                 "THEN 'dead' ELSE state END WHERE id = ?",
+                                 [(self.max_attempts, row_id) for row_id in failed])
+
+    """
+    @return the number of events waiting in the outbox
+    """
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM outbox WHERE state = 'pending'").fetchone()[0]
+
+    """
+    @return the number of events set aside after being turned down max_attempts times
+    """
+
+    def dead_count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM outbox WHERE state = 'dead'").fetchone()[0]
+
+    """
+    @return the time (in seconds) the oldest event has been waiting in the outbox, 0 if it is empty
+    """
+
+    def oldest_age(self):
+        with self._lock:
+            oldest = self._db.execute("SELECT MIN(enqueued) FROM outbox WHERE state = 'pending'").fetchone()[0]
+        return 0.0 if oldest is None else max(0.0, time.time() - oldest)
+
+    """
+    Uploads the pending events in batches, oldest first. Each event is tried once per replay. Stops if a batch can't
+    be sent at all (send raises), since the connection is probably down. A batch the online storage answered, even if
+    it turned every event down, is not a connection failure: its events are counted an attempt and the replay goes on.
+    @param send the function that uploads a batch of events, returning a list with True or False for each event, or
+    raising an exception if the online storage can't be reached
+    @param batch_size the number of events sent in each batch
+    @param progress the function called after each batch as progress(events done, events in total, events per second)
+
+    @return a (finished, uploaded, failed, seconds) tuple: whether every pending event was tried (False if the online
+    storage couldn't be reached), how many were uploaded, how many were turned down, and how long the replay took
+    """
+
+    def replay(self, send, batch_size=50, progress=None):
+        start = time.monotonic()
+        total = self.count()
+        (done, uploaded, failed, last_id) = (0, 0, 0, 0)
+        while True:
+            rows = self.pending(batch_size, after=last_id)
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            try:
+                results = list(send([event for (_, event) in rows]))
+            except Exception as e:  # the batch couldn't be sent, the connection is probably down, no attempt counted
+                print(e)
+                return False, uploaded, failed, time.monotonic() - start
+            results += [False] * (len(rows) - len(results))
+            self.settle([row_id for (row_id, _), ok in zip(rows, results) if ok],
+                        [row_id for (row_id, _), ok in zip(rows, results) if not ok])
+            done += len(rows)
+            uploaded += sum(results)
+            failed += len(rows) - sum(results)
+            if progress is not None:
+                seconds = time.monotonic() - start
+                progress(done, max(total, done), done / seconds if seconds else 0.0)
+        return True, uploaded, failed, time.monotonic() - start
+
+    """
+    Imports a backup.txt file written by an earlier version into the outbox, and deletes it. Lines that can't be read as
+    an event are added to a .rejected file next to it, and the backup file is only deleted once every line is either in
+    the outbox or in that file.
+    @param path the backup file
+
+    @return the number of events imported
+    """
+
+    def import_backup_file(self, path):
+        if not os.path.exists(path):
+            return 0
+        with open(path, "r") as backup:
+            lines = backup.readlines()
+        events = []
+        rejected = []
+        for line in lines:
+            if line.strip():
+                event = parse_backup_line(line)
+                if event is None:
+                    rejected.append(line if line.endswith("\n") else line + "\n")
+                else:
+                    events.append(event)
+        if rejected:  # kept before anything is deleted, if this fails the backup file is left as it is
+            with open(path + ".rejected", "a") as rejected_file:
+                rejected_file.writelines(rejected)
+        self.add_many(events)
+        os.remove(path)
+        return len(events)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _transaction(self):
+        return _Transaction(self._db)
+
+
+"""
+This class runs a block of statements as one transaction, committed if the block finishes and rolled back if it raises
+"""
+
+
+class _Transaction:
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.db.execute("COMMIT" if exc_type is None else "ROLLBACK")
@@ -0,0 +1,194 @@
+"""
+Name: SQL Sink
+Description: Uploads check-in/out events to a table in a SQL Server database, for the SQL storage mode. It is the
+    send function of the UploadQueue, so each batch the queue hands it is inserted with a single executemany (with
+    pyodbc's fast_executemany, which sends the whole batch in one round trip) and committed once, instead of one
+    execute and one commit per scan. The connection is kept open between batches and opened again if it is lost.
+    The database module and the function that connects to it are passed in, so that the same code runs against SQLite
+    (see connect_sqlite), which lets the throughput be measured without a server:
+        python -m Library.upload.sql
+"""
+
+import datetime
+import sqlite3
+import time
+
+"""
+This function turns the date and time of an event into a datetime. Events put in the queue while scanning have a
+"%m/%d/%Y" date, events restored from the session file have a date object, and events from the outbox have its text.
+@return the datetime, or the text of the date and time if it can't be read
+"""
+
+
+def scan_datetime(date_str, time_str):
+    text = f"{date_str} {time_str}"
+    for date_format in ("%m/%d/%Y %H:%M:%S", "%Y-%m-%d %H:%M:%S"):
+        try:
+            return datetime.datetime.strptime(text, date_format)
+        except ValueError:
+            pass
+    return text
+
+
+"""
+This function connects to an SQLite database with a table laid out like the SQL Server one, it stands in for the
+server when measuring the sink
+@param path the database file, or ":memory:"
+@param table the name of the table
+@param columns the names of the source, date and time, text, status and elapsed time columns
+
+@return the connection
+"""
+
+
+def connect_sqlite(path, table, columns):
+    sqlite3.register_adapter(datetime.datetime, lambda value: value.isoformat(" "))  # stored as text, like SQL Server
+    db = sqlite3.connect(path, check_same_thread=False)  # used by the uploader thread, one batch at a time
+    db.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(f'{column} TEXT' for column in columns)})")
+    db.commit()
+    return db
+
+
+"""
+This class is the connection to the SQL table events are inserted in
+@param connect the function that opens a connection, such as lambda: pyodbc.connect(...)
+@param module the DB-API module the connection comes from (pyodbc or sqlite3), used to tell a lost connection apart
+from an event the database turned down
+@param table the name of the table
+@param columns the names of the source, date and time, text, status and elapsed time columns
+@param fast_executemany True to send each batch in one round trip (pyodbc only)
+"""
+
+
+class SqlSink:
+    def __init__(self, connect, module, table, columns, fast_executemany=True):
+        self.connect_function = connect
+        self.module = module
+        self.table = table
+        self.columns = list(columns)
+        self.fast_executemany = fast_executemany
+        self.query = f"INSERT INTO {table} ({', '.join(self.columns)}) VALUES ({', '.join('?' * len(self.columns))})"
+        self.inserted = 0
+        self.commits = 0
+        self.connects = 0
+        self._connection = None
+
+    """
+    Opens the connection if it isn't open yet. Exceptions from connecting are passed on.
+    @return the connection
+    """
+
+    def connect(self):
+        if self._connection is None:
+            self._connection = self.connect_function()
+            self.connects += 1
+        return self._connection
+
+    def close(self):
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except self.module.Error:  # it may already have been closed by the server
+                pass
+            self._connection = None
+
+    """
+    Inserts a batch of events and commits it, it is the send function of the UploadQueue. If the connection was lost
+    it is opened again and the batch retried once. If the database turns the batch down, the events are inserted one
+    at a time so that only the ones it turns down fail.
+    @param events the UploadEvents to insert
+
+    @return a list with True or False for each event. Exceptions are raised if the database can't be reached.
+    """
+
+    def insert(self, events):
+        rows = [(event.sys_id, scan_datetime(event.date_str, event.time_str), event.barcode, event.status,
+                 None if event.time_elapsed is None else str(event.time_elapsed)) for event in events]
+        lost = (self.module.OperationalError, self.module.InterfaceError)
+        try:
+            self._insert_many(rows)
+        except lost:
+            self.close()  # the connection is probably gone, open a new one and try again
+            try:
+                self._insert_many(rows)
+            except lost:
+                self.close()
+                raise
+            except self.module.Error:
+                return self._insert_each(rows)
+        except self.module.Error:  # one of the events was turned down, the whole batch was rolled back
+            return self._insert_each(rows)
+        return [True] * len(rows)
+
+    """
+    @return a short, single line summary of the sink, such as "SQL 1200 inserted, 24 commits, 1 connection"
+    """
+
+    def summary(self):
+        return f"SQL {self.inserted} inserted, {self.commits} commits, {self.connects} connections"
+
+    def _insert_many(self, rows):
+        connection = self.connect()
+        cursor = connection.cursor()
+        try:
+            if self.fast_executemany:
+                cursor.fast_executemany = True
+            cursor.executemany(self.query, rows)
+            connection.commit()
+        except self.module.Error:
+            self._rollback(connection)
+            raise
+        finally:
+            cursor.close()
+        self.inserted += len(rows)
+        self.commits += 1
+
+    def _insert_each(self, rows):
+        connection = self.connect()
+        cursor = connection.cursor()
+        results = []
+        try:
+            for row in rows:
+                try:
+                    cursor.execute(self.query, row)
+                    results.append(True)
+                except (self.module.IntegrityError, self.module.DataError):  # this event was turned down
+                    results.append(False)
+            connection.commit()
+        except self.module.Error:
+            self._rollback(connection)
+            raise
+        finally:
+            cursor.close()
+        self.inserted += sum(results)
+        self.commits += 1
+        return results
+
+    def _rollback(self, connection):
+        try:
+            connection.rollback()
+        except self.module.Error:
+            pass
+
+
+if __name__ == '__main__':
+    # inserting batches with one commit each against the old design's one execute and one commit per scan
+    import os
+    import tempfile
+
+    from Library.upload.uploader import UploadEvent
+
+    columns = ["Scan_Source", "Scan_Date_Time", "Scanned_Text", "Scan_Status", "Elapsed_Time"]
+    events = [UploadEvent("LAPTOP", "01/04/2021", f"08:{i // 60 % 60:02d}:{i % 60:02d}", f"Person {i:05d}",
+                          "IN" if i % 2 == 0 else "OUT", None if i % 2 == 0 else "0:05:00", 0.0) for i in range(5000)]
+    with tempfile.TemporaryDirectory() as folder:
+        for batch_size in (1, 10, 50, 250):
+            path = os.path.join(folder, f"bench_{batch_size}.db")
+            sink = SqlSink(lambda: connect_sqlite(path, "Table_1", columns), sqlite3, "Table_1", columns,
+                           fast_executemany=False)
+            start = time.perf_counter()
+            for i in range(0, len(events), batch_size):
+                sink.insert(events[i:i + batch_size])
+            seconds = time.perf_counter() - start
+            print(f"batches of {batch_size:>3}: {len(events) / seconds:>8.0f} events/s ({sink.summary()})")
+            sink.close()
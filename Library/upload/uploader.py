@@ -0,0 +1,248 @@
+"""
+Name: Upload Queue
+Description: Uploads check-in/out events to the online storage on a background thread, so that the QR Reader only
+    has to put each event in the queue and never waits on the network. The worker groups the waiting events into
+    batches, each sent with a single request, and sends them in the order they were scanned. A batch is sent once it
+    is full or once its oldest event has waited long enough, whichever comes first. When and how often uploads are
+    tried is decided by the connection health (see health.py). While the connection is down, events are kept in the
+    outbox (see outbox.py), which is uploaded once the connection is back.
+"""
+
+import threading
+import time
+from collections import deque, namedtuple
+
+from Library.upload.health import HALF_OPEN, OPEN
+
+replay_lock = threading.Lock()  # only one replay of the outbox can run at a time
+
+# one check-in/out event, as it is uploaded. enqueued is the time.monotonic() it was put in the queue.
+UploadEvent = namedtuple("UploadEvent", ["sys_id", "date_str", "time_str", "barcode", "status", "time_elapsed",
+                                         "enqueued"])
+
+"""
+This function sends a batch of events. An exception means the online storage couldn't be reached, a list of results
+means it answered, even if it turned every event down.
+@param send the function that uploads a batch, returning a list with True or False for each event
+@param events the events to send
+
+@return a (failed, answered) tuple: the events that failed, in order, and whether the online storage answered
+"""
+
+
+def send_batch(send, events):
+    try:
+        results = list(send(events))
+    except Exception as e:  # the whole batch failed, for example because there is no connection
+        print(e)
+        return list(events), False
+    results += [False] * (len(events) - len(results))  # a missing result counts as a failure
+    return [event for event, uploaded in zip(events, results) if not uploaded], True
+
+
+"""
+This class is the queue of events waiting to be uploaded, along with the thread that uploads them
+@param send the function that uploads a batch of events, returning a list with True or False for each event, or
+raising an exception if the whole batch failed
+@param outbox the Outbox events that could not be uploaded are kept in
+@param health the ConnectionHealth that decides when uploads are tried
+@param report the function that shows the user a message, called as report(color, message) where color is the name
+of one of the BaseColors
+@param max_batch the most events sent in one batch
+@param max_wait the longest time (in seconds) an event waits for its batch to fill up before the batch is sent anyway
+"""
+
+
+class UploadQueue:
+    def __init__(self, send, outbox, health, report=None, max_batch=50, max_wait=2.0):
+        self.send = send
+        self.outbox = outbox
+        self.health = health
+        self.report = report or (lambda color, message: print(message))
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.sent = 0
+        self.backed_up = 0
+        self.batches = 0  # requests sent, including retries
+        self._events = deque()
+        self._inflight = []  # the events of the batch being uploaded, until they are sent or backed up
+        self._outbox_waiting = True  # the outbox may have events to upload, it is checked after the next upload
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="arcgis-upload", daemon=True)
+            self._thread.start()
+        return self
+
+    """
+    Stops the worker. Events still waiting in the queue are kept in the outbox, so none are lost.
+    @param timeout how long (in seconds) to wait for an upload in progress to finish
+    """
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self._backup(self._take_all())
+
+    """
+    Puts a check-in/out event in the queue, it is uploaded in the background
+    """
+
+    def put(self, sys_id, date_str, time_str, barcode, status, time_elapsed=None):
+        with self._cond:
+            self._events.append(UploadEvent(sys_id, date_str, time_str, barcode, status, time_elapsed,
+                                            time.monotonic()))
+            self._cond.notify()
+
+    """
+    @return the number of events waiting to be uploaded
+    """
+
+    def depth(self):
+        with self._cond:
+            return len(self._inflight) + len(self._events)
+
+    """
+    @return the time (in seconds) the oldest event has been waiting to be uploaded, 0 if the queue is empty
+    """
+
+    def oldest_age(self):
+        with self._cond:
+            oldest = self._inflight[0] if self._inflight else self._events[0] if self._events else None
+            return 0.0 if oldest is None else time.monotonic() - oldest.enqueued
+
+    """
+    @return a short, single line summary of the queue, such as "upload queue 3 (oldest 12s)"
+    """
+
+    def summary(self):
+        return f"upload queue {self.depth()} (oldest {self.oldest_age():.0f}s)"
+
+    """
+    Waits until a batch is ready: max_batch events are waiting, or the oldest one has waited max_wait seconds
+    @return the batch, or None if the queue was stopped
+    """
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._stop.is_set():
+                if self._events:
+                    remaining = self._events[0].enqueued + self.max_wait - time.monotonic()
+                    if len(self._events) >= self.max_batch or remaining <= 0:
+                        count = min(self.max_batch, len(self._events))
+                        self._inflight = [self._events.popleft() for _ in range(count)]
+                        return self._inflight
+                    self._cond.wait(remaining)
+                else:
+                    self._cond.wait()
+            return None
+
+    """
+    The worker. Uploads the batches as long as the connection health allows it:
+        - while connected, a batch that failed is retried after the backoff delay, and the outbox is uploaded after an
+          upload that worked
+        - while disconnected, events are moved to the outbox as soon as they are put in the queue, and once it is time
+          to test the connection again, the outbox (or the next batch, if it is empty) is uploaded as the probe
+    Events the online storage turned down (it answered, so the connection is fine) are kept in the outbox.
+    """
+
+    def _run(self):
+        batch = []
+        while not self._stop.is_set():
+            if self.health.state == OPEN:  # keep the events safe in the outbox until the connection is tested again
+                self._backup(self._take_all())
+                batch = []
+                with self._cond:
+                    self._cond.wait_for(lambda: self._events or self._stop.is_set(), self.health.wait_time())
+                if self.health.wait_time() > 0:
+                    continue
+            if not self.health.allow():  # waiting out the backoff delay before retrying the batch
+                self._stop.wait(self.health.wait_time())
+                continue
+            if self.health.state == HALF_OPEN and self.outbox.count():
+                if self._upload_outbox() is None:  # being uploaded from the menu, which settles the connection too
+                    self._stop.wait(1.0)
+                continue
+
+            if not batch:
+                batch = self._next_batch()
+                if batch is None:
+                    break
+            (failed, answered) = self._try(batch)
+            if not failed:
+                batch = []
+                if self._outbox_waiting and self.outbox.count():
+                    self._upload_outbox()
+            elif answered:  # turned down rather than lost, the outbox tries them a few more times
+                with self._cond:
+                    self._inflight = []
+                self._backup(failed)
+                batch = []
+            else:
+                batch = failed
+                if self.health.state == OPEN:
+                    self.report("FAIL", f"No Connection. Data will be stored locally and uploaded once the connection "
+                                        f"is back, or if triggered from the menu.")
+                else:
+                    self.report("FAIL", f"Connection lost. Trying again in {self.health.wait_time():.0f} seconds.")
+
+    """
+    Sends a batch, and records the result with the connection health
+    @return a (failed, answered) tuple: the events that failed, and whether the online storage answered
+    """
+
+    def _try(self, events):
+        self.batches += 1
+        start = time.monotonic()
+        (failed, answered) = send_batch(self.send, events)
+        if answered:
+            self.health.success(time.monotonic() - start)
+        else:
+            self.health.failure()
+        with self._cond:
+            self._inflight = failed
+        self.sent += len(events) - len(failed)
+        return failed, answered
+
+    """
+    Uploads the events in the outbox, unless it is already being uploaded from the menu
+    @return whether every event in the outbox was tried, or None if it is already being uploaded
+    """
+
+    def _upload_outbox(self):
+        if not replay_lock.acquire(blocking=False):
+            return None
+        try:
+            (finished, sent, failed, seconds) = self.outbox.replay(self.send, self.max_batch)
+        finally:
+            replay_lock.release()
+        if sent:
+            self.report("OKGREEN", f"Connection successful. {sent} backed up events uploaded in {seconds:.1f} seconds"
+                        + (f", {self.outbox.count()} left." if failed else "."))
+        if sent or finished:  # the online storage answered, even if it turned the events down
+            self.health.success()
+        else:
+            self.health.failure()
+        self._outbox_waiting = not finished
+        return finished
+
+    def _take_all(self):
+        with self._cond:
+            events = self._inflight + list(self._events)
+            self._inflight = []
+            self._events.clear()
+        return events
+
+    def _backup(self, events):
+        if events:
+            self.outbox.add_many(events)
+            self.backed_up += len(events)
+            self._outbox_waiting = True
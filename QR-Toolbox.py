@@ -26,7 +26,6 @@ import os.path
 import shutil
 import time
 import pyodbc
-from playsound import playsound
 from datetime import timedelta
 from time import strftime
 from tkinter import *
@@ -38,28 +37,30 @@ from arcgis.geometry import Point
 
 # Import csv packages
 import cv2
-import imutils
-import numpy as np
-import qrcode
-from PIL import Image
-from PIL import ImageDraw
-from PIL import ImageFont
 import math
+import multiprocessing
 from imutils.video import VideoStream
-from pyzbar import pyzbar
-from pyzbar.pyzbar import ZBarSymbol
 
 import threading
 from kivy.app import App
+from kivy.clock import Clock
+from kivy.properties import BooleanProperty
 
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.popup import Popup
 from kivy.core.window import Window
-from Library.garden.recyclelabel import RecycleLabel
+from Library import codec
+from Library.audio import AudioService
+from Library.batch import BatchGenerator, render, save_image
+from Library.console import LogConsole, UIChannel
+from Library.reader import BACKENDS, FrameDecoder, LabelOverlay, MotionGate, ResolutionLadder, RoiTracker, \
+    ScanPipeline, choose_backend, get_backend
+from Library.session import COMMIT, IN, OUT, CheckInTracker, ScanLogWriter, SessionJournal, TimerScheduler
+from Library.upload import ConnectionHealth, LayerCache, Outbox, SqlSink, UploadQueue
+from Library.upload.uploader import replay_lock
 
 # to do
 """
-    Alter code to allow SQL access:
     upload sync fail message should be changed
     Auto upload during session start not triggering
     Read back from ArcGIS to track interactions across multiple devices
@@ -93,19 +94,16 @@ latitude = ""
 longitude = ""
 localQRBatchFile = ""
 # SQL Settings variables
-# sql_address = ""
-# sql_database = ""
-
-# SQL Access Variables
-# query_in = ""
-# query_out = ""
-# headers = []
-# sql_cursor = None
+sql_address = ""
+sql_database = ""
+sql_table = ""
+sql_columns = []  # the source, date and time, text, status and elapsed time columns of sql_table
 
 # System variables
 settings = "Setup/settings.csv"
 qr_storage_file = "System_Data/qr-data.txt"  # file that contains saved session information
-backup_file = "System_Data/backup.txt"  # file that contains data that couldn't be uploaded, to later be uploaded
+outbox_file = "System_Data/outbox.db"  # database that contains data that couldn't be uploaded, to later be uploaded
+backup_file = "System_Data/backup.txt"  # the file earlier versions kept that data in, imported into the outbox
 archive_folder = "Archive"
 fail_ding = "Library/sounds/failed.mp3"
 pass_ding = "Library/sounds/passed.mp3"
@@ -118,8 +116,6 @@ uploadBackup = False
 user_chose_storage = False  # tracks whether user chose a storage method or not
 clear_screen = False  # if True, clear screen, else don't clear it (true only in 4 cases)
 not_yet = False  # prevents the screen from being cleared immediately at the start (only used at the start)
-connection_lost = False  # set if an upload fails
-local_passed = False  # check source of connection error
 
 storagePath = ""  # the path to the local storage directory if chosen
 system_id = os.environ['COMPUTERNAME']  # this is used when checking qr codes in or out
@@ -127,249 +123,65 @@ t_value = timedelta(seconds=10)  # time between scans for the same qr code
 cameraSource = "Integrated"  # the camera source, defaults to integrated (so source 0)
 storageChoice = ""  # users choice of local ('a'), ArcGIS ('b'), or SQL ('c') mode
 vs = None  # global video stream variable, to ensure only 1 instance of it exists at a time
-
-# Lists and Dictionaries used for special character handling and conversion
-trouble_characters = ['\t', '\n', '\r']  # characters that cause issues
-bad_file_name_list = ['*', ':', '"', '<', '>', ',', '/', '|', '?', '\t', '\r', '\n',
-                      '\\']  # can't be used in a filename
-special_characters = ["", "", "", "", "", "", "", "", "", "", "", "", "", "", "", "", "", "", "",
-                      "", "", "", "", "", "", "", "", "", "", "", "", "", "", "", "", "", "", "",
-                      "", "", "", "", "", "", "", "", "", "", "", "", "", "", "", "", "", "", "",
-                      "", "", "", "", ""]
-code_characters = ["!@!a1!", "!@!a2!", "!@!a3!", "!@!a4!", "!@!a5!", "!@!a6!", "!@!a7!", "!@!c1!", "!@!e1!", "!@!e2!",
-                   "!@!e3!", "!@!e4!", "!@!i1!", "!@!i2!", "!@!i3!", "!@!i4!", "!@!o1!", "!@!n1!", "!@!o2!", "!@!o3!",
-                   "!@!o4!", "!@!o5!", "!@!o6!", "!@!o7!", "!@!u1!", "!@!u2!", "!@!u3!", "!@!u4!", "!@!y1!", "!@!b1!",
-                   "!@!y2!", "!@!A1!", "!@!A2!", "!@!A3!", "!@!A4!", "!@!A5!", "!@!A6!", "!@!A7!", "!@!C1!", "!@!E1!",
-                   "!@!E2!", "!@!E3!", "!@!E4!", "!@!I1!", "!@!I2!", "!@!I3!", "!@!I4!", "!@!O1!", "!@!N1!", "!@!O2!",
-                   "!@!O3!", "!@!O4!", "!@!O5!", "!@!O6!", "!@!O7!", "!@!U1!", "!@!U2!", "!@!U3!", "!@!U4!", "!@!Y1!",
-                   "!@!B1!", "!@!Y2!"]
-char_dict_special_to_code = {"": "!@!a1!", "": "!@!a2!", "": "!@!a3!", "": "!@!a4!", "": "!@!a5!", "": "!@!a6!",
-                             "": "!@!a7!", "": "!@!c1!", "": "!@!e1!", "": "!@!e1!", "": "!@!e3!", "": "!@!e4!",
-                             "": "!@!i1!", "": "!@!i2!", "": "!@!i3!", "": "!@!i4!", "": "!@!o1!", "": "!@!n1!",
-                             "": "!@!o2!", "": "!@!o3!", "": "!@!o4!", "": "!@!o5!", "": "!@!o6!", "": "!@!o7!",
-                             "": "!@!u1!", "": "!@!u2!", "": "!@!u3!", "": "!@!u4!", "": "!@!y1!", "": "!@!b1!",
-                             "": "!@!y2!", "": "!@!A1!", "": "!@!A2!", "": "!@!A3!", "": "!@!A4!", "": "!@!A5!",
-                             "": "!@!A6!", "": "!@!A7!", "": "!@!C1!", "": "!@!E1!", "": "!@!E2!", "": "!@!E3!",
-                             "": "!@!E4!", "": "!@!I1!", "": "!@!I2!", "": "!@!I3!", "": "!@!I4!", "": "!@!O1!",
-                             "": "!@!N1!", "": "!@!O2!", "": "!@!O3!", "": "!@!O4!", "": "!@!O5!", "": "!@!O6!",
-                             "": "!@!O7!", "": "!@!U1!", "": "!@!U2!", "": "!@!U3!", "": "!@!U4!", "": "!@!Y1!",
-                             "": "!@!B1!", "": "!@!Y2!"}
-char_dict_code_to_special = {"!@!a1!": "", "!@!a2!": "", "!@!a3!": "", "!@!a4!": "", "!@!a5!": "", "!@!a6!": "",
-                             "!@!a7!": "", "!@!c1!": "", "!@!e1!": "", "!@!e2!": "", "!@!e3!": "", "!@!e4!": "",
-                             "!@!i1!": "", "!@!i2!": "", "!@!i3!": "", "!@!i4!": "", "!@!o1!": "", "!@!n1!": "",
-                             "!@!o2!": "", "!@!o3!": "", "!@!o4!": "", "!@!o5!": "", "!@!o6!": "", "!@!o7!": "",
-                             "!@!u1!": "", "!@!u2!": "", "!@!u3!": "", "!@!u4!": "", "!@!y1!": "", "!@!b1!": "",
-                             "!@!y2!": "", "!@!A1!": "", "!@!A2!": "", "!@!A3!": "", "!@!A4!": "", "!@!A5!": "",
-                             "!@!A6!": "", "!@!A7!": "", "!@!C1!": "", "!@!E1!": "", "!@!E2!": "", "!@!E3!": "",
-                             "!@!E4!": "", "!@!I1!": "", "!@!I2!": "", "!@!I3!": "", "!@!I4!": "", "!@!O1!": "",
-                             "!@!N1!": "", "!@!O2!": "", "!@!O3!": "", "!@!O4!": "", "!@!O5!": "", "!@!O6!": "",
-                             "!@!O7!": "", "!@!U1!": "", "!@!U2!": "", "!@!U3!": "", "!@!U4!": "", "!@!Y1!": "",
-                             "!@!B1!": "", "!@!Y2!": ""}
+decode_workers = 2  # number of threads decoding frames in the QR Reader, can be changed in the settings.csv file
+motion_gate = True  # if True, frames are only decoded when something moves in front of the camera
+motion_keepalive = 2.0  # when motion gating, a frame is still decoded at least this often (in seconds)
+roi_tracking = True  # if True, only the area around the last codes is decoded while they stay in view
+roi_full_every = 10  # when tracking, the full frame is still decoded at least once every this many frames
+decode_widths = (400, 800, None)  # widths frames are decoded at, cheapest first (None is the camera's resolution)
+decode_budget = 0.05  # the most time (in seconds) spent climbing to higher decode resolutions on one frame
+decoder_backend = "auto"  # library used to decode QR codes, 'auto' picks the fastest one at the next session start
+outbox = None  # the Outbox opened from outbox_file, see open_outbox()
+uploader = None  # uploads check-in/out events to ArcGIS in the background, started with the first online QR Reader
+connection_health = ConnectionHealth()  # decides when uploads are tried, shown under the main screen
+audio = None  # plays the sounds in the background, started with the App
+batch_workers = None  # the number of processes batch QR codes are made in, None for one per core of the computer
+batch = None  # the BatchGenerator of the batch being made, if one is
+batch_manifest = "System_Data/batch_manifest.db"  # the batch QR codes saved, and how far through the CSV file it got
+ui = None  # carries the messages and screen changes of the worker threads to the Kivy thread, started with the App
+scan_log_lines = 64  # the scan log files are written in groups of at most this many lines
+scan_log_delay = 0.5  # a scanned line waits at most this long (in seconds) for its group to be written
+scan_log_fsync = COMMIT  # when written lines are put on the disk: NEVER, COMMIT (each group) or every so many seconds
 
 """
-This function converts the passed data based on the other parameters, and returns the converted data
-These conversions fall under 3 cases:
-    1. Data has Special Characters that need to be converted to Code Characters (used in the video() function)
-    2. Data has Code Characters that need to be converted to Special Characters (used for printing the data)
-    3. Data has Special Characters that need to be converted to '-' so that it can be used as a file name
-@param data_to_convert the data that is to be converted
-@param character_list the list of characters that if found are to be converted
-@param conversion_dict the dictionary of characters used for conversion
-@param is_for_file_name if True, the code executes differently by replacing with '-' and printing text. Default is False
-
-Note: For the logic to work when replacing \t,\n, \r with a space, both is_for_file_name and is_for_trouble must be 
-True so that the logic results in the replacement of those chars with space rather than using a dictionary char
-
-@return data_to_convert the changed or unchanged data
-"""
+This function makes a file name out of a QR code's text, replacing the characters that can't be in a file name with
+'-', and tells the user if it had to
+@param screen_label the reference to the scrollable label on the screen that text is put on
+@param name the file name wanted
 
+@return the file name that can be used
+"""
 
-def convert(main_screen, data_to_convert, character_list, conversion_dict, is_for_file_name=False,
-            is_for_trouble=False):
-    old_data = data_to_convert  # saving original data before variable is modified
-    screen_label = main_screen.ids.screen_label
-    setup_screen_label(screen_label)  # setup the screen label
 
-    for char in character_list:  # iterate through chars in character_list and convert if necessary
-        if char in data_to_convert:
-            data_to_convert = data_to_convert.replace(char, conversion_dict[
-                char]) if not is_for_file_name else data_to_convert.replace(char, "-") \
-                if not is_for_trouble else data_to_convert.replace(char, " ")
-            # data is converted to the appropriate character(s) depending on if the conversion is for a bad file
-            # name, or to remove trouble characters, or simply to convert special chars to code chars
-    if old_data != data_to_convert and is_for_file_name and is_for_trouble is not True:
-        # if the data was converted and it was for a bad file name and not only for a trouble character, print this
-        # to user
-        screen_label.text = screen_label.text + f"\n{BaseColors.FAIL}Error saving file with name {old_data}, saved " \
-                                                f"as {data_to_convert} instead.{BaseColors.ENDC} "
-    return data_to_convert
+def file_name_for(screen_label, name):
+    file_name = codec.sanitize(name)
+    if file_name != name:
+        screen_label.write(f"\n{BaseColors.FAIL}Error saving file with name {name}, saved "
+                           f"as {file_name} instead.{BaseColors.ENDC} ")
+    return file_name
 
 
 """
-This function handles HTTP requests, and also handles errors that occur during those attempted connections
-    - If there is an error, then system tries again after 10sec, then 30sec, and then stores the data
-    that was to be uploaded in a file (backup.txt), to be attempted to upload again later on
-@param connection_type the type of connection/request to make (depends on the method caller)
-@param sys_id the id of the system
-@param date_str the date of the data
-@param time_str the time of the data
-@param barcode the data itself
-@param status the status of the data ('IN' or 'OUT')
-@param time_elapsed the time between when data was checked 'IN' and checked 'OUT', only applies when status == 'OUT'
-@param duplicate whether the file/data being uploaded already exists in the backup.txt or not
-
-@return True if connection is successful, False if not
+This function opens the outbox the events that couldn't be uploaded are kept in, if it isn't open yet. The backup.txt 
+file of earlier versions is imported into it the first time.
+
+@return the Outbox
 """
 
 
-def upload(main_screen, connection_type, sys_id, date_str, time_str, barcode, status, time_elapsed=None,
-           duplicate=False, from_backup=False):
-    global connection_lost, storageChoice, local_passed  # , query_out, query_in, sql_cursor, headers
-    if storageChoice == "b":
-        screen_label = main_screen.ids.screen_label
-        setup_screen_label(screen_label)
-        if status == "IN":
-            content = f"{sys_id},{date_str},{time_str},{barcode},{status},NONE"
-        elif status == "OUT":
-            content = f"{sys_id},{date_str},{time_str},{barcode},{status},{time_elapsed}"
-        else:
-            screen_label.text = screen_label.text + f"\n{BaseColors.WARNING}Status not a valid value.{BaseColors.ENDC}"
-            local_passed = False
-            return False
-        i = 0
-        while i < 3:
-            try:
-                return_val = True
-                local_passed = True
-                if connection_type == 'upload':  # if a record needs to be uploaded to arcgis
-                    main_screen.update_arcgis(sys_id, date_str, time_str, barcode, status, time_elapsed)
-                    if not from_backup:
-                        upload_backup(main_screen)
-                else:  # if for some reason connection type is not one of the above
-                    screen_label.text = screen_label.text + f"\n{BaseColors.WARNING}Invalid connection type." \
-                                                            f"{BaseColors.ENDC}"
-                    local_passed = False
-                    return_val = False
-                if i > 0:  # if a connection retry occurred and was successful
-                    screen_label.text = screen_label.text + f"\n{BaseColors.OKGREEN}Connection successful.{BaseColors.ENDC}"
-                return return_val  # so that calling method can use the results accordingly
-            except:
-                e = sys.exc_info()[0]  # used for error checking
-                print(e)
-                if i == 0:  # if first try failed
-                    if connection_lost:
-                        screen_label.text = screen_label.text + f"\n{BaseColors.FAIL}No Connection. {BaseColors.ENDC}" \
-                                                                f"{BaseColors.OKBLUE}Data will be stored locally and " \
-                                                                f"uploaded at the next {BaseColors.OKBLUE}upload point" \
-                                                                f", or if triggered from the menu.{BaseColors.ENDC}"
-                        if connection_type == 'upload':
-                            with open(backup_file, "a") as backup:  # write the data to the backup.txt file
-                                backup.write(f"{content}\n")
-                        local_passed = True
-                        return False  # return a connection failure
-                    else:
-                        screen_label.text = screen_label.text + f"\n{BaseColors.FAIL}Connection lost. Trying again in 10 " \
-                                                                f"seconds.{BaseColors.ENDC}"
-                        time.sleep(10)
-
-                elif i == 1:  # if second try failed
-                    screen_label.text = screen_label.text + f"\n{BaseColors.FAIL}Reconnect failed. Trying again in 30 " \
-                                                            f"seconds.{BaseColors.ENDC}"
-                    time.sleep(30)
-                elif i > 1 and not duplicate:  # if failed thrice, write to backup.txt
-                    connection_lost = True
-                    screen_label.text = screen_label.text + f"\n{BaseColors.FAIL}Reconnect failed again. {BaseColors.ENDC}" \
-                                                            f"{BaseColors.OKBLUE}Data will be stored locally and uploaded at" \
-                                                            f" the {BaseColors.OKBLUE}next upload point, or if triggered " \
-                                                            f"from the menu.{BaseColors.ENDC}"
-                    if connection_type == 'upload':
-                        with open(backup_file, "a") as backup:  # write the data to the backup.txt file
-                            backup.write(f"{content}\n")
-                        local_passed = True
-                    return False  # return a connection failure
-            i += 1
-    # elif storageChoice == "c":
-    #     screen_label = main_screen.ids.screen_label
-    #     setup_screen_label(screen_label)
-    #     date_time = "%s %s" % (date_str, time_str);
-    #     if status == "IN":
-    #         # content = tuple(headers[0:5]) + (sys_id, date_time, barcode)
-    #         content = f"{sys_id},{date_str},{time_str},{barcode},{status},NONE"
-    #         sql_data = (sys_id, date_time, barcode)
-    #         # print(content)
-    #         query = query_in
-    #     elif status == "OUT":  # update needed
-    #         content = f"{sys_id},{date_str},{time_str},{barcode},{status},{time_elapsed}"
-    #         sql_data = (sys_id, date_time, barcode, time_elapsed)
-    #         query = query_out
-    #     else:
-    #         screen_label.text = screen_label.text + f"\n{BaseColors.WARNING}Status not a valid value.{BaseColors.ENDC}"
-    #         local_passed = False
-    #         return False
-    #     i = 0
-    #     # query_find = "SELECT * FROM Table_1;"
-    #     #
-    #     # sql_cursor.execute(query_find)
-    #     # records = sql_cursor.fetchall()
-    #     # for r in records:
-    #     #     print(f"{r.Scan_Date_Time}\t{r.Scanned_Text}\t{r.Scan_Status}\t{r.Elapsed_Time}")
-    #     while i < 3:
-    #         try:
-    #             return_val = True
-    #             local_passed = True
-    #             if connection_type == 'upload':  # if a record needs to be uploaded to arcgis
-    #                 sql_cursor.execute(query, sql_data)
-    #                 if not from_backup:
-    #                     upload_backup(main_screen)
-    #                 sql_cursor.commit()
-    #             else:  # if for some reason connection type is not one of the above
-    #                 screen_label.text = screen_label.text + f"\n{BaseColors.WARNING}Invalid connection type.{BaseColors.ENDC}"
-    #                 local_passed = False
-    #                 return_val = False
-    #             if i > 0:  # if a connection retry occurred and was successful
-    #                 screen_label.text = screen_label.text + f"\n{BaseColors.OKGREEN}Connection successful.{BaseColors.ENDC}"
-    #             return return_val  # so that calling method can use the results accordingly
-    #         except:
-    #             e = sys.exc_info()[0]  # used for error checking
-    #             print(e)
-    #             if i == 0:  # if first try failed
-    #                 if connection_lost:
-    #                     screen_label.text = screen_label.text + f"\n{BaseColors.FAIL}No Connection. {BaseColors.ENDC}" \
-    #                                                             f"{BaseColors.OKBLUE}Data will be stored locally and " \
-    #                                                             f"uploaded at the next {BaseColors.OKBLUE}upload point, or " \
-    #                                                             f"if triggered from the menu.{BaseColors.ENDC}"
-    #                     if connection_type == 'upload':
-    #                         with open(backup_file, "a") as backup:  # write the data to the backup.txt file
-    #                             backup.write(f"{content}\n")
-    #                     local_passed = True
-    #                     return False  # return a connection failure
-    #                 else:
-    #                     screen_label.text = screen_label.text + f"\n{BaseColors.FAIL}Connection lost. Trying again in 10 " \
-    #                                                             f"seconds.{BaseColors.ENDC}"
-    #                     time.sleep(10)
-    #
-    #             elif i == 1:  # if second try failed
-    #                 screen_label.text = screen_label.text + f"\n{BaseColors.FAIL}Reconnect failed. Trying again in 30 " \
-    #                                                         f"seconds.{BaseColors.ENDC}"
-    #                 time.sleep(30)
-    #             elif i > 1 and not duplicate:  # if failed thrice, write to backup.txt
-    #                 connection_lost = True
-    #                 screen_label.text = screen_label.text + f"\n{BaseColors.FAIL}Reconnect failed again. {BaseColors.ENDC}" \
-    #                                                         f"{BaseColors.OKBLUE}Data will be stored locally and uploaded at" \
-    #                                                         f" the {BaseColors.OKBLUE}next upload point, or if triggered " \
-    #                                                         f"from the menu.{BaseColors.ENDC}"
-    #                 if connection_type == 'upload':
-    #                     with open(backup_file, "a") as backup:  # write the data to the backup.txt file
-    #                         backup.write(f"{content}\n")
-    #                     local_passed = True
-    #                 return False  # return a connection failure
-    #         i += 1
-    local_passed = False
-    return False
+def open_outbox():
+    global outbox
+    if outbox is None:
+        outbox = Outbox(outbox_file)
+        outbox.import_backup_file(backup_file)
+    return outbox
 
 
 """
-This function uploads the data that was stored/backed up in the backup.txt file
+This function uploads the events that were stored/backed up in the outbox, in batches of events that are each sent 
+with a single request. The events of a batch are removed from the outbox as soon as it has been uploaded, so if the 
+upload stops part way through, the next one continues where it left off without sending any event twice. Only the 
+events that could not be uploaded are kept in the outbox.
 
 @param main_screen_widget a reference to the main screen so that info can be printed to it
 @param from_menu True if this method was triggered/called from the main menu, False otherwise
@@ -379,32 +191,61 @@ This function uploads the data that was stored/backed up in the backup.txt file
 
 
 def upload_backup(main_screen_widget, from_menu=False):
-    screen_label = main_screen_widget.ids.screen_label
+    screen_label = ui.console(main_screen_widget.ids.screen_label)  # it may be run by the QR Reader thread
     setup_screen_label(screen_label)
-    if os.path.exists(backup_file):  # check if file exists, if not then return
-        with open(backup_file, "r") as backup:
-            screen_label.text = screen_label.text + "\nUploading backed up data..."
-            time_elapsed = None  # assume its IN status so no elapsed time
-            for line in backup:  # for each line, take the appropriate action according to what is read in
-                if line == '\n' or line == "":
-                    continue
-                content = (line.rstrip('\n')).split(',')  # if not empty or newline, then strip newline chars and
-                # split line
-                if content[5] != "NONE":  # if time_elapsed is not none then get time_elapsed
-                    time_elapsed = content[5]
-                successful = upload(main_screen_widget, 'upload', content[0], content[1], content[2], content[3],
-                                    content[4], time_elapsed=time_elapsed, duplicate=True, from_backup=True)
-                # submit data for upload
-                if not successful:  # if upload failed print info to user
-                    screen_label.text = screen_label.text + f"\n{BaseColors.FAIL}Upload of backed up data failed." \
-                                                            f"{BaseColors.ENDC}{BaseColors.OKBLUE} Program will try " \
-                                                            f"again at next upload, {BaseColors.OKBLUE}or you can " \
-                                                            f"trigger upload manually from the menu.{BaseColors.ENDC}"
-                    return False
-            screen_label.text = screen_label.text + f"\n{BaseColors.OKGREEN}Upload complete!{BaseColors.ENDC}"
-        os.remove(backup_file)  # file removed if upload is successful
-    elif from_menu:
-        screen_label.text = screen_label.text + f"\n{BaseColors.OKBLUE}No backed-up data to upload.{BaseColors.ENDC}"
+    if not open_outbox().count():  # check if there are any events, if not then return
+        if from_menu:
+            screen_label.write(f"\n{BaseColors.OKBLUE}No backed-up data to upload."
+                               f"{BaseColors.ENDC}")
+        return False
+    if not replay_lock.acquire(blocking=False):
+        screen_label.write(f"\n{BaseColors.OKBLUE}Backed up data is already being uploaded."
+                           f"{BaseColors.ENDC}")
+        return False
+    try:
+        last_shown = [0.0]
+
+        def progress(done, total, rate):  # shown at most once a second, and for the last batch
+            if done == total or time.monotonic() - last_shown[0] >= 1.0:
+                last_shown[0] = time.monotonic()
+                screen_label.write(f"\n    {done} of {total} records ({rate:.0f} records/s)")
+
+        screen_label.write("\nUploading backed up data...")
+        (finished, sent, failed, seconds) = outbox.replay(upload_function(main_screen_widget),
+                                                          uploader.max_batch if uploader is not None else 50, progress)
+        if sent or finished:  # ArcGIS answered, the uploader resumes right away instead of waiting out its backoff
+            connection_health.success()
+        else:
+            connection_health.failure()
+        if not finished or failed:  # if upload failed print info to user
+            dead = outbox.dead_count()
+            dead = f", {dead} set aside after being turned down {outbox.max_attempts} times" if dead else ""
+            screen_label.write(f"\n{BaseColors.FAIL}Upload of backed up data failed "
+                               f"({outbox.count()} records left{dead}).{BaseColors.ENDC}"
+                               f"{BaseColors.OKBLUE} Program will try again at next upload, "
+                               f"{BaseColors.OKBLUE}or you can trigger upload manually from "
+                               f"the menu.{BaseColors.ENDC}")
+            return False
+        screen_label.write(f"\n{BaseColors.OKGREEN}Upload complete! {sent} records in "
+                           f"{seconds:.1f} seconds.{BaseColors.ENDC}")
+        return True
+    finally:
+        replay_lock.release()
+
+
+"""
+This function uploads the outbox when it is triggered from the menu. It runs on its own thread, so the GUI isn't frozen
+while the records are uploaded and the progress is shown as it goes. The menu's Upload button is disabled until it is
+done.
+@param main_screen_widget a reference to the main screen so that info can be printed to it
+"""
+
+
+def upload_backup_from_menu(main_screen_widget):
+    try:
+        upload_backup(main_screen_widget, True)  # since it comes only from menu, send True
+    finally:
+        ui.call(setattr, main_screen_widget, "uploading_backup", False)
 
 
 """
@@ -419,76 +260,74 @@ This function creates QR codes in batches from a CSV file (defined in the global
 
 
 def qr_batch(main_screen_widget):
+    global batch
     screen_label = main_screen_widget.ids.screen_label
     setup_screen_label(screen_label)
-    screen_label.text = screen_label.text + "\n\nThe batch QR code function is used to quickly create multiple QR " \
-                                            "codes by referencing a .csv file.\n-There is no difference between " \
-                                            "online and local mode for this function, it only works as described " \
-                                            "below.\n-The CSV file must be stored in the root folder of the program (" \
-                                            "where it was installed), and named 'names.csv'.\n    * The file name " \
-                                            "can be changed, but this change must also be reflected in the " \
-                                            "Setup/settings.py file for the \n       variable 'localQRBatchFile'." \
-                                            "\n    * The Tool will then automatically create QR codes for each line " \
-                                            "in the csv, and save each QR Code image to the\n       Tools root folder" \
-                                            "(this folder is usually called 'QR-Toolbox', and should be found in\n   " \
-                                            "    C:/Users/<user>/AppData/Local/Programs), where <user> refers to your" \
-                                            "user name on your computer.\n    * However, if you changed the install " \
-                                            "location, it may not be at that file path.\n-'names.csv' may consist of " \
-                                            "two columns 'first' & 'second'. The 'first' and 'second' columns could " \
-                                            "be \n    populated with participant's first and last names, or other " \
-                                            "information, and will be joined together with a space in\n    between.\n "
-
-    # this code creates a batch of QR codes from a csv file stored in the local directory
-    # QR code image size and input filename can be modified below
-
-    success = True
-    # This one creates the batch of QR codes in the same folder as this file
-    with open(localQRBatchFile) as csvfile:
-        reader = csv.reader(csvfile)  # reader for the csv file
-
-        for row in reader:
-            labeldata = row[0] if len(row) == 1 else row[0] + " " + row[1] if row[1] != '' else row[
-                0]  # combine the data in the first 2 cols depending on which is empty and which isn't
-
-            # convert special char to code character
-            code_label_data = convert(main_screen_widget, labeldata, special_characters, char_dict_special_to_code)
-
-            qr = qrcode.QRCode(  # this and below are to create the QR code
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=10,
-                border=4)
-
-            qr.add_data(code_label_data)
-            qr.make(fit=True)
-            screen_label.text = screen_label.text + "\nCreating QR code: " + labeldata
-
-            # make QR image
-            img = qr.make_image()
-            qr_file = labeldata + ".jpg"
-            qr_file = convert(main_screen_widget, qr_file, bad_file_name_list, None,
-                              True)  # remove special chars that can't be in filename
-            img.save(archive_folder + "/" + qr_file)
-
-            # open QR image and add qr data as name
-            img = Image.open(archive_folder + "/" + qr_file)
-            draw = ImageDraw.Draw(img)
-            qr_font = ImageFont.truetype("arial", 24)
-            color = 0
-            draw.text((37, 10), labeldata, font=qr_font, fill=color)
-            img.save(archive_folder + "/" + qr_file)
-            try:
-                img.save(storagePath + "/" + qr_file)
-            except:
-                success = False  # if any failures occur, set this to success so user knows a failure occurred
-                screen_label.text = screen_label.text + f"\n\n{BaseColors.FAIL}QR Code {labeldata} not " \
-                                                        f"created.{BaseColors.ENDC}\n "
+    screen_label.write("\n\nThe batch QR code function is used to quickly create multiple QR "
+                       "codes by referencing a .csv file.\n-There is no difference between "
+                       "online and local mode for this function, it only works as described "
+                       "below.\n-The CSV file must be stored in the root folder of the program ("
+                       "where it was installed), and named 'names.csv'.\n    * The file name "
+                       "can be changed, but this change must also be reflected in the "
+                       "Setup/settings.py file for the \n       variable 'localQRBatchFile'."
+                       "\n    * The Tool will then automatically create QR codes for each line "
+                       "in the csv, and save each QR Code image to the\n       Tools root folder"
+                       "(this folder is usually called 'QR-Toolbox', and should be found in\n   "
+                       "    C:/Users/<user>/AppData/Local/Programs), where <user> refers to your"
+                       "user name on your computer.\n    * However, if you changed the install "
+                       "location, it may not be at that file path.\n-'names.csv' may consist of "
+                       "two columns 'first' & 'second'. The 'first' and 'second' columns could "
+                       "be \n    populated with participant's first and last names, or other "
+                       "information, and will be joined together with a space in\n    between.\n ")
+
+    if batch is not None:
+        screen_label.write(f"\n{BaseColors.WARNING}A batch is already being created.{BaseColors.ENDC}")
+        return
+    # the codes are made by a pool of processes, the batch is run on its own thread so the GUI is never blocked
+    batch = BatchGenerator([archive_folder, storagePath], batch_workers, manifest=batch_manifest)
+    threading.Thread(target=run_batch, args=(main_screen_widget, batch), daemon=True).start()
 
-    if success:
-        screen_label.text = screen_label.text + f"\n\n{BaseColors.OKGREEN}Success!{BaseColors.ENDC}\n"
+
+"""
+This function runs a batch started by qr_batch, on its own thread. The CSV file is read a chunk of rows at a time, a
+batch that was stopped continues where it left off, and rows whose QR code is already saved are skipped. The codes that
+couldn't be made are reported in the order of the rows of the CSV file, and the progress at most once a second.
+@param main_screen_widget a reference to the main screen so that info can be printed to it
+@param generator the BatchGenerator of the batch
+"""
+
+
+def run_batch(main_screen_widget, generator):
+    global batch
+    screen_label = ui.console(main_screen_widget.ids.screen_label)  # this runs on its own thread, so through ui
+    last_shown = [0.0]
+
+    def progress(done, total, results):
+        for (labeldata, _, error) in results:
+            file_name_for(screen_label, labeldata + ".jpg")  # tells the user if special chars were removed
+            if error is not None:
+                screen_label.write(f"\n\n{BaseColors.FAIL}QR Code {labeldata} not "
+                                   f"created.{BaseColors.ENDC}\n ")
+        if done == total or time.monotonic() - last_shown[0] >= 1.0:
+            last_shown[0] = time.monotonic()
+            eta = generator.eta()
+            eta = "" if eta is None else f", about {timedelta(seconds=round(eta))} left"
+            screen_label.write(f"\nCreating QR codes: {done} of {total} rows ({generator.rate():.0f} rows/s{eta})")
+
+    try:
+        generator.run_file(localQRBatchFile, progress)
+    except OSError as e:  # the CSV file is missing or can't be read
+        screen_label.write(f"\n{BaseColors.FAIL}{localQRBatchFile} could not be read: {e}{BaseColors.ENDC}")
+        return
+    finally:
+        batch = None
+
+    screen_label.write(f"\n{BaseColors.OKBLUE}[INFO] {generator.summary()}.{BaseColors.ENDC}")
+    if generator.failed == 0:
+        screen_label.write(f"\n\n{BaseColors.OKGREEN}Success!{BaseColors.ENDC}\n")
     else:
-        screen_label.text = screen_label.text + f"\n{BaseColors.FAIL}Some or no files were saved in {storagePath}, " \
-                                                f"only in Archive folder.{BaseColors.ENDC}"
+        screen_label.write(f"\n{BaseColors.FAIL}Some or no files were saved in {storagePath}, "
+                           f"only in Archive folder.{BaseColors.ENDC}")
 
 
 """
@@ -505,55 +344,26 @@ def qr_single(main_screen_widget, text):
     setup_screen_label(screen_label)
 
     if text == "":  # if no text is entered into the text box
-        screen_label.text = screen_label.text + "\nSkipped because no text was entered."
+        screen_label.write("\nSkipped because no text was entered.")
         return
 
-    text_copy = text  # this line is probably not needed
-    screen_label.text = screen_label.text + "\nCreating QR code: " + text
-
-    # convert special char to code character
-    text_copy = convert(main_screen_widget, text_copy, special_characters, char_dict_special_to_code)
-
-    # this code creates a single QR code based on information entered into the command line.
-    # The resulting QR code is stored in the current (the programs') directory
-    # QR code image size and input filename can be modified below
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4)
-
-    qr.add_data(text_copy)
-    qr.make(fit=True)
-
-    # draw label
-    img = qr.make_image()
-    file_name = text + ".jpg"
-    file_name = convert(main_screen_widget, file_name, bad_file_name_list, None,
-                        True)  # convert chars that can't be in a file name
-    img.save(archive_folder + "/" + file_name)
-
-    # Open QR image and add QR data as name
-    img = Image.open(archive_folder + "/" + file_name)
-    draw = ImageDraw.Draw(img)
-    qr_font = ImageFont.truetype("arial", 24)
-    color = 0
-    draw.text((37, 10), text, font=qr_font, fill=color)
-    img.save(archive_folder + "/" + file_name)
-
-    succeed = True
-    # Store QR code locally
-    try:  # try to save, if it fails then let user know
-        img.save(storagePath + "/" + file_name)
-    except:
-        succeed = False
-        screen_label.text = screen_label.text + f"\n\n{BaseColors.FAIL}QR Code {text} not created.{BaseColors.ENDC}\n"
-
-    if succeed:
-        screen_label.text = screen_label.text + f"\n{BaseColors.OKGREEN}Success!{BaseColors.ENDC}"
-    else:
-        screen_label.text = screen_label.text + f"\n{BaseColors.FAIL}File not saved in {storagePath}, only in " \
-                                                f"Archive folder.{BaseColors.ENDC}"
+    screen_label.write("\nCreating QR code: " + text)
+
+    # the QR code and its label are made in memory, and the same image is saved in the Archive and storage folders
+    file_name = file_name_for(screen_label, text + ".jpg")  # convert chars that can't be in a file name
+    folders = [archive_folder, storagePath]
+    errors = save_image(render(text), folders, file_name)  # the folders it couldn't be saved in -> the error
+
+    if not errors:
+        screen_label.write(f"\n{BaseColors.OKGREEN}Success!{BaseColors.ENDC}")
+        return
+    saved = [folder for folder in folders if folder not in errors]
+    if not saved:  # if it failed then let user know
+        screen_label.write(f"\n\n{BaseColors.FAIL}QR Code {text} not created.{BaseColors.ENDC}\n")
+    for (folder, error) in errors.items():
+        screen_label.write(f"\n{BaseColors.FAIL}File not saved in {folder} ({error}).{BaseColors.ENDC}")
+    if saved:
+        screen_label.write(f"\n{BaseColors.WARNING}File only saved in {', '.join(saved)}.{BaseColors.ENDC}")
 
 
 """
@@ -574,7 +384,7 @@ def cons(main_screen_widget):
                      fn.startswith('QRT-R-') and fn.endswith('.csv') and fn.__contains__("_")]
         # above: get all csv files that start with QRT-R- and end with .csv and have  a '_' in them
         if not qrt_files:  # if its empty then print this
-            screen_label.text = screen_label.text + "\nNo entries to combine. Check the storage directory and try again"
+            screen_label.write("\nNo entries to combine. Check the storage directory and try again")
         else:  # if not empty then go through them and copy them into one file
             try:
                 with open(cons_filename, 'wb') as outfile:
@@ -582,24 +392,129 @@ def cons(main_screen_widget):
                         fname = os.path.join(storagePath, fname)
                         with open(fname, 'rb') as infile:
                             shutil.copyfileobj(infile, outfile)  # copy data from each file to the consolidated file
-                            screen_label.text = screen_label.text + f"\n{fname} has been imported."
-                screen_label.text = screen_label.text + f"\n\n{BaseColors.OKGREEN}Consolidated file created in the " \
-                                                        f"specified storage directory under {BaseColors.OKBLUE}" \
-                                                        f"{BaseColors.OKGREEN}the filename " + cons_filename + \
-                                    f"{BaseColors.ENDC}\n"
+                            screen_label.write(f"\n{fname} has been imported.")
+                screen_label.write(f"\n\n{BaseColors.OKGREEN}Consolidated file created in the "
+                                   f"specified storage directory under {BaseColors.OKBLUE}"
+                                   f"{BaseColors.OKGREEN}the filename " + cons_filename +
+               f"{BaseColors.ENDC}\n")
             except:
-                screen_label.text = screen_label.text + f"\n{BaseColors.WARNING}[WARNING] Either the system was " \
-                                                        f"unable to write the consolidated file {BaseColors.ENDC}" \
-                                                        f"{BaseColors.WARNING}to the specified storage directory or " \
-                                                        f"the file {BaseColors.ENDC}" + cons_filename + \
-                                    f"{BaseColors.WARNING} is currently in use {BaseColors.ENDC}" \
-                                    f"{BaseColors.WARNING}or unavailable. The consolidated record " \
-                                    f"may be incomplete.{BaseColors.ENDC}\n"
+                screen_label.write(f"\n{BaseColors.WARNING}[WARNING] Either the system was "
+                                   f"unable to write the consolidated file {BaseColors.ENDC}"
+                                   f"{BaseColors.WARNING}to the specified storage directory or "
+                                   f"the file {BaseColors.ENDC}" + cons_filename +
+               f"{BaseColors.WARNING} is currently in use {BaseColors.ENDC}"
+               f"{BaseColors.WARNING}or unavailable. The consolidated record "
+               f"may be incomplete.{BaseColors.ENDC}\n")
     else:  # if no storage location chosen yet
-        screen_label.text = screen_label.text + f"\n{BaseColors.WARNING}A storage location has not been established. " \
-                                                f"Specify a storage folder using the {BaseColors.ENDC}" \
-                                                f"{BaseColors.WARNING}'Choose Storage Location' option before " \
-                                                f"continuing\n{BaseColors.ENDC}"
+        screen_label.write(f"\n{BaseColors.WARNING}A storage location has not been established. "
+                           f"Specify a storage folder using the {BaseColors.ENDC}"
+                           f"{BaseColors.WARNING}'Choose Storage Location' option before "
+                           f"continuing\n{BaseColors.ENDC}")
+
+
+"""
+This function runs a short benchmark of the decoder backends on live frames from the camera, and saves the fastest
+backend that reads reliably to the settings.csv file, so that later sessions use it without running the benchmark
+@param main_screen reference to main screen to print info
+@param stream the video stream to take the frames from
+"""
+
+
+def benchmark_decoders(main_screen, stream):
+    global decoder_backend
+    screen_label = ui.console(main_screen.ids.screen_label)  # it is run by the QR Reader thread
+    screen_label.write(f"\n{BaseColors.OKBLUE}Choosing the fastest QR decoder for this "
+                       f"computer...{BaseColors.ENDC}")
+    frames = []
+    last_frame = None
+    deadline = time.monotonic() + 3.0
+    while len(frames) < 10 and time.monotonic() < deadline:  # collect a few distinct frames from the camera
+        frame = stream.read()
+        if frame is not None and frame is not last_frame:
+            frames.append(frame)
+            last_frame = frame
+        time.sleep(0.05)
+    if not frames:
+        screen_label.write(f"\n{BaseColors.WARNING}No frames to test the decoders on, using "
+                           f"pyzbar for this session.{BaseColors.ENDC}")
+        return
+
+    name, results = choose_backend(frames)
+    for backend, (seconds, read) in results.items():
+        screen_label.write(f"\n    {backend}: {seconds * 1000:.1f} ms per frame, read "
+                           f"{read:.0%} of test codes")
+    decoder_backend = name
+    save_reader_settings()
+    screen_label.write(f"\n{BaseColors.OKBLUE}Using the {name} decoder, this choice is saved "
+                       f"in the settings.csv file.{BaseColors.ENDC}")
+
+
+"""
+This function writes the QR Reader settings (the 7th and 8th lines) back to the settings.csv file, leaving the other
+lines as they are
+"""
+
+
+def save_reader_settings():
+    with open(settings, 'r', encoding='utf-8') as set_file:
+        lines = set_file.read().splitlines()
+    lines += [""] * (6 - len(lines))  # older settings files may not have the SQL lines
+    header = "decode_workers,motion_gate,keepalive_seconds,roi_tracking,full_frame_every,decoder_backend"
+    values = f"{decode_workers},{motion_gate},{motion_keepalive:g},{roi_tracking},{roi_full_every},{decoder_backend}"
+    with open(settings, 'w', encoding='utf-8') as set_file:
+        set_file.write("\n".join(lines[:6] + [header, values] + lines[8:]) + "\n")
+
+
+"""
+This function looks up the ArcGIS feature layer events are uploaded to, and the point they are placed at. It is used
+through the main screen's LayerCache, so that it only runs when the layer isn't cached.
+@param gis the access to ArcGIS online
+
+@return the (item, layer, point) the events are uploaded with
+"""
+
+
+def resolve_layer(gis):
+    search_results = gis.content.search(query=gis_query, max_items=15)  # query is set in the settings.csv file
+    data = search_results[0]  # code auto chooses the first option on the list
+    layer = data.layers[0]
+    # Get the geo coordinates
+    point = Point({"x": longitude, "y": latitude, "spatialReference": {"wkid": 4326}})  # other is 3857
+    return data, layer, point
+
+
+"""
+This function picks what events are uploaded with, depending on the storage mode
+@param main_screen reference to main screen, which holds the ArcGIS layer and the SQL connection
+
+@return the function that uploads a batch of events, the SQL sink's in SQL mode and ArcGIS's otherwise
+"""
+
+
+def upload_function(main_screen):
+    if storageChoice.lower() == 'c':
+        return main_screen.sql_sink.insert
+    return main_screen.update_arcgis
+
+
+"""
+This function starts the background uploader the QR Reader puts its check-in/out events in, if it isn't running yet.
+It keeps running between QR Reader sessions, and is stopped when the program closes.
+@param main_screen reference to main screen, used to upload to ArcGIS and to print info
+"""
+
+
+def start_uploader(main_screen):
+    global uploader
+    screen_label = main_screen.ids.screen_label
+
+    def report(color, message):
+        ui.write(screen_label, f"\n{getattr(BaseColors, color)}{message}{BaseColors.ENDC}")  # from the uploader
+
+    if uploader is None:
+        uploader = UploadQueue(upload_function(main_screen), open_outbox(), connection_health, report)
+    uploader.send = upload_function(main_screen)  # the storage mode may have changed since it was started
+    uploader.start()
 
 
 # GUI PART OF PROGRAM STARTS HERE
@@ -623,12 +538,12 @@ def store(main_screen):
     root.withdraw()
     store_path = filedialog.askdirectory(title='Select a Storage Directory')  # ask user to choose a directory
     if os.path.exists(store_path):  # if they chose one
-        screen_label.text = screen_label.text + f"\n{BaseColors.OKGREEN}Storage directory established: " \
-                                                f"{store_path}{BaseColors.ENDC}"
+        screen_label.write(f"\n{BaseColors.OKGREEN}Storage directory established: "
+                           f"{store_path}{BaseColors.ENDC}")
         user_chose_storage = True
     else:
-        screen_label.text = screen_label.text + f"\n{BaseColors.WARNING}Storage directory NOT " \
-                                                f"established{BaseColors.ENDC}"
+        screen_label.write(f"\n{BaseColors.WARNING}Storage directory NOT "
+                           f"established{BaseColors.ENDC}")
         user_chose_storage = False
     return store_path
 
@@ -662,11 +577,29 @@ it is the main screen within which all other screens/widgets/buttons are located
 class MainScreenWidget(BoxLayout):
     sys_id = os.environ["COMPUTERNAME"]  # this may be a repeat
     gis = None  # contains the access to arcgis online to upload data
+    layer_cache = None  # holds the layer data is uploaded to, looked up when signing in
+    sql_sink = None  # the connection to the SQL table data is uploaded to in SQL mode, opened when signing in
     timer = None  # used to time how long users are checked in and alert any who exceed this amount of elapsed time
+    alerts = None  # the TimerScheduler of the running QR Reader session
+    timer_alert_widget = None  # the alert shown until the user acknowledges it, later codes over the timer join it
+    uploading_backup = BooleanProperty(False)  # the outbox is being uploaded from the menu
 
     def __init__(self, **kwargs):  # start the program and bind the 'X' button the exit function
         super(MainScreenWidget, self).__init__(**kwargs)
         Window.bind(on_request_close=self.exit)
+        Clock.schedule_interval(self.show_connection, 1.0)
+
+    """
+    This function shows the state of the connection to the online storage under the main screen, once a second. It is
+    empty until the uploader has been started.
+    @param dt the time since it was last called, passed by the Clock
+    """
+
+    def show_connection(self, dt):
+        if uploader is None:
+            return
+        self.ids.connection_label.text = f"{connection_health.summary()} | {uploader.summary()} | " \
+                                         f"outbox {outbox.count()} (oldest {outbox.oldest_age():.0f}s)"
 
     """
     This function starts a VideoStream, and captures any QR Codes it sees (in a certain distance)
@@ -677,16 +610,16 @@ class MainScreenWidget(BoxLayout):
     """
 
     def video(self):
-        global user_chose_storage, vs, uploadBackup, checkStorage, local_passed
+        global user_chose_storage, vs, uploadBackup, checkStorage
 
-        screen_label = self.ids.screen_label
+        screen_label = ui.console(self.ids.screen_label)  # this runs on its own thread, so through ui
         setup_screen_label(screen_label)
 
         if user_chose_storage:
-            screen_label.text = screen_label.text + f"\n{BaseColors.OKBLUE}[ALERT] Starting video stream..." \
-                                                    f"{BaseColors.ENDC}\n"
-            screen_label.text = screen_label.text + f"{BaseColors.OKBLUE}To exit, close the webcam " \
-                                                    f"window.{BaseColors.ENDC}"
+            screen_label.write(f"\n{BaseColors.OKBLUE}[ALERT] Starting video stream..."
+                               f"{BaseColors.ENDC}\n")
+            screen_label.write(f"{BaseColors.OKBLUE}To exit, close the webcam "
+                               f"window.{BaseColors.ENDC}")
 
             # construct the argument parser and parse the arguments
             ap = argparse.ArgumentParser()
@@ -701,10 +634,10 @@ class MainScreenWidget(BoxLayout):
             else:
                 local_file = ""
                 if storageChoice == 'a':
-                    screen_label.text = screen_label.text + f"\n{BaseColors.WARNING}[ALERT]: Storage folder not " \
-                                                            f"established or is unavailable.\n {BaseColors.ENDC}" \
-                                                            f"{BaseColors.WARNING}Files will only be saved to the " \
-                                                            f"root/working directory\n{BaseColors.ENDC} "
+                    screen_label.write(f"\n{BaseColors.WARNING}[ALERT]: Storage folder not "
+                                       f"established or is unavailable.\n {BaseColors.ENDC}"
+                                       f"{BaseColors.WARNING}Files will only be saved to the "
+                                       f"root/working directory\n{BaseColors.ENDC} ")
 
             # initialize the video stream and allow the camera sensor to warm up
             try:
@@ -715,26 +648,36 @@ class MainScreenWidget(BoxLayout):
                 elif cameraSource == 'PiCamera':
                     vs = VideoStream(usePiCamera=True).start()  # for mobile solution like Raspberry Pi Camera
                 else:
-                    screen_label.text = screen_label.text + f"\n{BaseColors.FAIL}An error has " \
-                                                            f"occurred.{BaseColors.ENDC}"
+                    screen_label.write(f"\n{BaseColors.FAIL}An error has "
+                                       f"occurred.{BaseColors.ENDC}")
                     return
             except:  # if an error occurs in creating video stream, print to user and return
-                screen_label.text = screen_label.text + f"\n{BaseColors.FAIL}An error occurred starting the QR " \
-                                                        f"Reader. Check your cameras and try again.{BaseColors.ENDC}"
+                screen_label.write(f"\n{BaseColors.FAIL}An error occurred starting the QR "
+                                   f"Reader. Check your cameras and try again.{BaseColors.ENDC}")
                 vs = None
-                self.ids.qrreader.disabled = False  # makes QR Reader btn enabled again
+                ui.call(setattr, self.ids.qrreader, "disabled", False)  # makes QR Reader btn enabled again
                 return
 
             time.sleep(5.0)  # give camera time
 
-            # open the output txt file for writing and initialize the set of barcodes found thus far
+            if decoder_backend not in BACKENDS:  # if no decoder has been picked for this computer yet
+                benchmark_decoders(self, vs)
+
+            def report_scan_log(color, message):  # called by the scan log writer
+                screen_label.write(f"\n{getattr(BaseColors, color)}{message}{BaseColors.ENDC}")
+                if color == "FAIL":  # scans that couldn't be recorded, as a scan that failed to check in or out did
+                    audio.play("fail")  # makes a slightly deeper beeping sound
+
+            # open the output txt file for writing and initialize the set of barcodes found thus far, the scanned
+            # lines are written to it (and to local_file) in groups by the scan log writer
+            scan_log = ScanLogWriter(scan_log_lines, scan_log_delay, scan_log_fsync, report=report_scan_log)
             if os.path.isfile(args["output"]) and checkStorage:  # check if user wanted to restart prev session
-                if (storageChoice.lower() == 'b') and uploadBackup:  # do this only if QR Toolbox is in online-mode
-                    # add "or storageChoice.lower() == 'c'" if SQL active
-                    # Write previous records back to contentStrings
+                if storageChoice.lower() in ('b', 'c') and uploadBackup:  # do this only if QR Toolbox is in online-mode
+                    # Write previous records back to contentStrings, they are uploaded in batches in the background
+                    start_uploader(self)
                     with open(args["output"], "r", encoding='utf-8') as txt:
-                        screen_label.text = screen_label.text + f"\n{BaseColors.OKBLUE}Restoring records (online " \
-                                                                f"mode)...{BaseColors.ENDC}"
+                        screen_label.write(f"\n{BaseColors.OKBLUE}Restoring records (online "
+                                           f"mode)...{BaseColors.ENDC}")
                         for line in txt:  # get each record from the file by line
                             if line == '\n':
                                 continue  # if line is newline only then skip it
@@ -765,93 +708,97 @@ class MainScreenWidget(BoxLayout):
                                 status = status[:len(status) - 1]  # else just remove the newline char from the status
 
                             if status == "IN":  # if status is IN, no duration
-                                success = upload(self, "upload", last_system_id, file_date, file_time_online,
-                                                 barcode_data_special, status)
+                                uploader.put(last_system_id, file_date, file_time_online, barcode_data_special,
+                                             status)
                             else:  # if status is OUT, add duration of qr code being checked in
-                                success = upload(self, "upload", last_system_id, file_date, file_time_online,
-                                                 barcode_data_special, status, duration)
-                            if not success:
-                                break  # if upload failed, break loop and let user know it failed
-                elif (storageChoice.lower() == 'b') and not uploadBackup:
-                    # add "or storageChoice.lower() == 'c'" if SQL active
-                    screen_label.text = screen_label.text + f"\n{BaseColors.OKBLUE}Restoring records (online mode)" \
-                                                            f"...{BaseColors.ENDC}\n" \
-                                                            f"{open(args['output'], 'r', encoding='utf-8').read()}"
+                                uploader.put(last_system_id, file_date, file_time_online, barcode_data_special,
+                                             status, duration)
+                elif storageChoice.lower() in ('b', 'c') and not uploadBackup:
+                    screen_label.write(f"\n{BaseColors.OKBLUE}Restoring records (online mode)"
+                                       f"...{BaseColors.ENDC}\n"
+                                       f"{open(args['output'], 'r', encoding='utf-8').read()}")
                 if storageChoice.lower() == 'a':
                     # if in local mode, just open barcodes.txt for appending to restorerecords
-                    screen_label.text = screen_label.text + f"\n{BaseColors.OKBLUE}Restoring records (local mode)" \
-                                                            f"...{BaseColors.ENDC}\n" \
-                                                            f"{open(args['output'], 'r', encoding='utf-8').read()}"
+                    screen_label.write(f"\n{BaseColors.OKBLUE}Restoring records (local mode)"
+                                       f"...{BaseColors.ENDC}\n"
+                                       f"{open(args['output'], 'r', encoding='utf-8').read()}")
                     if local_file != "":
                         with open(args["output"], "r", encoding='utf-8') as txt:
                             with open(local_file, "a", encoding="ANSI") as csv2:
                                 for line in txt:
                                     csv2.write(line)
 
-                try:
-                    txt = open(args["output"], "a",
-                               encoding="utf-8")  # reopen txt file for appending (to continue records)
+                try:  # reopen txt file for appending (to continue records)
+                    scan_log.open("barcodes", args["output"], "a", encoding="utf-8")
                     success = True
                 except:
                     success = False
                 if success:
-                    screen_label.text = screen_label.text + f"\n{BaseColors.OKBLUE}Previous records restored." \
-                                                            f"{BaseColors.ENDC}"
+                    screen_label.write(f"\n{BaseColors.OKBLUE}Previous records restored."
+                                       f"{BaseColors.ENDC}")
                 else:
-                    screen_label.text = screen_label.text + f"\n{BaseColors.FAIL}Previous records NOT restored." \
-                                                            f"{BaseColors.ENDC}"
+                    screen_label.write(f"\n{BaseColors.FAIL}Previous records NOT restored."
+                                       f"{BaseColors.ENDC}")
             else:  # if no previous records and user wanted to restart/restore them then print that none exist
-                txt = open(args["output"], "w", encoding="utf-8")  # else open new file/overwrite previous
+                scan_log.open("barcodes", args["output"], "w", encoding="utf-8")  # else open new file/overwrite
                 if checkStorage:
-                    screen_label.text = screen_label.text + f"\n{BaseColors.WARNING}No previous records found. CSV " \
-                                                            f"file will not include {BaseColors.ENDC}" \
-                                                            f"{BaseColors.WARNING}past records.{BaseColors.ENDC}"
+                    screen_label.write(f"\n{BaseColors.WARNING}No previous records found. CSV "
+                                       f"file will not include {BaseColors.ENDC}"
+                                       f"{BaseColors.WARNING}past records.{BaseColors.ENDC}")
 
-            # time track variables. These are used to keep track of QR codes as they enter the screen
-            found = []
-            found_time = []
-            found_status = []
-            thread_started = []  # tracks if a thread for the item in the given position has been started already, bool
+            # keeps track of QR codes as they enter the screen, and whether they are checked in or out
+            session = CheckInTracker(t_value)
+            journal = SessionJournal(qr_storage_file, session.store)  # every change is appended to qr_storage_file
 
             # Check if there are any stored QR codes that were scanned-in in an earlier instance of the system
             if checkStorage:
                 if os.path.exists(qr_storage_file) and os.stat(qr_storage_file).st_size != 0:
-                    screen_label.text = screen_label.text + f"\n{BaseColors.OKBLUE}Restarting session" \
-                                                            f"...{BaseColors.ENDC}"
-                    with open(qr_storage_file, "r") as qr_data_file:
-                        for line in qr_data_file:  # if yes, read them in line by line
-                            if line == '\n':
-                                continue
-                            line_array = line.split(",")
-                            found.append(line_array[0])  # append file data to the found arrays
-                            found_time.append(datetime.datetime.strptime(line_array[1], "%Y-%m-%d %H:%M:%S"))
-                            found_status.append(line_array[2][:len(line_array[2]) - 1:])
-                            thread_started.append(False)
-                    if storageChoice.lower() == 'b':
-                        # add "or storageChoice.lower() == 'c'" if SQL active
+                    screen_label.write(f"\n{BaseColors.OKBLUE}Restarting session"
+                                       f"...{BaseColors.ENDC}")
+                    journal.replay()  # if yes, replay the journal to read them back into the session
+                    if journal.rejected:
+                        screen_label.write(f"\n{BaseColors.WARNING}[ALERT] {len(journal.rejected)} line(s) of "
+                                           f"{qr_storage_file} couldn't be read and were not restored, they are kept "
+                                           f"in {qr_storage_file}.rejected{BaseColors.ENDC}")
+                    if storageChoice.lower() in ('b', 'c'):
                         upload_backup(self)
-                    screen_label.text = screen_label.text + f"\n{BaseColors.OKBLUE}Previous session restarted." \
-                                                            f"{BaseColors.ENDC}"
+                    screen_label.write(f"\n{BaseColors.OKBLUE}Previous session restarted."
+                                       f"{BaseColors.ENDC}")
                 elif not os.path.exists(qr_storage_file) or os.stat(qr_storage_file).st_size == 0:
-                    screen_label.text = screen_label.text + f"\n{BaseColors.WARNING}No previous session found " \
-                                                            f"[qr-data.txt not found or is empty].{BaseColors.ENDC}"
+                    screen_label.write(f"\n{BaseColors.WARNING}No previous session found "
+                                       f"[qr-data.txt not found or is empty].{BaseColors.ENDC}")
+            if storageChoice.lower() in ('b', 'c'):  # events are uploaded in the background, scanning never waits
+                start_uploader(self)
             if storageChoice.lower() == 'a' and local_file != "":
-                local_timer = datetime.datetime.now()
-                local_temp = []
-            # loop over the frames from the video stream
+                scan_log.open("local", local_file, "a", encoding="ANSI")
+            # the timer thread alerts the user when codes go over the timer, it sleeps until the next one is due
+            self.alerts = TimerScheduler(session, self.timer_alert, lambda: audio.play("alarm"))
+            self.alerts.set_timer(self.timer)
+            # start the capture and decode stages, frames are shown with a maximum width of 400 pixels
+            gate = MotionGate(keepalive=motion_keepalive) if motion_gate else None
+            tracker = RoiTracker(full_every=roi_full_every) if roi_tracking else None
+            ladder = ResolutionLadder(decode_widths, decode_budget)
+            overlay = LabelOverlay()  # the labels of the codes seen are rendered once, and drawn from then on
+            decoder = FrameDecoder(gate, tracker, ladder, get_backend(decoder_backend))
+            pipeline = ScanPipeline(vs, decoder, workers=decode_workers, display_width=400).start()
+            shown = False  # the window can only be checked for being closed once it has been shown
+            # loop over the decoded frames coming out of the pipeline
             while True:
-                # grab the frame from the threaded video stream and resize it to have a maximum width of 400 pixels
-                frame = None
-                try:  # if the video stream stops working or is changed
-                    frame = vs.read()
-                    frame = imutils.resize(frame, width=400)
-                except:  # then catch and break the loop, and do clean up
-                    screen_label.text = screen_label.text + f"\n{BaseColors.FAIL}Video stream lost. Check your " \
-                                                            f"cameras. Proceeding to clean up.{BaseColors.ENDC}"
+                result = pipeline.next_result(timeout=0.1)
+                if pipeline.stream_lost:  # if the video stream stops working or is changed, do clean up
+                    screen_label.write(f"\n{BaseColors.FAIL}Video stream lost. Check your "
+                                       f"cameras. Proceeding to clean up.{BaseColors.ENDC}")
                     break
+                if result is None:  # no new frame yet, keep the window responsive while waiting
+                    if shown:
+                        cv2.waitKey(1)
+                        if cv2.getWindowProperty('QR Toolbox', cv2.WND_PROP_VISIBLE) < 1:
+                            break
+                    continue
 
-                # find the barcodes in the frame and decode each of the barcodes
-                barcodes = pyzbar.decode(frame, symbols=[ZBarSymbol.QRCODE])
+                # the barcodes in the frame have already been found and decoded by the pipeline
+                frame = result.frame
+                barcodes = result.barcodes
                 timestr = datetime.datetime.now()
                 # hour = timestr.hour + 4  # this is to counter the weird arcgis effect where it auto subtracts 4 hrs
                 # if hour > 23:
@@ -880,193 +827,111 @@ class MainScreenWidget(BoxLayout):
                     barcode_type = barcode.type
 
                     # Convert barcode_data code chars back to special chars
-                    barcode_data = convert(self, barcode_data, code_characters, char_dict_code_to_special)
-
-                    # Draw the barcode data and barcode type on the image
-                    img = Image.new('RGB', (400, 15), color='white')
-                    img.putalpha(0)
-                    d = ImageDraw.Draw(img)
-                    text_to_print = convert(self, barcode_data, trouble_characters, None, True,
-                                            True)  # replace \t,\n,\r with ' '
-                    try:  # if code was not generated by qr tool or doesn't meet its conditions, let user know
-                        d.text((0, 0), text_to_print + ' (' + barcode_type + ')', fill='blue')
-                    except UnicodeEncodeError:
-                        screen_label.text = screen_label.text + f"\n{BaseColors.FAIL}[ERROR] Can't use QR Codes not " \
-                                                                f"generated by the system.{BaseColors.ENDC}"
+                    barcode_data = codec.decode(barcode_data)
+
+                    # Draw the barcode data and barcode type on the image, right on the frame's pixels
+                    text_to_print = codec.one_line(barcode_data)  # replace \t,\n,\r with ' '
+                    # if code was not generated by qr tool or doesn't meet its conditions, let user know
+                    if not overlay.draw(frame, x, y - 15, text_to_print + ' (' + barcode_type + ')'):
+                        screen_label.write(f"\n{BaseColors.FAIL}[ERROR] Can't use QR Codes not "
+                                           f"generated by the system.{BaseColors.ENDC}")
                         continue
 
-                    pil_image = Image.fromarray(frame)  # convert frame to pil image format, then to numpy array
-                    pil_image.paste(img, box=(x, y - 15),
-                                    mask=img)  # not sure exactly what's going on here, but it is vital I believe
-                    frame = np.array(pil_image)
+                    # get current time, and pass the scan to the session to see if the code's status changes
+                    datetime_scanned = datetime.datetime.now()  # this one is kept in the session
+                    date_scanned = datetime_scanned.strftime("%m/%d/%Y")  # this one prints to csv
+                    time_scanned = datetime_scanned.strftime("%H:%M:%S")  # this one prints to csv
+                    event, time_check = session.scan(barcode_data, datetime_scanned)
+
+                    # if the barcode data has never been seen, the user was checked in, so write the timestamp +
+                    # barcode to disk and record id, date, and time information
+                    if event == IN:
+                        line = "{},{},{},{},{}\n".format(system_id, date_scanned, time_scanned, barcode_data, "IN")
+                        scan_log.write("barcodes", line)  # write scanned data to the text file
 
-                    # if the barcode text is currently not in our CSV file, write the timestamp + barcode to disk
-                    # and update the set of barcode data has never been seen, check the user in and record id, date,
-                    # and time information
-                    if barcode_data not in found:
-                        datetime_scanned = datetime.datetime.now()  # this one appended to found_time arr
-                        date_scanned = datetime.datetime.now().strftime("%m/%d/%Y")  # this one prints to csv
-                        time_scanned = datetime.datetime.now().strftime("%H:%M:%S")  # this one prints to csv
+                        if storageChoice.lower() == 'a' and local_file != "":
+                            scan_log.write("local", line)
+
+                        if storageChoice.lower() in ('b', 'c'):  # if user chose online (ArcGIS or SQL), queue it for upload
+                            uploader.put(system_id, datestr, timestr, barcode_data, "IN")
 
-                        txt.write("{},{},{},{},{}\n".format(system_id, date_scanned, time_scanned,
-                                                            barcode_data, "IN"))  # write scanned data to the text file
-                        txt.flush()
+                        screen_label.write(f"\n{barcode_data} checking IN at {date_scanned} "
+                                           f"{time_scanned} at location: {system_id}")
+                        audio.play("pass")  # makes a beeping sound on scan in, without waiting for it
+
+                    # if time exceeds wait period and user is checked in then they were checked out
+                    elif event == OUT:
+                        line = "{},{},{},{},{},{}\n".format(system_id, date_scanned, time_scanned, barcode_data,
+                                                              "OUT", time_check)
+                        scan_log.write("barcodes", line)  # write to local txt file
 
                         if storageChoice.lower() == 'a' and local_file != "":
-                            local_temp.append(
-                                "{},{},{},{},{}\n".format(system_id, date_scanned, time_scanned, barcode_data, "IN"))
-
-                        found.append(
-                            barcode_data)  # add the scanned data to the found arrays so status/times can be managed
-                        found_time.append(datetime_scanned)
-                        found_status.append("IN")
-                        thread_started.append(
-                            False)  # added so that it corresponds to the actual data in the found arrays
-
-                        # Write updated found arrays to qr_data_file so that it is up to date with the latest scan ins
-                        with open(qr_storage_file, "w") as qr_data_file:
-                            for i in range(len(found)):
-                                code = found[i]
-                                tyme = found_time[i]
-                                status = found_status[i]
-                                qr_data_file.write("{0},{1},{2}\n".format(code, tyme, status))
-
-                        success = True
-                        if storageChoice.lower() == 'b':  # if user chose online/arcgis
-                            # add "or storageChoice.lower() == 'c'" if SQL active
-                            success = upload(self, "upload", system_id, datestr, timestr, barcode_data, "IN")
-
-                        if success:
-                            screen_label.text = screen_label.text + f"\n{barcode_data} checking IN at {date_scanned} " \
-                                                                    f"{time_scanned} at location: {system_id}"
-                            playsound(pass_ding)  # makes a beeping sound on scan in
-                        elif local_passed and not success:
-                            screen_label.text = screen_label.text + f"\n{BaseColors.WARNING}Online login unavailable" \
-                                                                    f" at current time, continuing local login" \
-                                                                    f"\n{barcode_data} checking IN at " \
-                                                                    f"{date_scanned} {time_scanned} at location: " \
-                                                                    f"{system_id}"
-                            playsound(pass_ding)
-                        elif not success and not local_passed:
-                            screen_label.text = screen_label.text + f"\n{BaseColors.WARNING}{barcode_data} NOT " \
-                                                                    f"CHECKED IN, SEE ABOVE ERROR{BaseColors.ENDC}"
-                            playsound(fail_ding)  # makes a slightly deeper beeping sound on failed scan in
-
-                    # if barcode information is found...
-                    elif barcode_data in found:
-                        # get current time and also total time passed since user checked in
-                        datetime_scanned = datetime.datetime.now()  # this one appended to found_time arr
-                        date_scanned = datetime.datetime.now().strftime("%m/%d/%Y")  # this one prints to csv
-                        time_scanned = datetime.datetime.now().strftime("%H:%M:%S")  # this one prints to csv
-                        time_check = datetime_scanned - found_time[found.index(barcode_data)]
-                        status_check = found_status[found.index(barcode_data)]
-
-                        # if time exceeds wait period and user is checked in then check them out
-                        if time_check > t_value and status_check == "IN":
-                            index_loc = found.index(barcode_data)
-                            found_status[index_loc] = "OUT"
-                            found_time[index_loc] = datetime_scanned
-                            txt.write("{},{},{},{},{},{}\n".format(system_id, date_scanned, time_scanned,
-                                                                   barcode_data, "OUT",
-                                                                   time_check))  # write to local txt file
-
-                            txt.flush()
-
-                            if storageChoice.lower() == 'a' and local_file != "":
-                                local_temp.append("{},{},{},{},{},{}\n".format(system_id, date_scanned, time_scanned,
-                                                                               barcode_data, "OUT", time_check))
-
-                            success = True
-                            if storageChoice.lower() == 'b':  # if user chose online/arcgis version
-                                # add "or storageChoice.lower() == 'c'" if SQL active
-                                success = upload(self, "upload", system_id, datestr, timestr, barcode_data, "OUT",
-                                                 str(time_check))
-
-                            if success:
-                                screen_label.text = screen_label.text + f"\n{barcode_data} checking OUT at " \
-                                                                        f"{date_scanned} {time_scanned} at location: " \
-                                                                        f"{system_id} for duration of {str(time_check)}"
-                                playsound(pass_ding)  # makes a beeping sound on scan
-                            elif local_passed and not success:
-                                screen_label.text = screen_label.text + f"\n{BaseColors.WARNING}Online logout " \
-                                                                        f"unavailable at current time, continuing " \
-                                                                        f"local logout\n{barcode_data} checking OUT " \
-                                                                        f"at {date_scanned} {time_scanned} at " \
-                                                                        f"location: {system_id} for duration of " \
-                                                                        f"{str(time_check)}"
-                                playsound(pass_ding)  # makes a beeping sound on scan
-                            elif not local_passed and not success:
-                                screen_label.text = screen_label.text + f"\n{BaseColors.WARNING}{barcode_data} NOT " \
-                                                                        f"checked OUT{BaseColors.ENDC}"
-                                playsound(fail_ding)  # makes a slightly deeper beeping sound on failed scan out
-                        # if found and check-in time is less than the specified wait time then wait
-                        elif time_check < t_value and status_check == "OUT":
-                            pass
-                        # if found and time check exceeds specified wait time and user is checked out, delete ID and
-                        # affiliated data from the list. This resets everything for said user and allows the user to
-                        # check back in at a later time.
-                        elif time_check > t_value and status_check == "OUT":
-                            index_loc = found.index(barcode_data)
-                            del found_status[index_loc]
-                            del found_time[index_loc]
-                            del found[index_loc]
-                            del thread_started[
-                                index_loc]  # has caused an error before, not sure why nor how to recreate
-
-                        # Write updated found arrays to qr_data_file so that it is up to date with the latest scan ins
-                        with open(qr_storage_file, "w") as qr_data_file:  # that file is used when restarting sessions
-                            for i in range(len(found)):
-                                code = found[i]
-                                tyme = found_time[i]
-                                status = found_status[i]
-                                qr_data_file.write("{0},{1},{2}\n".format(code, tyme, status))
-                    else:
-                        screen_label.text = screen_label.text + f"\n{BaseColors.FAIL}[Error] Barcode data issue in " \
-                                                                f"video() function.{BaseColors.ENDC}"
-
-                # If timer is active, check to see if any user has gone over the timer
-                if self.timer is not None:
-                    datetime_scanned = datetime.datetime.now()  # get current time
-                    for i in range(len(found)):  # below: total time passed since user checked in
-                        time_check = (datetime_scanned.hour * 60 + datetime_scanned.minute + datetime_scanned.second /
-                                      60) - (found_time[i].hour * 60 + found_time[i].minute + found_time[i].second / 60)
-                        if time_check > self.timer and thread_started[i] is not True:
-                            # if they're beyond the timer limit
-                            print(found[i])
-                            threading.Thread(target=self.timer_alert, args=[found[i]],
-                                             daemon=True).start()  # alert user
-                            thread_started[i] = True
-                            # mark this code/item/user as having an alert already run for them, so that it doesn't
-                            # happen again
-                # future: it should probably also not have the potential to trigger multiple threads/alerts/sounds
-                # overlay
-
-                if storageChoice.lower() == 'a' and local_file != "":
-                    datetime_scanned = datetime.datetime.now()
-                    time_check = (datetime_scanned.hour * 60 + datetime_scanned.minute + datetime_scanned.second /
-                                  60) - (local_timer.hour * 60 + local_timer.minute + local_timer.second / 60)
-                    if time_check > 5:
-                        with open(local_file, "a", encoding="ANSI") as csv2:
-                            for line in local_temp:
-                                csv2.write(line)
-                        local_timer = datetime_scanned
-                        local_temp = []
-
-                # show the output frame
+                            scan_log.write("local", line)
+
+                        if storageChoice.lower() in ('b', 'c'):  # if user chose an online version, queue it for upload
+                            uploader.put(system_id, datestr, timestr, barcode_data, "OUT", str(time_check))
+
+                        screen_label.write(f"\n{barcode_data} checking OUT at "
+                                           f"{date_scanned} {time_scanned} at location: "
+                                           f"{system_id} for duration of {str(time_check)}")
+                        audio.play("pass")  # makes a beeping sound on scan
+
+                    # Append any change to the session to qr_data_file, that file is used when restarting sessions
+                    if event is not None:
+                        journal.record(barcode_data, datetime_scanned, event)
+                        self.alerts.wake()  # the next code due for the timer may have changed
+
+                # show the output frame, along with the rate each stage of the pipeline is sustaining
+                summary = pipeline.summary() if gate is None else f"{pipeline.summary()} | {gate.skipped} skipped"
+                if storageChoice.lower() in ('b', 'c'):  # and how far behind the uploads are
+                    summary = f"{summary} | {uploader.summary()}"
+                cv2.putText(frame, summary, (10, frame.shape[0] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.35, (0, 0, 255), 1)
                 cv2.imshow("QR Toolbox", frame)
                 cv2.waitKey(1)
+                shown = True
 
                 # if the user closes the window, close the window (lol)
                 if cv2.getWindowProperty('QR Toolbox', cv2.WND_PROP_VISIBLE) < 1:
                     break
 
-            # close the output CSV file and do a bit of cleanup
-            screen_label.text = screen_label.text + f"\n{BaseColors.OKBLUE}[ALERT] Cleaning up... \n{BaseColors.ENDC}"
-            txt.close()
-            if storageChoice.lower() == 'a' and local_file != "":
-                with open(local_file, "a", encoding="ANSI") as csv2:
-                    for line in local_temp:
-                        csv2.write(line)
+            # stop the pipeline, close the output CSV file and do a bit of cleanup
+            pipeline.stop()
+            screen_label.write(f"\n{BaseColors.OKBLUE}[INFO] Average rates: capture "
+                               f"{pipeline.capture_meter.average_fps():.1f} fps, decode "
+                               f"{pipeline.decode_meter.average_fps():.1f} fps "
+                               f"({pipeline.workers} workers), result "
+                               f"{pipeline.result_meter.average_fps():.1f} fps. "
+                               f"{pipeline.dropped()} stale frames dropped.{BaseColors.ENDC}")
+            if gate is not None:
+                screen_label.write(f"\n{BaseColors.OKBLUE}[INFO] {gate.skipped} of "
+                                   f"{gate.checked} frames were not decoded because nothing "
+                                   f"moved in front of the camera.{BaseColors.ENDC}")
+            if tracker is not None:
+                screen_label.write(f"\n{BaseColors.OKBLUE}[INFO] {tracker.crop_hits} frames "
+                                   f"decoded around the last code, {tracker.full_decodes} "
+                                   f"decoded in full ({tracker.crop_misses} after losing the "
+                                   f"code).{BaseColors.ENDC}")
+            screen_label.write(f"\n{BaseColors.OKBLUE}[INFO] Full frame decodes by resolution: "
+                               f"{ladder.summary()} ({ladder.climbs} retried at a higher "
+                               f"resolution, {ladder.over_budget} over the time budget), "
+                               f"{overlay.summary()}.{BaseColors.ENDC}")
+            if storageChoice.lower() in ('b', 'c'):
+                storage_summary = self.sql_sink.summary() if storageChoice.lower() == 'c' else \
+                    self.layer_cache.summary()
+                screen_label.write(f"\n{BaseColors.OKBLUE}[INFO] {uploader.sent} events "
+                                   f"uploaded, {uploader.backed_up} backed up "
+                                   f"({outbox.count()} in the outbox), "
+                                   f"{uploader.depth()} still waiting (the oldest for "
+                                   f"{uploader.oldest_age():.0f} seconds) and uploading in the "
+                                   f"background, {storage_summary}. "
+                                   f"{connection_health.summary()}.{BaseColors.ENDC}")
+            scan_log.close()  # writes the lines still waiting
+            screen_label.write(f"\n{BaseColors.OKBLUE}[INFO] Scan log: {scan_log.summary()}. "
+                               f"{ui.summary()}.{BaseColors.ENDC}")
+            screen_label.write(f"\n{BaseColors.OKBLUE}[ALERT] Cleaning up... \n{BaseColors.ENDC}")
+            journal.close()
+            self.alerts.stop()
+            self.alerts = None
 
             if os.path.exists(qr_storage_file) and os.stat(qr_storage_file).st_size == 0:
                 os.remove(qr_storage_file)  # if the file is empty, delete it
@@ -1084,7 +949,7 @@ class MainScreenWidget(BoxLayout):
                 new_csv.close()
             elif not os.path.exists(args["output"]):
                 data = f"\n{BaseColors.FAIL}[ERROR] barcodes.txt not found as expected.{BaseColors.ENDC}"
-                screen_label.text = screen_label.text + data
+                screen_label.write(data)
 
             # if storageChoice == 'a' and os.stat(
             #         args["output"]).st_size != 0:
@@ -1108,9 +973,9 @@ class MainScreenWidget(BoxLayout):
 
             cv2.destroyAllWindows()  # close all cv windows
         else:  # if user did not choose storage
-            screen_label.text = screen_label.text + f"\n{BaseColors.WARNING}Storage location not chosen, please " \
-                                                    f"choose a storage location{BaseColors.ENDC}"
-        self.ids.qrreader.disabled = False  # makes QR Reader btn enabled again
+            screen_label.write(f"\n{BaseColors.WARNING}Storage location not chosen, please "
+                               f"choose a storage location{BaseColors.ENDC}")
+        ui.call(setattr, self.ids.qrreader, "disabled", False)  # makes QR Reader btn enabled again
 
     """
     This function prepares the program and then runs the video() function to read QR Codes
@@ -1129,68 +994,66 @@ class MainScreenWidget(BoxLayout):
         if vs is not None:
             # if vs already exists let user know (this code will likely never be run due to disabled btn)
             screen_label = self.ids.screen_label
-            screen_label.text = screen_label.text + f"\n{BaseColors.WARNING}[ALERT] A video stream already exists." \
-                                                    f"{BaseColors.ENDC}"
+            screen_label.write(f"\n{BaseColors.WARNING}[ALERT] A video stream already exists."
+                               f"{BaseColors.ENDC}")
             return
 
         restart_session_popup.restart_popup.open()
         restart_session_popup.main_screen = self
 
     """ 
-        This function sends the scanned-in/out data to arcgis as a feature, along with the coordinates defined by the
-        user in the settings.py file
+        This function sends a batch of scanned-in/out events to arcgis as features, with a single request, along 
+        with the coordinates defined by the user in the settings.py file
         - If an error occurs, it lets the user know
+        @param events the UploadEvents to send
+        
+        @return a list with True for each event that was added to the layer, and False for each that ArcGIS turned
+        down. If the request couldn't be made the exception is raised again, so the event isn't counted as turned down.
     """
 
-    def update_arcgis(self, sys_id, date_str, time_str, barcode_data, status, time_elapsed=None):
-        screen_label = self.ids.screen_label
-        try:
-            search_results = self.gis.content.search(query=gis_query, max_items=15)
+    def update_arcgis(self, events):
+        screen_label = ui.console(self.ids.screen_label)  # it is run by the uploader thread, so through ui
+        try:  # the layer and point are looked up when signing in, and only again after the cache was invalidated
+            data, layer, point = self.layer_cache.get()
         except Exception as e:
             if e.__str__() == "Invalid token.\n(Error Code: 498)":
-                self.gis._con.token = self.gis._con.relogin()
-                search_results = self.gis.content.search(query=gis_query,
-                                                         max_items=15)  # query is set in the settings.csv file
+                self.refresh_token()
+                data, layer, point = self.layer_cache.get()
             else:
-                screen_label.text = screen_label.text + f"\n{e}"
-                return False
-        data = search_results[0]  # code auto chooses the first option on the list
-
-        # Add data to layer
-        feature_layers = data.layers
-        layer = feature_layers[0]
-
-        # Get the geo coordinates
-        point = Point({"x": longitude, "y": latitude, "spatialReference": {"wkid": 4326}})  # other is 3857
+                screen_label.write(f"\n{e}")
+                raise
 
         try:
-            if status == "IN":  # create the feature (slightly diff if status is IN vs OUT)
-                feature = features.Feature(
-                    geometry=point,
-                    attributes={
-                        'Source': sys_id,
-                        'ScanDateTime': f"{date_str} {time_str}",
-                        'CodeText': barcode_data,
-                        'Status': 'IN'
-                    }
-                )
-            elif status == "OUT":
-                feature = features.Feature(
-                    geometry=point,
-                    attributes={
-                        'Source': sys_id,
-                        'ScanDateTime': f"{date_str} {time_str}",
-                        'CodeText': barcode_data,
-                        'Status': 'OUT',
-                        'ElapsedTime': f"{time_elapsed}"
-                    }
-                )
-            results = layer.edit_features(adds=[feature])  # add feature to the layer, get results
-            # screen_label.text = screen_label.text + f"\n{results}"
-            # this gives more info on the add if it was successful
+            adds = []
+            for event in events:  # create the features (slightly diff if status is IN vs OUT)
+                attributes = {
+                    'Source': event.sys_id,
+                    'ScanDateTime': f"{event.date_str} {event.time_str}",
+                    'CodeText': event.barcode,
+                    'Status': event.status
+                }
+                if event.status == "OUT":
+                    attributes['ElapsedTime'] = f"{event.time_elapsed}"
+                adds.append(features.Feature(geometry=point, attributes=attributes))
+            results = layer.edit_features(adds=adds)  # add all the features to the layer with one request
         except Exception as e:  # if failed, print error to user and return False so not successful
-            screen_label.text = screen_label.text + f"\nError: Couldn't create the feature: {str(e)}"
-            return False
+            if e.__str__() == "Invalid token.\n(Error Code: 498)":
+                self.refresh_token()
+            else:
+                self.layer_cache.invalidate()  # the layer may have changed, look it up again for the next upload
+            screen_label.write(f"\nError: Couldn't create the features: {str(e)}")
+            raise
+        # the results are in the same order as the features, map them back so only the failed events are retried
+        added = [bool(result.get('success')) for result in results.get('addResults', [])]
+        return added + [False] * (len(events) - len(added))  # a missing result counts as a failure
+
+    """ 
+    This function logs in to ArcGIS again to get a new token, the cached layer is dropped since it holds the old one 
+    """
+
+    def refresh_token(self):
+        self.gis._con.token = self.gis._con.relogin()
+        self.layer_cache.invalidate()
 
     """ 
     This function checks if storage path is set, calls it if not, otherwise/and then calls the qr_batch function 
@@ -1232,6 +1095,7 @@ class MainScreenWidget(BoxLayout):
                                         size=(251, 470),
                                         auto_dismiss=True)
         setup_popup.main_screen = self
+        setup_popup.ids.upload_button.disabled = self.uploading_backup  # one upload from the menu at a time
         setup_popup.setup_popup.open()
 
     """ 
@@ -1264,27 +1128,34 @@ class MainScreenWidget(BoxLayout):
         clear_screen = True
 
     """ 
-    This function is triggered when a user goes over the time limit, and it triggers an alert popup and sound 
+    This function is triggered from the timer thread when codes go over the time limit. The alert popup is opened on the
+    GUI thread (through the UI channel), and codes that go over while it is still open are added to it. The alarm is
+    played by the timer thread until the user acknowledges the alert.
+    @param users the codes that went over the time limit
     """
 
-    def timer_alert(self, user):
-        timer_alert_widget = TimerAlertWidget()
-        timer_alert_widget.timer_alert_widget_popup = Popup(title=f"ALERT: {user} has exceeded the time limit.",
-                                                            content=timer_alert_widget, size_hint=(None, None),
-                                                            size=(421, 135), auto_dismiss=False)
-        timer_alert_widget.timer_alert_widget_popup.open()
-        timer_alert_widget.main_screen = self
-
-        # play the sound
-        timer_alert_widget.not_acknowledged = True
-        # this is set to True, so system knows user hasn't acknowledged the alert yet
-        while timer_alert_widget.not_acknowledged:
-            playsound(timer_alarm)  # a sound is then played at 800hertz frequency for 10sec
-            time.sleep(20)  # it pauses for 20sec and then plays again continuously until user acknowledges
-        # the sound can be cut off by other alerts, and potentially by other sounds, and any executions by thread will
-        # continue on even after user axed the alert, if those executions occurred before the user axed. Only way to
-        # stop this is to close the program
-        return True
+    def timer_alert(self, users):
+        ui.call(self.show_timer_alert, users)
+
+    def show_timer_alert(self, users):
+        screen_label = self.ids.screen_label
+        for user in users:
+            screen_label.write(f"\n{BaseColors.WARNING}[ALERT] {user} has exceeded the time "
+                               f"limit.{BaseColors.ENDC}")
+        if self.timer_alert_widget is None:
+            self.timer_alert_widget = TimerAlertWidget()
+            self.timer_alert_widget.main_screen = self
+            self.timer_alert_widget.timer_alert_widget_popup = Popup(content=self.timer_alert_widget,
+                                                                     size_hint=(None, None), size=(421, 135),
+                                                                     auto_dismiss=False)
+            self.timer_alert_widget.timer_alert_widget_popup.open()
+        self.timer_alert_widget.users += users
+        if len(self.timer_alert_widget.users) == 1:
+            title = f"ALERT: {self.timer_alert_widget.users[0]} has exceeded the time limit."
+        else:
+            title = f"ALERT: {self.timer_alert_widget.users[0]} and {len(self.timer_alert_widget.users) - 1} " \
+                    f"more have exceeded the time limit."
+        self.timer_alert_widget.timer_alert_widget_popup.title = title
 
     """ 
     This function is triggered when the user clicks the Menu 'Exit' button 
@@ -1322,13 +1193,13 @@ class RestartSessionWidget(BoxLayout):
         if check:  # if user wants to check for previous session/session data
             global checkStorage
             checkStorage = True
-            screen_label.text = screen_label.text + f"\n{BaseColors.OKBLUE}Previous session will be restarted, if " \
-                                                    f"one exists.{BaseColors.ENDC}"
+            screen_label.write(f"\n{BaseColors.OKBLUE}Previous session will be restarted, if "
+                               f"one exists.{BaseColors.ENDC}")
         if upload:
             global uploadBackup
             uploadBackup = True
-            screen_label.text = screen_label.text + f"\n{BaseColors.OKBLUE}Local records will be uploaded to the " \
-                                                    f"online session.{BaseColors.ENDC}"
+            screen_label.write(f"\n{BaseColors.OKBLUE}Local records will be uploaded to the "
+                               f"online session.{BaseColors.ENDC}")
         self.main_screen.ids.qrreader.disabled = True  # disables QR Reader btn so user can't start multiple streams
         threading.Thread(target=self.main_screen.video, daemon=True).start()  # starts video method on its own thread
 
@@ -1391,8 +1262,8 @@ class CameraWidget(BoxLayout):
         cameraSource = camera_choice  # set camera source based on user choice
         screen_label = self.main_screen.ids.screen_label
         setup_screen_label(screen_label)
-        screen_label.text = screen_label.text + f"\n{BaseColors.OKBLUE}Camera source set to '{camera_choice}'." \
-                                                f"{BaseColors.ENDC}"
+        screen_label.write(f"\n{BaseColors.OKBLUE}Camera source set to '{camera_choice}'."
+                           f"{BaseColors.ENDC}")
 
 
 class TimerWidget(BoxLayout):
@@ -1406,16 +1277,20 @@ class TimerWidget(BoxLayout):
     def set_timer(self, time_to_set):  # a time of 0min also counts as unsetting the timer
         if time_to_set != "" and time_to_set is not None and int(time_to_set) != 0:
             self.main_screen.timer = int(time_to_set)  # set the timer and print a message
-            self.main_screen.ids.screen_label.text = self.main_screen.ids.screen_label.text + f"\n{BaseColors.WARNING}" \
-                                                                                              f"Timer set to " \
-                                                                                              f"{time_to_set} " \
-                                                                                              f"minute(s)." \
-                                                                                              f"{BaseColors.ENDC}"
+            if self.main_screen.alerts is not None:  # a session is running, time it with the new timer
+                self.main_screen.alerts.set_timer(self.main_screen.timer)
+            self.main_screen.ids.screen_label.write(f"\n{BaseColors.WARNING}"
+                                                    f"Timer set to "
+                                                    f"{time_to_set} "
+                                                    f"minute(s)."
+                                                    f"{BaseColors.ENDC}")
         else:  # unset the timer
             self.main_screen.timer = None
-            self.main_screen.ids.screen_label.text = self.main_screen.ids.screen_label.text + f"\n{BaseColors.WARNING}" \
-                                                                                              f"Timer unset." \
-                                                                                              f"{BaseColors.ENDC}"
+            if self.main_screen.alerts is not None:
+                self.main_screen.alerts.set_timer(None)
+            self.main_screen.ids.screen_label.write(f"\n{BaseColors.WARNING}"
+                                                    f"Timer unset."
+                                                    f"{BaseColors.ENDC}")
 
 
 """ 
@@ -1426,16 +1301,20 @@ This class represents the Timer Alert box that pops up when a user exceeds the t
 class TimerAlertWidget(BoxLayout):
     timer_alert_widget_popup = None
     main_screen = None
-    not_acknowledged = False
-    # used to check when main user has acknowledged that a given user has been checked in for too long
+    users = None  # the codes that have exceeded the timer, shown in the title
+
+    def __init__(self, **kwargs):
+        super(TimerAlertWidget, self).__init__(**kwargs)
+        self.users = []
 
     """ 
-    This function handles what happens after the user acknowledges that a user/item has exceeded the timer 
+    This function handles what happens after the user acknowledges that users/items have exceeded the timer 
     """
 
     def alert_acknowledged(self):
-        self.not_acknowledged = False
-        # set this to False so that beeping stops (altho if any have alrdy been triggered this won't stop them)
+        self.main_screen.timer_alert_widget = None  # the next code over the timer opens a new alert
+        if self.main_screen.alerts is not None:
+            self.main_screen.alerts.acknowledge()  # stops the alarm
 
 
 """ 
@@ -1455,7 +1334,8 @@ class SetupWidget(BoxLayout):
         if storageChoice == 'a':  # if local mode, call cons() func, otherwise call upload_backup()
             cons(self.main_screen)
         else:
-            upload_backup(self.main_screen, True)  # since it comes only from menu, send True
+            self.main_screen.uploading_backup = True
+            threading.Thread(target=upload_backup_from_menu, args=(self.main_screen,), daemon=True).start()
 
     """ 
     Creates and starts the popup for changing the storage location 
@@ -1511,9 +1391,9 @@ class QRSingleWidget(BoxLayout):
         if text != "" and text is not None:
             qr_single(self.main_screen, text)
         else:
-            self.main_screen.ids.screen_label.text = self.main_screen.ids.screen_label.text + f"\n{BaseColors.WARNING}" \
-                                                                                              f"QR Code text can't be " \
-                                                                                              f"empty.{BaseColors.ENDC}"
+            self.main_screen.ids.screen_label.write(f"\n{BaseColors.WARNING}"
+                                                    f"QR Code text can't be "
+                                                    f"empty.{BaseColors.ENDC}")
 
 
 """ 
@@ -1532,63 +1412,65 @@ class LoginWidget(BoxLayout):
 
     def sign_in(self):
         global user_chose_storage, storageChoice, arcgis_token, gis_query, \
-            arcgis_url  # , sql_cursor, sql_address, sql_database
+            arcgis_url
 
         screen_label = self.main_screen.ids.screen_label
         setup_screen_label(screen_label)
         if storageChoice == "b":
             try:
-                self.main_screen.gis = GIS(arcgis_url, arcgis_token)  # Get ArcGIS access and save it
-                search_results = self.main_screen.gis.content.search(query=gis_query, max_items=15)
+                gis = self.main_screen.gis = GIS(arcgis_url, arcgis_token)  # Get ArcGIS access and save it
+                self.main_screen.layer_cache = LayerCache(lambda: resolve_layer(gis))
 
-                # check that query works and there's a layer to get
-                # print(search_results)
-                data = search_results[0]  # Get the layer we'll be using, so user can see it
+                # check that query works and there's a layer to get, it is kept for the uploads
+                data = self.main_screen.layer_cache.get()[0]  # Get the layer we'll be using, so user can see it
 
-                screen_label.text = screen_label.text + f"\n{BaseColors.OKBLUE}Storage location set to online (ArcGIS)." \
-                                                        f"{BaseColors.ENDC}"  # if successful
-                screen_label.text = screen_label.text + f"\n{BaseColors.OKBLUE}Layer: {data.title}{BaseColors.ENDC}"
+                screen_label.write(f"\n{BaseColors.OKBLUE}Storage location set to online (ArcGIS)."
+                                   f"{BaseColors.ENDC}")  # if successful
+                screen_label.write(f"\n{BaseColors.OKBLUE}Layer: {data.title}{BaseColors.ENDC}")
                 # provides more info on the exact layer chosen
                 user_chose_storage = True
             except Exception as e:  # if error in trying to access ArcGIS or run the query
                 # e = sys.exc_info()[0]  # used for error checking
                 if e.__str__() == "Invalid token.\n(Error Code: 498)":
                     try:
-                        self.main_screen.gis._con.token = self.main_screen.gis._con.relogin()
-                        search_results = self.main_screen.gis.content.search(query=gis_query,
-                                                                             max_items=15)  # query is set in the settings.csv file
-                        data = search_results[0]  # Get the layer we'll be using, so user can see it
-
-                        screen_label.text = screen_label.text + f"\n{BaseColors.OKBLUE}Storage location set to online (ArcGIS)." \
-                                                                f"{BaseColors.ENDC}"  # if successful
-                        screen_label.text = screen_label.text + f"\n{BaseColors.OKBLUE}Layer: {data.title}{BaseColors.ENDC}"
+                        self.main_screen.refresh_token()
+                        data = self.main_screen.layer_cache.get()[0]  # Get the layer we'll be using, so user can see it
+
+                        screen_label.write(f"\n{BaseColors.OKBLUE}Storage location set to online (ArcGIS)."
+                                           f"{BaseColors.ENDC}")  # if successful
+                        screen_label.write(f"\n{BaseColors.OKBLUE}Layer: {data.title}{BaseColors.ENDC}")
                         # provides more info on the exact layer chosen
                         user_chose_storage = True
                     except Exception as e:
-                        screen_label.text = screen_label.text + f"\n{BaseColors.FAIL}Error: {e}{BaseColors.ENDC}"
+                        screen_label.write(f"\n{BaseColors.FAIL}Error: {e}{BaseColors.ENDC}")
                         user_chose_storage = False
                 else:
-                    screen_label.text = screen_label.text + f"\n{BaseColors.FAIL}Error: {e}{BaseColors.ENDC}"
+                    screen_label.write(f"\n{BaseColors.FAIL}Error: {e}{BaseColors.ENDC}")
                     user_chose_storage = False
             except:  # in case the above except clause doesn't catch everything
-                screen_label.text = screen_label.text + f"\n{BaseColors.FAIL}An unknown error has occurred.{BaseColors.ENDC}"
+                screen_label.write(f"\n{BaseColors.FAIL}An unknown error has occurred.{BaseColors.ENDC}")
+                user_chose_storage = False
+        elif storageChoice == "c":
+            try:  # the connection is kept open for the uploads, and opened again if it is lost
+                if self.main_screen.sql_sink is not None:
+                    self.main_screen.sql_sink.close()
+                self.main_screen.sql_sink = SqlSink(
+                    lambda: pyodbc.connect(driver='{ODBC Driver 17 for SQL Server}', server=sql_address,
+                                           database=sql_database, trusted_connection='yes'),
+                    pyodbc, sql_table, sql_columns)
+                self.main_screen.sql_sink.connect()  # check that the server can be reached
+
+                screen_label.write(f"\n{BaseColors.OKBLUE}Storage location set to online (SQL)."
+                                   f"{BaseColors.ENDC}")  # if successful
+                screen_label.write(f"\n{BaseColors.OKBLUE}Table: {sql_table} on {sql_address}"
+                                   f"{BaseColors.ENDC}")
+                user_chose_storage = True
+            except Exception as e:  # if error in trying to access the SQL server
+                screen_label.write(f"\n{BaseColors.FAIL}Error: {e}{BaseColors.ENDC}")
+                user_chose_storage = False
+            except:  # in case the above except clause doesn't catch everything
+                screen_label.write(f"\n{BaseColors.FAIL}An unknown error has occurred.{BaseColors.ENDC}")
                 user_chose_storage = False
-        # elif storageChoice == "c":
-        #     try:
-        #         cxnn = pyodbc.connect(driver='{ODBC Driver 17 for SQL Server}', server=sql_address,
-        #                               database=sql_database, trusted_connection='yes')
-        #         sql_cursor = cxnn.cursor()
-        #
-        #         screen_label.text = screen_label.text + f"\n{BaseColors.OKBLUE}Storage location set to online (SQL)." \
-        #                                                 f"{BaseColors.ENDC}"  # if successful
-        #         user_chose_storage = True
-        #     except Exception as e:  # if error in trying to access ArcGIS or run the query
-        #         # e = sys.exc_info()[0]  # used for error checking
-        #         screen_label.text = screen_label.text + f"\n{BaseColors.FAIL}Error: {e}{BaseColors.ENDC}"
-        #         user_chose_storage = False
-        #     except:  # in case the above except clause doesn't catch everything
-        #         screen_label.text = screen_label.text + f"\n{BaseColors.FAIL}An unknown error has occurred.{BaseColors.ENDC}"
-        #         user_chose_storage = False
 
     """ 
     This function is called if the user clicks cancel, so user knows no storage is set currently 
@@ -1600,7 +1482,7 @@ class LoginWidget(BoxLayout):
         screen_label = self.main_screen.ids.screen_label
         setup_screen_label(screen_label)
 
-        screen_label.text = screen_label.text + f"\n{BaseColors.WARNING}Online storage not set.{BaseColors.ENDC}"
+        screen_label.write(f"\n{BaseColors.WARNING}Online storage not set.{BaseColors.ENDC}")
 
 
 """ 
@@ -1643,8 +1525,9 @@ class QRToolboxApp(App):
     """
 
     def on_start(self):
-        global clear_screen, not_yet, arcgis_url, gis_query, latitude, longitude, localQRBatchFile, settings, \
-            arcgis_token  # , sql_address, headers, sql_database, query_in, query_out
+        global audio, ui, clear_screen, not_yet, arcgis_url, gis_query, latitude, longitude, localQRBatchFile, \
+            settings, arcgis_token, decode_workers, motion_gate, motion_keepalive, \
+            roi_tracking, roi_full_every, decoder_backend, sql_address, sql_database, sql_table, sql_columns
         with open(settings, 'r', encoding='utf-8') as set_file:
             reader = csv.reader(set_file)
             reader.__next__()
@@ -1657,19 +1540,28 @@ class QRToolboxApp(App):
             gis_query = arcgis_values[2]
             latitude = arcgis_values[3]
             longitude = arcgis_values[4]
-            # reader.__next__()
-            # sql_values = reader.__next__()
-            # sql_address = sql_values[0]
-            # sql_database = sql_values[1]
-            # headers = sql_values[2:]
-            # query_in = """
-            # INSERT INTO %s (%s, %s, %s, %s)
-            # VALUES (?, ?, ?, 'IN');
-            # """ % (headers[0], headers[1], headers[2], headers[3], headers[4])
-            # query_out = """
-            # INSERT INTO %s (%s, %s, %s, %s, %s)
-            # VALUES (?, ?, ?, 'OUT', ?);
-            # """ % (headers[0], headers[1], headers[2], headers[3], headers[4], headers[5])
+            next(reader, None)
+            sql_values = next(reader, None)
+            if sql_values:
+                sql_address = sql_values[0]
+                sql_database = sql_values[1]
+                sql_table = sql_values[2]
+                sql_columns = sql_values[3:8]
+            next(reader, None)
+            reader_values = next(reader, None)  # the QR Reader rows are optional, older settings files don't have them
+            if reader_values:
+                decode_workers = max(1, int(reader_values[0]))
+                if len(reader_values) > 2:
+                    motion_gate = reader_values[1].strip().lower() in ("true", "yes", "1")
+                    motion_keepalive = float(reader_values[2])
+                if len(reader_values) > 4:
+                    roi_tracking = reader_values[3].strip().lower() in ("true", "yes", "1")
+                    roi_full_every = max(1, int(reader_values[4]))
+                if len(reader_values) > 5:
+                    decoder_backend = reader_values[5].strip().lower()
+
+        audio = AudioService({"pass": pass_ding, "fail": fail_ding, "alarm": timer_alarm}).start()
+        ui = UIChannel()
 
         storage_location = StorageWidget()
         storage_location.storage_popup = Popup(title="Select a storage location", content=storage_location,
@@ -1680,6 +1572,24 @@ class QRToolboxApp(App):
         not_yet = True
         storage_location.storage_popup.open()
 
+    """ 
+    This function runs when the App closes, events still waiting to be uploaded are kept in the outbox and the sounds
+    are stopped 
+    """
+
+    def on_stop(self):
+        if uploader is not None:
+            uploader.stop()
+        if outbox is not None:
+            outbox.close()
+        if self.main_screen.sql_sink is not None:
+            self.main_screen.sql_sink.close()
+        if audio is not None:
+            audio.stop()
+        if batch is not None:
+            batch.stop()
+
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # the batch QR codes are made in worker processes, even in the installed program
     QRToolboxApp().run()  # runs and starts the whole program
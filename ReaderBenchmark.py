@@ -0,0 +1,287 @@
+"""
+Name: QR Reader Benchmark
+Description: Replays frames through the same scan pipeline and check-in logic the QR Reader uses, without Kivy, a
+    camera or a cv2 window, so that changes to the reader can be measured on any machine. Frames can come from a
+    recorded video, a folder of images, or be generated with known QR codes in them. The benchmark reports the rate
+    and latency percentiles of each stage, how many of the codes in the frames were decoded, and how the check-in/out
+    events compare to the events a perfect reader would have produced.
+
+Usage:
+    python ReaderBenchmark.py --synthetic 20
+    python ReaderBenchmark.py --video recording.mp4 --truth truth.csv
+    python ReaderBenchmark.py --images frames_folder --truth truth.csv --fps 15
+The truth file is a csv with a "frame,payload" row for each frame that has a code in it, frames are numbered from 0.
+"""
+
+import argparse
+import csv
+import datetime
+import os
+import time
+
+import cv2
+import numpy as np
+
+from Library.reader import FrameDecoder, MotionGate, ResolutionLadder, RoiTracker, ScanPipeline, StageMeter, \
+    get_backend
+from Library.session import IN, OUT, CheckInTracker
+
+start_time = datetime.datetime(2021, 1, 1, 8, 0, 0)  # the simulated time of the first frame
+
+"""
+This class hands out frames the way a VideoStream does, optionally at the pace of a live camera
+@param frames an iterable of frames
+@param fps the rate to hand frames out at, 0 to hand them out as fast as they are read
+"""
+
+
+class ReplaySource:
+    def __init__(self, frames, fps):
+        self.frames = iter(frames)
+        self.fps = fps
+        self.read_count = 0
+        self._started = None
+
+    def read(self):
+        if self.fps:
+            if self._started is None:
+                self._started = time.monotonic()
+            delay = self._started + self.read_count / self.fps - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        frame = next(self.frames, None)
+        if frame is not None:
+            self.read_count += 1
+        return frame
+
+
+"""
+This function reads the frames of a recorded video
+"""
+
+
+def video_frames(path):
+    capture = cv2.VideoCapture(path)
+    try:
+        while True:
+            (grabbed, frame) = capture.read()
+            if not grabbed:
+                break
+            yield frame
+    finally:
+        capture.release()
+
+
+"""
+This function reads the images in a folder, in order of their file names
+"""
+
+
+def image_frames(folder):
+    for name in sorted(os.listdir(folder)):
+        if name.lower().endswith((".png", ".jpg", ".jpeg", ".bmp")):
+            frame = cv2.imread(os.path.join(folder, name))
+            if frame is not None:
+                yield frame
+
+
+"""
+This function reads a truth file
+@return a dictionary of {frame number: payload}
+"""
+
+
+def read_truth(path):
+    truth = {}
+    if path:
+        with open(path, newline="", encoding="utf-8") as truth_file:
+            for row in csv.reader(truth_file):
+                if row and row[0].strip().isdigit():
+                    truth[int(row[0])] = row[1]
+    return truth
+
+
+"""
+This function plans a session of people walking up to the station with their badge: each person checks in, and after
+everyone has checked in, each comes back to check out. Only one badge is in view at a time.
+@param people the number of people
+@param fps the frame rate of the session
+@param visit how long (in seconds) each badge is held up
+@param pause how long (in seconds) between two people
+
+@return a dictionary of {frame number: payload}, and the total number of frames
+"""
+
+
+def synthetic_truth(people, fps, visit=1.5, pause=1.0):
+    truth = {}
+    slot = visit + pause
+    second_pass = max(people * slot, 12.0)  # people come back after at least the 10 second wait time
+    for i in range(people):
+        payload = f"Person {i:04d}"
+        for start in (i * slot, second_pass + i * slot):
+            for frame in range(int(start * fps), int((start + visit) * fps)):
+                truth[frame] = payload
+    return truth, int((second_pass + people * slot) * fps)
+
+
+"""
+This function draws the frames of a planned session: a noisy background with the badge of the person in view pasted
+on it, at a size and position that changes from person to person
+@param truth the plan, as returned by synthetic_truth()
+@param count the number of frames
+@param size the (width, height) of the frames
+"""
+
+
+def synthetic_frames(truth, count, size=(1280, 720), seed=7):
+    import qrcode  # only needed for generated frames
+
+    random = np.random.RandomState(seed)
+    background = random.randint(60, 200, (size[1], size[0], 3)).astype(np.uint8)
+    background = cv2.GaussianBlur(background, (9, 9), 0)
+    codes = {}
+    for index in range(count):
+        frame = background.copy()
+        payload = truth.get(index)
+        if payload is not None:
+            if payload not in codes:  # each person holds their badge at their own distance and place
+                side = int(random.randint(140, 320))
+                code = np.array(qrcode.make(payload).convert("L"))
+                code = cv2.cvtColor(cv2.resize(code, (side, side), interpolation=cv2.INTER_AREA), cv2.COLOR_GRAY2BGR)
+                codes[payload] = (code, int(random.randint(0, size[0] - side)), int(random.randint(0, size[1] - side)))
+            (code, x, y) = codes[payload]
+            frame[y:y + code.shape[0], x:x + code.shape[1]] = code
+        noise = random.randint(-6, 7, frame.shape)
+        yield np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+
+"""
+This function runs the check-in logic over the truth, to get the events a reader that never misses a code would produce
+@return a list of (seconds, code, event) tuples
+"""
+
+
+def expected_events(truth, fps):
+    session = CheckInTracker()
+    events = []
+    for index in sorted(truth):
+        now = start_time + datetime.timedelta(seconds=index / fps)
+        event, _ = session.scan(truth[index], now)
+        if event in (IN, OUT):
+            events.append((index / fps, truth[index], event))
+    return events
+
+
+"""
+This function pairs up the expected and actual events that are for the same code and status and close in time
+@return the number of expected events that were matched, and the actual events that matched nothing
+"""
+
+
+def match_events(expected, actual, tolerance):
+    unmatched = list(actual)
+    matched = 0
+    for (seconds, code, event) in expected:
+        for other in unmatched:
+            if other[1] == code and other[2] == event and abs(other[0] - seconds) <= tolerance:
+                unmatched.remove(other)
+                matched += 1
+                break
+    return matched, unmatched
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Replay frames through the QR Reader and measure it.")
+    source = ap.add_mutually_exclusive_group(required=True)
+    source.add_argument("--video", help="path to a recorded video")
+    source.add_argument("--images", help="path to a folder of images")
+    source.add_argument("--synthetic", type=int, metavar="PEOPLE", help="generate frames for this many people")
+    ap.add_argument("--truth", help="csv of frame,payload rows for a recorded video or folder of images")
+    ap.add_argument("--fps", type=float, default=None,
+                    help="rate frames are handed to the reader at, 0 for as fast as possible (default: the source's)")
+    ap.add_argument("--workers", type=int, default=2, help="number of decode workers")
+    ap.add_argument("--backend", default="pyzbar", help="decoder backend, pyzbar or opencv")
+    ap.add_argument("--no-motion-gate", action="store_true", help="decode every frame")
+    ap.add_argument("--no-tracking", action="store_true", help="always decode the full frame")
+    ap.add_argument("--tolerance", type=float, default=2.0,
+                    help="how far apart (in seconds) an event can be from the expected one and still match")
+    args = ap.parse_args()
+
+    # the clock rate is used to give each frame its time in the session, even when frames are replayed faster
+    if args.video:
+        capture = cv2.VideoCapture(args.video)
+        clock_fps = capture.get(cv2.CAP_PROP_FPS) or 15.0
+        capture.release()
+        frames, truth = video_frames(args.video), read_truth(args.truth)
+    elif args.images:
+        clock_fps = args.fps or 15.0
+        frames, truth = image_frames(args.images), read_truth(args.truth)
+    else:
+        clock_fps = args.fps or 15.0
+        truth, count = synthetic_truth(args.synthetic, clock_fps)
+        frames = synthetic_frames(truth, count)
+    fps = clock_fps if args.fps is None else args.fps
+
+    gate = None if args.no_motion_gate else MotionGate()
+    tracker = None if args.no_tracking else RoiTracker()
+    ladder = ResolutionLadder()
+    decoder = FrameDecoder(gate, tracker, ladder, get_backend(args.backend))
+    stream = ReplaySource(frames, fps)
+    pipeline = ScanPipeline(stream, decoder, workers=args.workers).start()
+
+    session = CheckInTracker()
+    checkin_meter = StageMeter("check-in")
+    delivered = with_code = decoded = 0
+    events = []
+    started = time.monotonic()
+    while True:
+        result = pipeline.next_result(timeout=0.5)
+        if result is None:
+            if pipeline.stream_lost:  # every frame has been replayed
+                break
+            continue
+        start = time.monotonic()
+        index = result.seq - 1
+        now = start_time + datetime.timedelta(seconds=index / clock_fps)
+        payloads = [barcode.data.decode("utf-8") for barcode in result.barcodes]
+        for payload in payloads:
+            event, _ = session.scan(payload, now)
+            if event in (IN, OUT):
+                events.append((index / clock_fps, payload, event))
+        checkin_meter.tick(time.monotonic() - start)
+
+        delivered += 1
+        if index in truth:
+            with_code += 1
+            decoded += truth[index] in payloads
+    elapsed = time.monotonic() - started
+    pipeline.stop()
+
+    expected = expected_events(truth, clock_fps)
+    matched, extra = match_events(expected, events, args.tolerance)
+
+    print(f"Frames: {stream.read_count} replayed, {delivered} reached the check-in logic, "
+          f"{pipeline.dropped()} dropped, in {elapsed:.1f} s")
+    print(f"{'stage':<10}{'avg fps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for meter in (pipeline.capture_meter, pipeline.decode_meter, pipeline.result_meter, checkin_meter):
+        latencies = meter.percentiles(50, 95, 99) or [0.0, 0.0, 0.0]
+        print(f"{meter.name:<10}{meter.average_fps():>10.1f}" + "".join(f"{l * 1000:>10.2f}" for l in latencies))
+    if gate is not None:
+        print(f"Motion gate: {gate.skipped} of {gate.checked} frames skipped")
+    if tracker is not None:
+        print(f"Tracking: {tracker.crop_hits} crop decodes, {tracker.full_decodes} full decodes, "
+              f"{tracker.crop_misses} crop misses")
+    print(f"Resolution ladder: {ladder.summary()}")
+    if truth:
+        print(f"Decode recall: {decoded} of {with_code} delivered frames with a code "
+              f"({decoded / with_code if with_code else 0:.1%})")
+        print(f"Events: {matched} of {len(expected)} expected check-ins/outs matched, {len(extra)} unexpected")
+        for (seconds, code, event) in extra:
+            print(f"    unexpected {event} for {code} at {seconds:.1f} s")
+    else:
+        print(f"Events: {len(events)} check-ins/outs (no truth file given to compare against)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+Name: Batch Worker Tests
+Description: Checks that the batch workers are spawned without running the main script again, as they would open a
+    Kivy window each when started from the QR Toolbox.
+"""
+
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+pytest.importorskip("qrcode")
+pytest.importorskip("PIL")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_spawned_workers_do_not_run_main_script(tmp_path):
+    marker = tmp_path / "imports.txt"
+    script = tmp_path / "main_script.py"
+    script.write_text(textwrap.dedent(f"""
+        import os
+        import sys
+
+        with open({str(marker)!r}, "a") as marker:  # a worker running the script again adds a line
+            marker.write(__name__ + "\\n")
+        sys.path.insert(0, {ROOT!r})
+        from Library.batch.worker import start_pool
+
+        if __name__ == "__main__":
+            spec = getattr(sys.modules["__main__"], "__spec__", None)
+            pool = start_pool(2)
+            try:
+                assert pool.apply(os.getpid) != os.getpid()
+                assert pool.apply(sum, ([1, 2],)) == 3
+            finally:
+                pool.terminate()
+            assert getattr(sys.modules["__main__"], "__spec__", None) is spec  # put back once they started
+    """))
+    subprocess.run([sys.executable, str(script)], check=True, timeout=60)
+    assert marker.read_text() == "__main__\n"
@@ -0,0 +1,50 @@
+"""
+Name: Codec Tests
+Description: Checks the conversions of the text of QR codes and of their file names. Run with python -m pytest from
+    the root folder.
+"""
+
+from Library.codec import (bad_file_name_list, code_characters, decode, encode, one_line, sanitize,
+                           special_characters, trouble_characters)
+
+
+def test_e_acute_round_trips():
+    assert encode("José") == "Jos!@!e2!"
+    assert decode(encode("José")) == "José"
+
+
+def test_old_badges_still_decode():  # é was written as "!@!e1!" before, those badges read as è, as they always did
+    assert decode("Jos!@!e1!") == "Josè"
+
+
+def test_every_special_character_round_trips():
+    for (special, code) in zip(special_characters, code_characters):
+        assert encode(special) == code
+        assert decode(code) == special
+    text = "".join(special_characters)
+    assert decode(encode(text)) == text
+
+
+def test_names_round_trip():
+    for name in ("José Éloïse Müller-Ørsted, François", "Person 00042", "ß!@!", "Zoë, Ñandú"):
+        assert decode(encode(name)) == name
+
+
+def test_plain_text_is_unchanged():
+    assert encode("Person 00042") == "Person 00042"
+    assert decode("Person 00042") == "Person 00042"
+    assert decode("!@!z9!") == "!@!z9!"  # looks like a code character, but isn't one
+
+
+def test_sanitize_replaces_every_bad_file_name_character():
+    for char in bad_file_name_list:
+        assert sanitize(f"a{char}b.jpg") == "a-b.jpg"
+    assert sanitize('a*b:c"d<e>f,g/h|i?j\tk\rl\nm\\n') == "a-b-c-d-e-f-g-h-i-j-k-l-m-n"
+    assert sanitize("José Müller.jpg") == "José Müller.jpg"
+
+
+def test_one_line_replaces_tabs_and_line_breaks():
+    for char in trouble_characters:
+        assert one_line(f"a{char}b") == "a b"
+    assert one_line("a\tb\rc\nd") == "a b c d"
+    assert one_line("a b") == "a b"
@@ -0,0 +1,24 @@
+"""
+Name: Connection Health Tests
+Description: Checks that the backoff delays stay within the cap, however long the connection is down.
+"""
+
+import time
+
+from Library.upload import OPEN, ConnectionHealth
+
+
+def test_long_outage_keeps_delay_at_cap():
+    health = ConnectionHealth(cap=300.0, seed=0)
+    for _ in range(5000):  # every probe fails, as in an outage lasting days
+        health.retry_at = 0.0
+        assert health.allow()
+        health.failure()
+    assert health.state == OPEN and health.opens > 1100
+    assert 0.0 < health.retry_at - time.monotonic() <= 300.0
+
+
+def test_delay_of_many_doublings_is_capped():
+    health = ConnectionHealth(cap=300.0, jitter=0.0)
+    assert health._delay(30.0, 1100) == 300.0
+    assert health._delay(2.0, 0) == 2.0
@@ -0,0 +1,34 @@
+"""
+Name: Session Store Tests
+Description: Checks that only checked in codes go over the timer. Run with python -m pytest from the root folder.
+"""
+
+import datetime
+
+from Library.session import IN, OUT, CheckInTracker, SessionStore
+
+START = datetime.datetime(2024, 1, 1, 9, 0, 0)
+
+
+def test_checked_out_code_is_never_due():
+    store = SessionStore()
+    record = store.add("a", START, IN)
+    store.update(record, START + datetime.timedelta(seconds=5), OUT)
+    assert store.due(START + datetime.timedelta(hours=1)) == []
+    assert store.next_time() is None
+
+
+def test_checked_in_code_is_due_once():
+    store = SessionStore()
+    store.add("a", START, IN)
+    store.add("b", START, OUT)  # a session restored with a code that was already checked out
+    assert store.next_time() == START
+    assert [record.code for record in store.due(START + datetime.timedelta(hours=1))] == ["a"]
+    assert store.due(START + datetime.timedelta(hours=2)) == []
+
+
+def test_tracker_checks_in_and_out_without_alert():
+    tracker = CheckInTracker()
+    assert tracker.scan("a", START)[0] == IN
+    assert tracker.scan("a", START + datetime.timedelta(minutes=1))[0] == OUT
+    assert tracker.overdue(START + datetime.timedelta(hours=1), 30) == []